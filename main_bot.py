@@ -29,6 +29,22 @@ logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+async def on_startup(application: Application) -> None:
+    """Открывает общую HTTP-сессию Claude до приема сообщений"""
+    try:
+        from src.shared.claude_client import claude_client
+        await claude_client.start()
+    except Exception as e:
+        logger.warning(f"HTTP-сессия Claude не открыта при запуске: {e}")
+
+async def on_shutdown(application: Application) -> None:
+    """Закрывает HTTP-сессию Claude при остановке бота"""
+    try:
+        from src.shared.claude_client import claude_client
+        await claude_client.close()
+    except Exception as e:
+        logger.warning(f"Ошибка закрытия HTTP-сессии Claude: {e}")
+
 def main():
     """Основная функция запуска бота"""
     
@@ -39,7 +55,13 @@ def main():
         return
     
     # Создаем приложение
-    application = Application.builder().token(token).build()
+    application = (
+        Application.builder()
+        .token(token)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     
     # Подключаем обработчики
     from src.telegram_bot.handlers import setup_handlers
@@ -15,6 +15,11 @@ from collections import defaultdict
 # Импорты из нашей системы
 from ..shared.claude_client import claude_client as gemini_client  # Migrated to Claude
 from ..shared.truth_initializer import update_pipeline_status
+from ..shared.truth_index import group_works_by_package
+from ..shared.truth_store import TruthStore
+from ..shared.debug_artifacts import artifact_writer
+from ..shared.revision import reusable_calculation
+from ..shared.agent_checkpoints import checkpoint_key, load_checkpoint, save_checkpoint
 
 logger = logging.getLogger(__name__)
 
@@ -28,12 +33,13 @@ class WorkVolumeCalculator:
         self.agent_name = "counter"
 
     
-    async def process(self, project_path: str) -> Dict[str, Any]:
+    async def process(self, project_path: str, truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
         """
         Главный метод обработки расчетов объемов
         
         Args:
             project_path: Путь к папке проекта
+            truth_store: Общее хранилище true.json запуска пайплайна
             
         Returns:
             Результат обработки
@@ -46,8 +52,8 @@ class WorkVolumeCalculator:
             if not os.path.exists(truth_path):
                 raise FileNotFoundError(f"Файл true.json не найден: {truth_path}")
             
-            with open(truth_path, 'r', encoding='utf-8') as f:
-                truth_data = json.load(f)
+            store = truth_store or TruthStore(truth_path)
+            truth_data = store.data
             
             # Обновляем статус агента
             update_pipeline_status(truth_path, self.agent_name, "in_progress")
@@ -86,20 +92,42 @@ class WorkVolumeCalculator:
             prompt_template = self._load_prompt()
             
             # Группируем работы по пакетам
-            packages_with_works = self._group_works_by_packages(work_packages, works_with_packages)
+            packages_with_works = self._group_works_by_packages(
+                work_packages, works_with_packages, store.index.works_by_package
+            )
             
             # Обрабатываем каждый пакет
             calculated_packages = []
+            recalculated_packages = []
             for package_data in packages_with_works:
-                logger.info(f"🔢 Расчет объемов для пакета: {package_data['package']['name']}")
+                package = package_data['package']
+                package_id = package.get('id') or package.get('package_id')
+                
+                # Режим ревизии: состав работ пакета не изменился - расчет берется из предыдущей версии
+                reused_package = reusable_calculation(
+                    truth_data, package_id, [work['id'] for work in package_data['works']]
+                )
+                if reused_package is not None:
+                    logger.info(f"🔁 Расчет объемов перенесен из предыдущей ревизии: {package['name']}")
+                    calculated_packages.append(reused_package)
+                    continue
+                
+                logger.info(f"🔢 Расчет объемов для пакета: {package['name']}")
                 
                 calculated_package = await self._calculate_package_volumes(
                     package_data, user_directive, prompt_template, agent_folder
                 )
                 calculated_packages.append(calculated_package)
+                recalculated_packages.append(package_id)
+            
+            if truth_data.get('revision'):
+                truth_data['revision']['recalculated_packages'] = recalculated_packages
+                store.mark_dirty('revision')
             
             # Обновляем true.json с результатами
-            self._update_truth_data(truth_data, calculated_packages, truth_path)
+            self._update_truth_data(truth_data, calculated_packages, store)
+            await self._save_truth_copy(truth_data, store)
+            store.flush()
             
             # Обновляем статус на завершено
             update_pipeline_status(truth_path, self.agent_name, "completed")
@@ -110,6 +138,7 @@ class WorkVolumeCalculator:
             return {
                 'success': True,
                 'packages_calculated': len(calculated_packages),
+                'packages_recalculated': len(recalculated_packages),
                 'agent': self.agent_name
             }
             
@@ -127,11 +156,18 @@ class WorkVolumeCalculator:
                 'agent': self.agent_name
             }
     
-    def _group_works_by_packages(self, work_packages: List[Dict], 
-                                source_work_items: List[Dict]) -> List[Dict]:
+    def _group_works_by_packages(self, work_packages: List[Dict], source_work_items: List[Dict],
+                                 works_by_package: Optional[Dict[str, List[Dict]]] = None) -> List[Dict]:
         """
         Группирует работы по пакетам для обработки
+        
+        Args:
+            works_by_package: Готовый индекс package_id -> работы (TruthIndex);
+                без него индекс строится по source_work_items одним проходом
         """
+        if works_by_package is None:
+            works_by_package = group_works_by_package(source_work_items)
+        
         packages_with_works = []
         
         for package in work_packages:
@@ -139,10 +175,7 @@ class WorkVolumeCalculator:
             package_id = package.get('id') or package.get('package_id')
 
             # Находим все работы этого пакета
-            package_works = [
-                work for work in source_work_items
-                if work.get('package_id') == package_id
-            ]
+            package_works = works_by_package.get(package_id, [])
             
             # Подготавливаем данные для AI
             works_for_ai = []
@@ -219,8 +252,7 @@ class WorkVolumeCalculator:
                 }
             }
             input_path = os.path.join(agent_folder, f"{package_id}_input.json")
-            with open(input_path, 'w', encoding='utf-8') as f:
-                json.dump(debug_data, f, ensure_ascii=False, indent=2)
+            await artifact_writer.write_async(input_path, debug_data)
 
             return calculation_result
 
@@ -231,6 +263,24 @@ class WorkVolumeCalculator:
             'user_directive': user_directive
         }
         
+        # Чекпоинт: пакет с тем же составом работ уже рассчитан в прерванном запуске
+        response_path = os.path.join(agent_folder, f"{package_id}_response.json")
+        key = checkpoint_key(input_data, prompt_template)
+        checkpoint = load_checkpoint(response_path, key)
+        if checkpoint is not None:
+            try:
+                response_data = checkpoint['response']
+                if isinstance(response_data, str):
+                    response_data = self._clean_and_parse_json(response_data)
+                if 'quantity' not in response_data.get('calculation', {}):
+                    raise ValueError("в ответе нет объема")
+                calculation_result = self._process_calculation_response(response_data, package, works)
+                logger.info(f"♻️ Расчет пакета {package_id} взят из чекпоинта, запрос к LLM не нужен")
+                return calculation_result
+            except Exception as e:
+                logger.warning(f"⚠️ Чекпоинт пакета {package_id} не прошел проверку, повторяем запрос: {e}")
+        
+
         # Формируем запрос для LLM
         system_instruction, user_prompt = self._format_prompt(input_data, prompt_template)
 
@@ -250,8 +300,7 @@ class WorkVolumeCalculator:
             }
         }
         input_path = os.path.join(agent_folder, f"{package_id}_input.json")
-        with open(input_path, 'w', encoding='utf-8') as f:
-            json.dump(debug_data, f, ensure_ascii=False, indent=2)
+        await artifact_writer.write_async(input_path, debug_data)
 
         # Вызываем Gemini API с указанием агента для оптимальной модели
         logger.info(f"📡 Отправка запроса для пакета {package_id} в Claude (counter -> claude-3.5-sonnet)")
@@ -261,10 +310,8 @@ class WorkVolumeCalculator:
             agent_name="counter"
         )
         
-        # Сохраняем ответ от LLM
-        response_path = os.path.join(agent_folder, f"{package_id}_response.json")
-        with open(response_path, 'w', encoding='utf-8') as f:
-            json.dump(gemini_response, f, ensure_ascii=False, indent=2)
+        # Сохраняем ответ от LLM (он же чекпоинт пакета)
+        save_checkpoint(response_path, key, gemini_response)
         
         if not gemini_response.get('success', False):
             logger.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА Claude API для пакета {package_id}: {gemini_response.get('error')}")
@@ -462,7 +509,7 @@ class WorkVolumeCalculator:
             logger.error(f"Сырой ответ от Claude: {llm_response}")
             raise Exception(f"Не удалось распарсить ответ расчетов от Claude: {e}")
     
-    def _update_truth_data(self, truth_data: Dict, calculated_packages: List[Dict], truth_path: str):
+    def _update_truth_data(self, truth_data: Dict, calculated_packages: List[Dict], store: TruthStore):
         """
         Обновляет true.json с результатами расчетов
         Поддерживает как иерархическую, так и плоскую структуру
@@ -499,6 +546,7 @@ class WorkVolumeCalculator:
 
             # Также сохраняем в volume_calculations для scheduler
             truth_data['results']['volume_calculations'] = calculated_packages
+            store.mark_dirty('results.work_breakdown_structure', 'results.volume_calculations')
 
         else:
             # Старая плоская структура - работаем с work_packages
@@ -512,6 +560,7 @@ class WorkVolumeCalculator:
 
             # Обновляем work_packages в true.json
             truth_data['results']['work_packages'] = current_packages
+            store.mark_dirty('results.work_packages')
         
         # Добавляем минимальную сводную статистику
         units_summary = defaultdict(float)
@@ -541,34 +590,34 @@ class WorkVolumeCalculator:
             'calculated_at': datetime.now().isoformat()
         }
         
-        # Сохраняем обновленный файл
-        with open(truth_path, 'w', encoding='utf-8') as f:
-            json.dump(truth_data, f, ensure_ascii=False, indent=2)
+        # Запись - при сохранении хранилища на границе этапа
+        store.mark_dirty('results.volume_summary')
         
         logger.info(f"✅ Обновлен true.json с данными для {len(calculated_packages)} пакетов")
-        
-        # Копируем обновленный true.json в папку агента
-        agent_folder = os.path.join(os.path.dirname(truth_path), "6_counter")
+    
+    async def _save_truth_copy(self, truth_data, store: TruthStore):
+        """Копия обновленного true.json в папке агента - только при полной детализации артефактов"""
+        if artifact_writer.level != 'full':
+            return
+        agent_folder = os.path.join(os.path.dirname(store.truth_path), "6_counter")
         agent_truth_copy = os.path.join(agent_folder, "updated_true.json")
-        
-        with open(agent_truth_copy, 'w', encoding='utf-8') as f:
-            json.dump(truth_data, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"📁 Скопирован обновленный true.json в {agent_truth_copy}")
+        await artifact_writer.write_async(agent_truth_copy, truth_data.to_dict)
+        logger.info(f"📁 Копия обновленного true.json поставлена в очередь: {agent_truth_copy}")
 
 # Функция для запуска агента из внешнего кода
-async def run_counter(project_path: str) -> Dict[str, Any]:
+async def run_counter(project_path: str, truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
     """
     Запускает агента counter для указанного проекта
     
     Args:
         project_path: Путь к папке проекта
+        truth_store: Общее хранилище true.json запуска пайплайна
         
     Returns:
         Результат работы агента
     """
     agent = WorkVolumeCalculator()
-    return await agent.process(project_path)
+    return await agent.process(project_path, truth_store)
 
 if __name__ == "__main__":
     import sys
@@ -14,6 +14,8 @@ from .work_packager import run_work_packager
 from .works_to_packages import run_works_to_packages
 from .counter import run_counter
 from .scheduler_and_staffer import run_scheduler_and_staffer
+from ..shared.truth_store import TruthStore
+from ..shared.claude_client import claude_client
 
 logger = logging.getLogger(__name__)
 
@@ -41,13 +43,15 @@ NEW_AGENTS = {
     }
 }
 
-async def run_new_agent(agent_name: str, project_path: str) -> Dict[str, Any]:
+async def run_new_agent(agent_name: str, project_path: str,
+                        truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
     """
     Запускает один из новых агентов
     
     Args:
         agent_name: Имя агента (work_packager, works_to_packages, counter, scheduler_and_staffer)
         project_path: Путь к проекту
+        truth_store: Общее хранилище true.json запуска пайплайна
         
     Returns:
         Результат выполнения агента
@@ -67,7 +71,7 @@ async def run_new_agent(agent_name: str, project_path: str) -> Dict[str, Any]:
     
     try:
         # Запускаем агента
-        result = await agent_config['function'](project_path)
+        result = await agent_config['function'](project_path, truth_store=truth_store)
         
         if result.get('success'):
             logger.info(f"✅ Агент {agent_name} завершен успешно")
@@ -130,13 +134,16 @@ async def run_new_pipeline(project_path: str, start_from: str = "work_packager")
         'results': {}
     }
     
+    # Одно хранилище true.json на весь прогон
+    truth_store = TruthStore(os.path.join(project_path, "true.json"))
+    
     # Запускаем агентов последовательно
     for agent_name in agents_to_run:
         logger.info(f"\n{'='*50}")
         logger.info(f"🚀 ЭТАП: {agent_name.upper()}")
         logger.info(f"{'='*50}")
         
-        agent_result = await run_new_agent(agent_name, project_path)
+        agent_result = await run_new_agent(agent_name, project_path, truth_store)
         pipeline_result['results'][agent_name] = agent_result
         
         if agent_result.get('success'):
@@ -157,6 +164,13 @@ async def run_new_pipeline(project_path: str, start_from: str = "work_packager")
     
     return pipeline_result
 
+async def _closing_client_session(coro):
+    """Выполняет корутину и закрывает HTTP-сессию Claude (для запуска через asyncio.run)"""
+    try:
+        return await coro
+    finally:
+        await claude_client.close()
+
 def run_new_agent_sync(agent_name: str, project_path: str) -> bool:
     """
     Синхронная обертка для запуска агента (для совместимости со старым кодом)
@@ -169,7 +183,7 @@ def run_new_agent_sync(agent_name: str, project_path: str) -> bool:
         True если агент выполнен успешно
     """
     try:
-        result = asyncio.run(run_new_agent(agent_name, project_path))
+        result = asyncio.run(_closing_client_session(run_new_agent(agent_name, project_path)))
         return result.get('success', False)
     except Exception as e:
         logger.error(f"Ошибка в синхронной обертке для {agent_name}: {e}")
@@ -211,7 +225,7 @@ if __name__ == "__main__":
         print(f"🧪 Тестирование агента: {agent_name}")
         print(f"📂 Проект: {project_path}")
         
-        result = asyncio.run(run_new_agent(agent_name, project_path))
+        result = asyncio.run(_closing_client_session(run_new_agent(agent_name, project_path)))
         print(f"📊 Результат: {result}")
         
     elif len(sys.argv) == 2:
@@ -221,7 +235,7 @@ if __name__ == "__main__":
         print(f"🧪 Тестирование полного пайплайна")
         print(f"📂 Проект: {project_path}")
         
-        result = asyncio.run(run_new_pipeline(project_path))
+        result = asyncio.run(_closing_client_session(run_new_pipeline(project_path)))
         print(f"📊 Результат: {result}")
         
     else:
@@ -16,6 +16,9 @@ from collections import defaultdict
 # Импорты из нашей системы
 from ..shared.claude_client import claude_client as gemini_client  # Migrated to Claude
 from ..shared.truth_initializer import update_pipeline_status
+from ..shared.truth_store import TruthStore
+from ..shared.debug_artifacts import artifact_writer
+from ..shared.revision import reusable_schedule
 
 logger = logging.getLogger(__name__)
 
@@ -30,12 +33,13 @@ class SchedulerAndStaffer:
         self.batch_size = batch_size
 
     
-    async def process(self, project_path: str) -> Dict[str, Any]:
+    async def process(self, project_path: str, truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
         """
         Главный метод создания календарного плана и распределения персонала
         
         Args:
             project_path: Путь к папке проекта
+            truth_store: Общее хранилище true.json запуска пайплайна
             
         Returns:
             Результат обработки
@@ -48,8 +52,8 @@ class SchedulerAndStaffer:
             if not os.path.exists(truth_path):
                 raise FileNotFoundError(f"Файл true.json не найден: {truth_path}")
             
-            with open(truth_path, 'r', encoding='utf-8') as f:
-                truth_data = json.load(f)
+            store = truth_store or TruthStore(truth_path)
+            truth_data = store.data
             
             # Обновляем статус агента
             update_pipeline_status(truth_path, self.agent_name, "in_progress")
@@ -108,15 +112,21 @@ class SchedulerAndStaffer:
             # Подготавливаем компактные данные о пакетах для планирования
             compact_packages = self._prepare_compact_packages(packages_with_calcs, project_path)
 
-            # Обрабатываем ВСЕ пакеты сразу - никаких батчей!
-            logger.info(f"📦 Обработка ВСЕХ {len(compact_packages)} пакетов за один раз")
+            # Режим ревизии: пакеты, объемы, сроки и директивы не изменились - план переносится
+            scheduled_packages = reusable_schedule(truth_data)
+            
+            if scheduled_packages is not None:
+                logger.info(f"🔁 Календарный план перенесен из предыдущей ревизии ({len(scheduled_packages)} пакетов)")
+            else:
+                # Обрабатываем ВСЕ пакеты сразу - никаких батчей!
+                logger.info(f"📦 Обработка ВСЕХ {len(compact_packages)} пакетов за один раз")
 
-            scheduled_packages = await self._process_all_packages_at_once(
-                compact_packages, timeline_blocks, workforce_range,
-                scheduler_and_staffer_directive, prompt_template, agent_folder
-            )
+                scheduled_packages = await self._process_all_packages_at_once(
+                    compact_packages, timeline_blocks, workforce_range,
+                    scheduler_and_staffer_directive, prompt_template, agent_folder
+                )
 
-            logger.info(f"✅ Обработано {len(scheduled_packages)} пакетов за один запрос")
+                logger.info(f"✅ Обработано {len(scheduled_packages)} пакетов за один запрос")
             
             # Валидируем ограничения по персоналу
             validation_result = self._validate_workforce_constraints(
@@ -131,7 +141,8 @@ class SchedulerAndStaffer:
                 )
             
             # Обновляем true.json с финальными результатами
-            self._update_truth_data(truth_data, scheduled_packages, truth_path)
+            self._update_truth_data(truth_data, scheduled_packages, store)
+            store.flush()
             
             # Обновляем статус на завершено
             update_pipeline_status(truth_path, self.agent_name, "completed")
@@ -292,8 +303,7 @@ class SchedulerAndStaffer:
             }
         }
         batch_input_path = os.path.join(agent_folder, f"batch_{batch_num+1:03d}_input.json")
-        with open(batch_input_path, 'w', encoding='utf-8') as f:
-            json.dump(debug_data, f, ensure_ascii=False, indent=2)
+        await artifact_writer.write_async(batch_input_path, debug_data)
 
         # Вызываем Gemini API с system_instruction и user_prompt
         logger.info(f"📡 Отправка батча {batch_num + 1} в Gemini (scheduler_and_staffer -> gemini-2.5-pro)")
@@ -305,8 +315,7 @@ class SchedulerAndStaffer:
 
         # Сохраняем ответ от LLM
         batch_response_path = os.path.join(agent_folder, f"batch_{batch_num+1:03d}_response.json")
-        with open(batch_response_path, 'w', encoding='utf-8') as f:
-            json.dump(gemini_response, f, ensure_ascii=False, indent=2)
+        await artifact_writer.write_async(batch_response_path, gemini_response)
 
 
         if not gemini_response.get('success', False):
@@ -353,8 +362,7 @@ class SchedulerAndStaffer:
         }
 
         input_path = os.path.join(agent_folder, "all_packages_input.json")
-        with open(input_path, 'w', encoding='utf-8') as f:
-            json.dump(input_data, f, ensure_ascii=False, indent=2)
+        await artifact_writer.write_async(input_path, input_data)
 
         # Вызываем Claude API с ВСЕМИ пакетами
         logger.info(f"📡 Отправка ВСЕХ пакетов в Claude (scheduler_and_staffer)")
@@ -366,8 +374,7 @@ class SchedulerAndStaffer:
 
         # Сохраняем ответ от Claude
         response_path = os.path.join(agent_folder, "all_packages_response.json")
-        with open(response_path, 'w', encoding='utf-8') as f:
-            json.dump(claude_response, f, ensure_ascii=False, indent=2)
+        await artifact_writer.write_async(response_path, claude_response)
 
         if not claude_response.get('success', False):
             logger.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА Claude API: {claude_response.get('error')}")
@@ -661,7 +668,7 @@ class SchedulerAndStaffer:
         
         return fallback_packages
     
-    def _update_truth_data(self, truth_data: Dict, scheduled_packages: List[Dict], truth_path: str):
+    def _update_truth_data(self, truth_data: Dict, scheduled_packages: List[Dict], store: TruthStore):
         """
         Обновляет true.json с финальным календарным планом
         Поддерживает как иерархическую, так и плоскую структуру
@@ -698,6 +705,7 @@ class SchedulerAndStaffer:
 
             # Также сохраняем в scheduled_packages для совместимости
             truth_data['results']['scheduled_packages'] = scheduled_packages
+            store.mark_dirty('results.work_breakdown_structure', 'results.scheduled_packages')
 
         else:
             # Старая плоская структура - работаем с work_packages
@@ -731,6 +739,7 @@ class SchedulerAndStaffer:
 
             # Обновляем work_packages для старой структуры
             truth_data['results']['work_packages'] = merged_packages
+            store.mark_dirty('results.work_packages')
         
         # Создаем сводную информацию о календарном плане
         schedule_summary = self._create_schedule_summary(scheduled_packages, truth_data.get('timeline_blocks', []))
@@ -742,9 +751,8 @@ class SchedulerAndStaffer:
         truth_data['metadata']['pipeline_completed'] = True
         truth_data['metadata']['final_updated_at'] = datetime.now().isoformat()
         
-        # Сохраняем обновленный файл
-        with open(truth_path, 'w', encoding='utf-8') as f:
-            json.dump(truth_data, f, ensure_ascii=False, indent=2)
+        # Запись - при сохранении хранилища на границе этапа
+        store.mark_dirty('results.schedule', 'results.staffing', 'metadata')
     
     def _create_schedule_summary(self, packages: List[Dict], timeline_blocks: List[Dict]) -> Dict:
         """
@@ -858,19 +866,21 @@ class SchedulerAndStaffer:
         return 'medium'  # По умолчанию
 
 # Функция для запуска агента из внешнего кода
-async def run_scheduler_and_staffer(project_path: str, batch_size: int = 12) -> Dict[str, Any]:
+async def run_scheduler_and_staffer(project_path: str, batch_size: int = 12,
+                                    truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
     """
     Запускает агента scheduler_and_staffer для указанного проекта
 
     Args:
         project_path: Путь к папке проекта
         batch_size: Размер батча для обработки (по умолчанию 12)
+        truth_store: Общее хранилище true.json запуска пайплайна
 
     Returns:
         Результат работы агента
     """
     agent = SchedulerAndStaffer(batch_size=batch_size)
-    return await agent.process(project_path)
+    return await agent.process(project_path, truth_store)
 
 if __name__ == "__main__":
     import sys
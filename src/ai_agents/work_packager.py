@@ -14,6 +14,8 @@ from datetime import datetime
 # Импорты из нашей системы
 from ..shared.claude_client import claude_client as gemini_client  # Migrated to Claude
 from ..shared.truth_initializer import update_pipeline_status
+from ..shared.truth_store import TruthStore
+from ..shared.debug_artifacts import artifact_writer
 
 logger = logging.getLogger(__name__)
 
@@ -33,12 +35,13 @@ class WorkPackager:
         suffix = f"\n# Контроль: {unique_id}"
         return prefix + prompt + suffix
     
-    async def process(self, project_path: str) -> Dict[str, Any]:
+    async def process(self, project_path: str, truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
         """
         Главный метод обработки
         
         Args:
             project_path: Путь к папке проекта
+            truth_store: Общее хранилище true.json запуска пайплайна
             
         Returns:
             Результат обработки
@@ -51,8 +54,8 @@ class WorkPackager:
             if not os.path.exists(truth_path):
                 raise FileNotFoundError(f"Файл true.json не найден: {truth_path}")
             
-            with open(truth_path, 'r', encoding='utf-8') as f:
-                truth_data = json.load(f)
+            store = truth_store or TruthStore(truth_path)
+            truth_data = store.data
             
             # Обновляем статус агента
             update_pipeline_status(truth_path, self.agent_name, "in_progress")
@@ -85,8 +88,7 @@ class WorkPackager:
                     "target_packages": input_data['target_work_package_count']
                 }
             }
-            with open(os.path.join(llm_input_path, "llm_input.json"), 'w', encoding='utf-8') as f:
-                json.dump(debug_data, f, ensure_ascii=False, indent=2)
+            await artifact_writer.write_async(os.path.join(llm_input_path, "llm_input.json"), debug_data)
 
             # Вызываем Gemini API с разделенными промптами
             logger.info("📡 Отправка запроса в Claude (work_packager -> claude-sonnet-4)")
@@ -97,8 +99,7 @@ class WorkPackager:
             )
 
             # Сохраняем ответ от LLM
-            with open(os.path.join(llm_input_path, "llm_response.json"), 'w', encoding='utf-8') as f:
-                json.dump(gemini_response, f, ensure_ascii=False, indent=2)
+            await artifact_writer.write_async(os.path.join(llm_input_path, "llm_response.json"), gemini_response)
             
             if not gemini_response.get('success', False):
                 raise Exception(f"Ошибка Claude API: {gemini_response.get('error', 'Неизвестная ошибка')}")
@@ -112,8 +113,8 @@ class WorkPackager:
             # Подсчитываем количество пакетов для совместимости с остальной системой
             packages_count = len([item for item in work_breakdown_structure if item.get('type') == 'package'])
             
-            with open(truth_path, 'w', encoding='utf-8') as f:
-                json.dump(truth_data, f, ensure_ascii=False, indent=2)
+            store.mark_dirty('results.work_breakdown_structure')
+            store.flush()
             
             # Обновляем статус на завершено
             update_pipeline_status(truth_path, self.agent_name, "completed")
@@ -301,18 +302,19 @@ class WorkPackager:
             raise Exception(f"Не удалось распарсить ответ от Claude: {e}")
 
 # Функция для запуска агента из внешнего кода
-async def run_work_packager(project_path: str) -> Dict[str, Any]:
+async def run_work_packager(project_path: str, truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
     """
     Запускает агента work_packager для указанного проекта
     
     Args:
         project_path: Путь к папке проекта
+        truth_store: Общее хранилище true.json запуска пайплайна
         
     Returns:
         Результат работы агента
     """
     agent = WorkPackager()
-    return await agent.process(project_path)
+    return await agent.process(project_path, truth_store)
 
 if __name__ == "__main__":
     # Тестирование агента
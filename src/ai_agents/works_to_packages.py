@@ -16,6 +16,10 @@ from datetime import datetime
 # Импорты из нашей системы
 from ..shared.claude_client import claude_client as gemini_client  # Migrated to Claude
 from ..shared.truth_initializer import update_pipeline_status
+from ..shared.truth_store import TruthStore
+from ..shared.debug_artifacts import artifact_writer
+from ..shared.models import WorkItem, work_items_from_dicts, work_items_to_dicts
+from ..shared.agent_checkpoints import checkpoint_key, load_checkpoint, save_checkpoint
 
 logger = logging.getLogger(__name__)
 
@@ -30,12 +34,13 @@ class WorksToPackagesAssigner:
         self.batch_size = batch_size
 
     
-    async def process(self, project_path: str) -> Dict[str, Any]:
+    async def process(self, project_path: str, truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
         """
         Главный метод обработки с поддержкой батчинга
         
         Args:
             project_path: Путь к папке проекта
+            truth_store: Общее хранилище true.json запуска пайплайна
             
         Returns:
             Результат обработки
@@ -48,8 +53,8 @@ class WorksToPackagesAssigner:
             if not os.path.exists(truth_path):
                 raise FileNotFoundError(f"Файл true.json не найден: {truth_path}")
             
-            with open(truth_path, 'r', encoding='utf-8') as f:
-                truth_data = json.load(f)
+            store = truth_store or TruthStore(truth_path)
+            truth_data = store.data
             
             # Обновляем статус агента
             update_pipeline_status(truth_path, self.agent_name, "in_progress")
@@ -64,38 +69,50 @@ class WorksToPackagesAssigner:
             if not work_breakdown_structure:
                 work_breakdown_structure = truth_data.get('results', {}).get('work_packages', [])
 
-            source_work_items = truth_data.get('source_work_items', [])
+            # Работы - компактные WorkItem: package_id записывается в них без копирования
+            works = work_items_from_dicts(truth_data.get('source_work_items', []))
 
             if not work_breakdown_structure:
                 raise Exception("Не найдена структура пакетов работ. Сначала должен быть запущен work_packager")
 
             packages_count = len([item for item in work_breakdown_structure if item.get('type') == 'package'])
-            logger.info(f"📊 Обработка {len(source_work_items)} работ в {packages_count} пакетов из иерархической структуры")
+            logger.info(f"📊 Обработка {len(works)} работ в {packages_count} пакетов из иерархической структуры")
             
             # Загружаем промпт
             prompt_template = self._load_prompt()
             
+            # В режиме ревизии неизмененные работы уже имеют package_id - в LLM идут только остальные
+            # При обычном перезапуске (в т.ч. копии стадии из /test) распределяем все работы заново
+            if truth_data.get('revision', {}).get('stats', {}).get('applied'):
+                pending_works = [work for work in works if not work.package_id]
+            else:
+                pending_works = works
+            if len(pending_works) < len(works):
+                logger.info(f"🔁 Назначения сохранены для {len(works) - len(pending_works)} работ, "
+                            f"к распределению {len(pending_works)}")
+            
             # Разбиваем работы на батчи и обрабатываем
-            assigned_works = []
-            total_batches = math.ceil(len(source_work_items) / self.batch_size)
+            total_batches = math.ceil(len(pending_works) / self.batch_size)
             
             for batch_num in range(total_batches):
                 start_idx = batch_num * self.batch_size
-                end_idx = min((batch_num + 1) * self.batch_size, len(source_work_items))
-                batch_works = source_work_items[start_idx:end_idx]
+                end_idx = min((batch_num + 1) * self.batch_size, len(pending_works))
+                batch_works = pending_works[start_idx:end_idx]
                 
                 logger.info(f"📦 Обработка батча {batch_num + 1}/{total_batches} ({len(batch_works)} работ)")
                 
-                # Обрабатываем батч
-                batch_result = await self._process_batch(
+                # Обрабатываем батч (package_id проставляется в работы батча)
+                await self._process_batch(
                     batch_works, work_breakdown_structure, prompt_template,
                     batch_num, agent_folder
                 )
-                
-                assigned_works.extend(batch_result)
+            
+            # Исходный порядок работ сохраняется
+            assigned_works = work_items_to_dicts(works)
             
             # Обновляем true.json с результатами
-            self._update_truth_data(truth_data, assigned_works, truth_path)
+            self._update_truth_data(truth_data, assigned_works, store)
+            store.flush()
             
             # Обновляем статус на завершено
             update_pipeline_status(truth_path, self.agent_name, "completed")
@@ -124,8 +141,8 @@ class WorksToPackagesAssigner:
                 'agent': self.agent_name
             }
     
-    async def _process_batch(self, batch_works: List[Dict], work_breakdown_structure: List[Dict],
-                           prompt_template: str, batch_num: int, agent_folder: str) -> List[Dict]:
+    async def _process_batch(self, batch_works: List[WorkItem], work_breakdown_structure: List[Dict],
+                           prompt_template: str, batch_num: int, agent_folder: str) -> List[WorkItem]:
         """
         Обрабатывает один батч работ с новой иерархической структурой
         """
@@ -133,9 +150,9 @@ class WorksToPackagesAssigner:
         input_data = {
             'works_to_assign': [
                 {
-                    'id': work.get('id'),
-                    'name': work.get('name', ''),
-                    'code': work.get('code', '')
+                    'id': work.id,
+                    'name': work.name,
+                    'code': work.code
                 }
                 for work in batch_works
             ],
@@ -143,6 +160,19 @@ class WorksToPackagesAssigner:
             'batch_number': batch_num + 1
         }
         
+        # Чекпоинт: батч с теми же работами уже распределен в прерванном запуске
+        batch_response_path = os.path.join(agent_folder, f"batch_{batch_num+1:03d}_response.json")
+        key = checkpoint_key(input_data, prompt_template)
+        checkpoint = load_checkpoint(batch_response_path, key)
+        if checkpoint is not None:
+            try:
+                assignments = self._process_batch_response(checkpoint['response'], batch_works)
+                self._validate_package_ids(assignments, work_breakdown_structure)
+                logger.info(f"♻️ Батч {batch_num + 1} взят из чекпоинта, запрос к LLM не нужен")
+                return assignments
+            except Exception as e:
+                logger.warning(f"⚠️ Чекпоинт батча {batch_num + 1} не прошел проверку, повторяем запрос: {e}")
+        
         # Формируем запрос для LLM
         system_instruction, user_prompt = self._format_prompt(input_data, prompt_template)
 
@@ -162,8 +192,7 @@ class WorksToPackagesAssigner:
             }
         }
         batch_input_path = os.path.join(agent_folder, f"batch_{batch_num+1:03d}_input.json")
-        with open(batch_input_path, 'w', encoding='utf-8') as f:
-            json.dump(debug_data, f, ensure_ascii=False, indent=2)
+        await artifact_writer.write_async(batch_input_path, debug_data)
 
         # Вызываем Gemini API с system_instruction и user_prompt
         logger.info(f"📡 Отправка батча {batch_num + 1} в Claude (works_to_packages -> claude-3.5-sonnet)")
@@ -173,10 +202,8 @@ class WorksToPackagesAssigner:
             agent_name="works_to_packages"
         )
         
-        # Сохраняем ответ от LLM
-        batch_response_path = os.path.join(agent_folder, f"batch_{batch_num+1:03d}_response.json")
-        with open(batch_response_path, 'w', encoding='utf-8') as f:
-            json.dump(gemini_response, f, ensure_ascii=False, indent=2)
+        # Сохраняем ответ от LLM (он же чекпоинт батча)
+        save_checkpoint(batch_response_path, key, gemini_response)
         
         if not gemini_response.get('success', False):
             logger.error(f"Ошибка Claude API для батча {batch_num + 1}: {gemini_response.get('error')}")
@@ -260,9 +287,9 @@ class WorksToPackagesAssigner:
 
         return system_instruction, user_prompt
     
-    def _process_batch_response(self, llm_response: Any, original_works: List[Dict]) -> List[Dict]:
+    def _process_batch_response(self, llm_response: Any, original_works: List[WorkItem]) -> List[WorkItem]:
         """
-        Обрабатывает ответ от LLM для батча
+        Обрабатывает ответ от LLM для батча: package_id записывается в работы батча
         """
         try:
             if isinstance(llm_response, str):
@@ -275,29 +302,33 @@ class WorksToPackagesAssigner:
             # Создаем словарь для быстрого поиска
             assignment_dict = {assign['work_id']: assign['package_id'] for assign in assignments}
             
-            # Обновляем оригинальные работы
-            updated_works = []
+            # Сначала проверяем, что назначены все работы, затем обновляем их
             for work in original_works:
-                work_copy = work.copy()
-                work_id = work.get('id')
-                
-                if work_id in assignment_dict:
-                    work_copy['package_id'] = assignment_dict[work_id]
-                else:
+                if work.id not in assignment_dict:
                     # НИКАКОГО FALLBACK! Ошибка должна быть ошибкой!
-                    logger.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА: Не найдено назначение для работы {work_id}")
-                    raise Exception(f"Claude не назначил пакет для работы {work_id}. Проверьте промпт и ответ LLM.")
-                
-                updated_works.append(work_copy)
+                    logger.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА: Не найдено назначение для работы {work.id}")
+                    raise Exception(f"Claude не назначил пакет для работы {work.id}. Проверьте промпт и ответ LLM.")
+            
+            for work in original_works:
+                work.package_id = assignment_dict[work.id]
             
-            return updated_works
+            return original_works
             
         except (json.JSONDecodeError, KeyError, AttributeError) as e:
             logger.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА парсинга ответа LLM для батча: {e}")
             logger.error(f"Сырой ответ от Claude: {llm_response}")
             raise Exception(f"Не удалось распарсить ответ от Claude для батча: {e}")
     
-    def _update_truth_data(self, truth_data: Dict, assigned_works: List[Dict], truth_path: str):
+    def _validate_package_ids(self, assigned_works: List[WorkItem], work_breakdown_structure: List[Dict]):
+        """
+        Проверяет, что работы назначены только в существующие пакеты
+        """
+        package_ids = {item.get('id') for item in work_breakdown_structure}
+        unknown = {work.package_id for work in assigned_works} - package_ids
+        if unknown:
+            raise Exception(f"Назначены несуществующие пакеты: {sorted(unknown)}")
+    
+    def _update_truth_data(self, truth_data: Dict, assigned_works: List[Dict], store: TruthStore):
         """
         Обновляет true.json с результатами назначений
         """
@@ -323,24 +354,25 @@ class WorksToPackagesAssigner:
             'assigned_at': datetime.now().isoformat()
         }
         
-        # Сохраняем обновленный файл
-        with open(truth_path, 'w', encoding='utf-8') as f:
-            json.dump(truth_data, f, ensure_ascii=False, indent=2)
+        # Запись - при сохранении хранилища на границе этапа
+        store.mark_dirty('source_work_items', 'results.package_assignments')
 
 # Функция для запуска агента из внешнего кода
-async def run_works_to_packages(project_path: str, batch_size: int = 50) -> Dict[str, Any]:
+async def run_works_to_packages(project_path: str, batch_size: int = 50,
+                                truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
     """
     Запускает агента works_to_packages для указанного проекта
     
     Args:
         project_path: Путь к папке проекта
         batch_size: Размер батча для обработки
+        truth_store: Общее хранилище true.json запуска пайплайна
         
     Returns:
         Результат работы агента
     """
     agent = WorksToPackagesAssigner(batch_size=batch_size)
-    return await agent.process(project_path)
+    return await agent.process(project_path, truth_store)
 
 if __name__ == "__main__":
     # Тестирование агента
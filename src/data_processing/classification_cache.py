@@ -0,0 +1,172 @@
+"""
+Кэш классификации для HerZog v3.0
+Задача: Не отправлять в LLM позиции, которые уже классифицировались в прошлых проектах (Шаг 2 пайплайна)
+
+Ключ - нормализованные шифр + наименование позиции. Хранится итоговая классификация
+и обоснование LLM. Каждая запись помечена версией: хэш промпта классификатора
++ CLASSIFICATION_CACHE_VERSION, поэтому правка промпта делает старые записи промахами.
+Записи старше TTL тоже считаются промахами.
+
+Записи разных версий хранятся рядом (ключ + версия), чтобы процессы с разными
+версиями промпта не стирали кэш друг друга; версия фильтруется при чтении.
+Устаревшие записи удаляет только evict_expired (по TTL), например при обслуживании:
+    python -m src.data_processing.classification_cache
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.getenv('CACHE_DIR', 'cache'), 'classification.sqlite3')
+DEFAULT_TTL_SECONDS = int(os.getenv('CLASSIFICATION_CACHE_TTL_DAYS', '180')) * 24 * 3600
+
+# Увеличивать при изменении логики классификации, не отраженной в тексте промпта (модель, разбор ответа)
+CLASSIFICATION_CACHE_VERSION = '1'
+
+PROMPT_PATH = os.path.join(os.path.dirname(__file__), '../prompts/gemini_classification_prompt.txt')
+
+_SPACES = re.compile(r'\s+')
+
+
+def prompt_version(prompt_path: str = PROMPT_PATH) -> str:
+    """Версия записей кэша: хэш текста промпта и CLASSIFICATION_CACHE_VERSION"""
+    digest = hashlib.sha256(CLASSIFICATION_CACHE_VERSION.encode('utf-8'))
+    try:
+        with open(prompt_path, 'rb') as f:
+            digest.update(f.read())
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось прочитать промпт классификатора для версии кэша: {e}")
+    return digest.hexdigest()[:16]
+
+
+def make_item_key(item: Dict) -> str:
+    """
+    Ключ позиции: шифр и наименование без учета регистра, лишних пробелов и ё/е
+    """
+    code = _SPACES.sub(' ', str(item.get('code') or '')).strip().upper()
+    name = _SPACES.sub(' ', str(item.get('name') or '')).strip().lower().replace('ё', 'е')
+    return f"{code}|{name}"
+
+
+class ClassificationCache:
+    """
+    Постоянный кэш LLM-классификации в SQLite, общий для всех проектов
+
+    Ошибки базы не прерывают классификацию: get возвращает промахи, put пропускается.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, version: Optional[str] = None,
+                 ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.db_path = db_path
+        self.version = version or prompt_version()
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        try:
+            with closing(self._connect()) as conn, conn:
+                # Таблица первой схемы (ключ без версии) пересоздается один раз - это только кэш
+                primary_key = {row[1]: row[5] for row in conn.execute("PRAGMA table_info(classifications)")}
+                if primary_key and not primary_key.get('version'):
+                    conn.execute("DROP TABLE classifications")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS classifications ("
+                    " key TEXT NOT NULL,"
+                    " classification TEXT NOT NULL,"
+                    " reasoning TEXT NOT NULL,"
+                    " version TEXT NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " PRIMARY KEY (key, version))"
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Не удалось открыть кэш классификации {self.db_path}: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_many(self, items: List[Dict]) -> Dict[str, Dict]:
+        """
+        Результаты из кэша для позиций
+
+        Returns:
+            Словарь {ключ позиции: {"classification": str, "reasoning": str}} только для попаданий
+        """
+        keys = list({make_item_key(item) for item in items})
+        if not keys:
+            return {}
+
+        min_created_at = time.time() - self.ttl_seconds
+        found = {}
+
+        try:
+            with closing(self._connect()) as conn, conn:
+                # Порциями, чтобы не упереться в лимит параметров SQLite
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, classification, reasoning FROM classifications "
+                        f"WHERE key IN ({placeholders}) AND version = ? AND created_at >= ?",
+                        (*chunk, self.version, min_created_at)
+                    )
+                    for key, classification, reasoning in rows:
+                        found[key] = {'classification': classification, 'reasoning': reasoning}
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Ошибка чтения кэша классификации: {e}")
+            return {}
+
+        return found
+
+    def put_many(self, results: Dict[str, Dict]) -> None:
+        """
+        Сохраняет результаты LLM
+
+        Args:
+            results: Словарь {ключ позиции: {"classification": str, "reasoning": str}}
+        """
+        now = time.time()
+        rows = [
+            (key, result['classification'], result.get('reasoning') or '', self.version, now)
+            for key, result in results.items()
+            # Неопределенные позиции не кэшируем - пусть LLM попробует снова
+            if result.get('classification') and result['classification'] != 'Неопределенное'
+        ]
+        if not rows:
+            return
+
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Не удалось записать кэш классификации: {e}")
+
+    def evict_expired(self) -> int:
+        """
+        Удаляет записи старше TTL всех версий (обслуживание базы, не вызывается при классификации)
+
+        Returns:
+            Количество удаленных записей
+        """
+        try:
+            with closing(self._connect()) as conn, conn:
+                deleted = conn.execute(
+                    "DELETE FROM classifications WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Не удалось очистить кэш классификации: {e}")
+            return 0
+
+        if deleted:
+            logger.info(f"🗑️ Кэш классификации: удалено {deleted} записей старше TTL")
+        return deleted
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ClassificationCache().evict_expired()
@@ -4,16 +4,58 @@
 классифицирует каждую позицию и обогащает ее дополнительными данными из API "Сметного Дела".
 """
 
-import requests
 import logging
 import os
+import re
 from typing import List, Dict, Optional
+
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
 
+from .classification_cache import ClassificationCache, make_item_key
+from .local_model import CONFIDENCE_THRESHOLD as LOCAL_MODEL_THRESHOLD, load_default_model
+from .normative_index import NormativeIndex, open_default_index
+from .smetnoedelo_client import SmetnoedeloCache, SmetnoedeloClient
+
 # Импортируем после определения функций внизу файла
 
 load_dotenv()
 
+SMETNOEDELO_ENABLED = os.getenv('SMETNOEDELO_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+
+# Шаг 2.1: Префиксы шифров работ и материалов
+WORK_PREFIXES = ['ГЭСН', 'ТЕР', 'ТЕРм', 'ТЕРр', 'ФЕР', 'ГЭСНМ', 'ГЭСНР', 'ГЭСНП', 'ГЭСНМР']
+MATERIAL_PREFIXES = ['ФСБЦ', 'ТССЦ', 'ТЦ', 'ФССЦ', 'ФССЦм', 'ФССЦо']
+
+# Шаг 2.2: Ключевые слова "Иное" в наименовании
+OTHER_KEYWORDS = [
+    'накладные расходы', 'сметная прибыль', 'вспомогательные ресурсы',
+    'на каждые', 'итого', 'всего', 'транспорт', 'доставка материала'
+]
+
+
+def _alternation(words: List[str]) -> str:
+    # Длинные варианты первыми, чтобы альтернатива не обрывалась на коротком префиксе
+    return '|'.join(re.escape(word) for word in sorted(set(words), key=len, reverse=True))
+
+
+# Шифр сравнивается в верхнем регистре, поэтому и префиксы приводятся к нему
+WORK_PREFIX_PATTERN = re.compile(_alternation([prefix.upper() for prefix in WORK_PREFIXES]))
+MATERIAL_PREFIX_PATTERN = re.compile(_alternation([prefix.upper() for prefix in MATERIAL_PREFIXES]))
+OTHER_KEYWORD_PATTERN = re.compile(_alternation(OTHER_KEYWORDS))
+
+# Шаг 3.4.3: Нормализация наименований для дедупликации перед LLM
+UNITS = [
+    'м3', 'м2', 'м³', 'м²', 'м', 'км', 'мм', 'см', 'т', 'тн', 'кг', 'г', 'шт', 'компл', 'кмп', 'ед',
+    'л', 'маш.-ч', 'маш-ч', 'маш.ч', 'чел.-ч', 'чел-ч', 'чел.ч', 'ч', 'руб', 'тыс', '%'
+]
+NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*')
+# Единица - отдельное слово, в том числе после удаленного числа ("12,5т" -> " т")
+UNIT_PATTERN = re.compile(r'(?<![\w])(?:' + _alternation(UNITS) + r')(?![\w])\.?')
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]|_')
+
 
 def classify_locally(item: Dict) -> Optional[str]:
     """
@@ -26,135 +68,144 @@ def classify_locally(item: Dict) -> Optional[str]:
         "Работа", "Материал", "Иное" или None
     """
     code = item.get('code', '').upper().strip()
-    name = item.get('name', '').lower().strip()
     
     # Шаг 2.1: Классификация по шифру
-    work_prefixes = ['ГЭСН', 'ТЕР', 'ТЕРм', 'ТЕРр', 'ФЕР', 'ГЭСНМ', 'ГЭСНР', 'ГЭСНП', 'ГЭСНМР']
-    material_prefixes = ['ФСБЦ', 'ТССЦ', 'ТЦ', 'ФССЦ', 'ФССЦм', 'ФССЦо']
+    if WORK_PREFIX_PATTERN.match(code):
+        return "Работа"
     
-    for prefix in work_prefixes:
-        if code.startswith(prefix):
-            return "Работа"
-    
-    for prefix in material_prefixes:
-        if code.startswith(prefix):
-            return "Материал"
+    if MATERIAL_PREFIX_PATTERN.match(code):
+        return "Материал"
     
     # Шаг 2.2: Классификация на "Иное" по ключевым словам в названии
-    other_keywords = [
-        'накладные расходы', 'сметная прибыль', 'вспомогательные ресурсы',
-        'на каждые', 'итого', 'всего', 'транспорт', 'доставка материала'
-    ]
-    
-    for keyword in other_keywords:
-        if keyword in name:
-            return "Иное"
+    if OTHER_KEYWORD_PATTERN.search(item.get('name', '').lower().strip()):
+        return "Иное"
     
     return None
 
 
-def get_smetnoedelo_data(code: str, api_token: str) -> Optional[Dict]:
+def classify_locally_frame(df: pd.DataFrame) -> pd.Series:
     """
-    ВРЕМЕННО ОТКЛЮЧЕНО - API токен исчерпан
+    Локальная классификация всей таблицы за один проход по строковым колонкам
+    
+    Результат совпадает с classify_locally для каждой строки.
+    
+    Args:
+        df: Таблица позиций с колонками code и name
+        
+    Returns:
+        Series с "Работа", "Материал", "Иное" или None (индекс как у df)
     """
-    return None  # Временно отключаем API пока не получите новый токен
+    codes = df['code'].fillna('').astype(object).str.upper().str.strip()
+    names = df['name'].fillna('').astype(object).str.lower().str.strip()
+    
+    is_work = codes.str.match(WORK_PREFIX_PATTERN.pattern, na=False).to_numpy(dtype=bool)
+    is_material = codes.str.match(MATERIAL_PREFIX_PATTERN.pattern, na=False).to_numpy(dtype=bool)
+    is_other = names.str.contains(OTHER_KEYWORD_PATTERN.pattern, regex=True, na=False).to_numpy(dtype=bool)
+    
+    # Порядок присваивания задает приоритет правил: шифр работы > шифр материала > ключевое слово
+    classes = np.full(len(df), None, dtype=object)
+    classes[is_other] = "Иное"
+    classes[is_material] = "Материал"
+    classes[is_work] = "Работа"
+    return pd.Series(classes, index=df.index, dtype=object)
 
-def get_smetnoedelo_data_ORIGINAL(code: str, api_token: str) -> Optional[Dict]:
+
+def classify_locally_batch(items: List[Dict]) -> List[Optional[str]]:
     """
-    Получение данных из API "Сметного Дела"
+    Локальная классификация master_list (см. classify_locally_frame)
     
     Args:
-        code: Шифр расценки
-        api_token: API токен
+        items: Позиции сметы
         
     Returns:
-        Словарь с данными или None при ошибке
+        Список классов в порядке items
     """
-    try:
-        # Определяем базу по коду (согласно документации API)
-        code_upper = code.upper()
-        
-        base_mapping = {
-            'ГЭСН': 'gesn',
-            'ГЭСНм': 'gesnm', 
-            'ГЭСНмр': 'gesnmr',
-            'ГЭСНп': 'gesnp',
-            'ГЭСНр': 'gesnr',
-            'ФЕР': 'fer',
-            'ФЕРм': 'ferm',
-            'ФЕРмр': 'fermr', 
-            'ФЕРп': 'ferp',
-            'ФЕРр': 'ferr',
-            'ТЕР': 'gesn',  # Территориальные расценки обычно в ГЭСН
-            # Материалы - пока не работают в API
-            'ФСБЦ': 'fsbcm',
-            'ФССЦм': 'fsscm',
-            'ФССЦо': 'fssco',
-            'ФСЭМ': 'fsem'
-        }
-        
-        base = None
-        for prefix, base_code in base_mapping.items():
-            if code_upper.startswith(prefix):
-                base = base_code
-                break
-        
-        if not base:
-            logging.warning(f"Не удалось определить базу для кода {code}")
-            return None
-        
-        # Запрос к API (правильный формат из test_api.py)
-        url = "https://cs.smetnoedelo.ru/api/"
-        params = {
-            'token': api_token,
-            'base': base,
-            'code': code
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Проверяем на ошибки в ответе
-            if data.get('error'):
-                logging.warning(f"API вернул ошибку для кода {code}: {data.get('error')}")
-                return None
-            
-            # Извлекаем иерархию из TREE структуры (новый формат API)
-            hierarchy_parts = []
-            tree_data = data.get('TREE', [])
-            for item in tree_data:
-                if 'NAME' in item:
-                    hierarchy_parts.append(item['NAME'])
-            
-            result = {
-                'official_name': data.get('BASE_NAME', '')  # Используем BASE_NAME вместо NAME
-            }
-            
-            
-            logging.info(f"API успешно вернул данные для {code}: {result['official_name']}")
-            return result
-        
-        elif response.status_code == 404:
-            logging.warning(f"Код {code} не найден в API Сметного Дела")
-            return None
+    if not items:
+        return []
+    
+    df = pd.DataFrame({
+        'code': [item.get('code', '') for item in items],
+        'name': [item.get('name', '') for item in items]
+    }, dtype=object)
+    return classify_locally_frame(df).tolist()
+
+
+def normalize_name_for_dedup(name: str) -> str:
+    """
+    Наименование без регистра, чисел, единиц измерения и пунктуации
+    
+    "Погрузка мусора 12,5 т" и "погрузка  мусора - 3 т" дают один ключ.
+    """
+    normalized = name.lower().replace('ё', 'е')
+    normalized = NUMBER_PATTERN.sub(' ', normalized)
+    normalized = UNIT_PATTERN.sub(' ', normalized)
+    normalized = PUNCTUATION_PATTERN.sub(' ', normalized)
+    return ' '.join(normalized.split())
+
+
+def group_by_normalized_name(items: List[Dict]) -> List[List[Dict]]:
+    """
+    Группы позиций с одинаковым нормализованным наименованием (в порядке первого появления)
+    
+    Позиции, у которых от наименования ничего не осталось, не группируются.
+    """
+    groups = {}
+    for i, item in enumerate(items):
+        key = normalize_name_for_dedup(str(item.get('name') or '')) or f"#{i}"
+        groups.setdefault(key, []).append(item)
+    return list(groups.values())
+
+
+async def enrich_official_names(classified_list: List[Dict], api_token: Optional[str] = None,
+                                normative_index: Optional[NormativeIndex] = None) -> int:
+    """
+    Шаг 3.3: Официальные наименования работ из справочника нормативов и API "Сметного Дела"
+    
+    Сначала шифры ищутся в локальном справочнике, в API уходят только ненайденные.
+    Все уникальные шифры запрашиваются параллельно, ответы кэшируются между проектами.
+    
+    Args:
+        classified_list: Позиции после локальной классификации (изменяются на месте)
+        api_token: API токен (None - без обращения к API)
+        normative_index: Офлайн-справочник нормативов
         
-        else:
-            logging.error(f"Ошибка API Сметного Дела: {response.status_code}")
-            return None
-            
-    except Exception as e:
-        logging.error(f"Ошибка при запросе к API Сметного Дела для кода {code}: {str(e)}")
-        return None
+    Returns:
+        Количество позиций с обновленным наименованием
+    """
+    work_items = [item for item in classified_list if item['classification'] == "Работа" and item.get('code')]
+    if not work_items:
+        return 0
+    
+    official_names = {}
+    if normative_index is not None:
+        for code in dict.fromkeys(item['code'] for item in work_items):
+            entry = normative_index.lookup(code)
+            if entry:
+                official_names[code] = entry['official_name']
+    
+    missing_codes = [item['code'] for item in work_items if item['code'] not in official_names]
+    if missing_codes and api_token:
+        async with SmetnoedeloClient(api_token, cache=SmetnoedeloCache()) as client:
+            official_names.update(await client.enrich(missing_codes))
+    
+    updated_count = 0
+    for item in work_items:
+        official_name = official_names.get(item['code'])
+        if official_name:
+            item['name'] = official_name
+            updated_count += 1
+    
+    return updated_count
 
 
-async def classify_items(master_list: List[Dict], progress_callback=None, project_dir: str = None) -> List[Dict]:
+async def classify_items(master_list: List[Dict], progress_callback=None, project_dir: str = None,
+                         cache: Optional[ClassificationCache] = None) -> List[Dict]:
     """
     Главная функция модуля CLASSIFIER
     
     Args:
         master_list: Результат работы модуля EXTRACTOR
+        cache: Кэш классификации между проектами; найденные в нем позиции не идут в LLM
         
     Returns:
         classified_list: Список с классифицированными позициями
@@ -165,37 +216,21 @@ async def classify_items(master_list: List[Dict], progress_callback=None, projec
     if not api_token:
         logging.error("Не найден API ключ SMETNOEDELO_API_KEY")
         logging.info("Работаю только с локальной классификацией без API обогащения")
+    elif not SMETNOEDELO_ENABLED:
+        # API токен исчерпан - обогащение включается через SMETNOEDELO_ENABLED=1
+        logging.info("Обогащение через API Сметного Дела отключено (SMETNOEDELO_ENABLED)")
     
-    # Кэш для API запросов
-    api_cache = {}
     total_items = len(master_list)
     
-    for i, item in enumerate(master_list):
+    # Шаг 3.1: Локальная классификация - одним проходом по всему списку
+    local_classes = classify_locally_batch(master_list)
+    
+    for i, (item, classification) in enumerate(zip(master_list, local_classes)):
         # Создаем копию элемента для обработки
         classified_item = item.copy()
         
-        # Шаг 3.1: Локальная классификация
-        classification = classify_locally(item)
-        
         if classification:
             classified_item['classification'] = classification
-            
-            # Шаг 3.3: Обогащение данными из API для работ (только если есть API ключ)
-            if classification == "Работа" and api_token:
-                code = item.get('code', '')
-                
-                # Проверяем кэш
-                if code in api_cache:
-                    api_data = api_cache[code]
-                else:
-                    api_data = get_smetnoedelo_data(code, api_token)
-                    api_cache[code] = api_data
-                
-                if api_data:
-                    # Обновляем официальное наименование если получено из API
-                    if api_data['official_name']:
-                        classified_item['name'] = api_data['official_name']
-        
         else:
             # Помечаем как неопределенное для последующей групповой обработки через Gemini
             classified_item['classification'] = "Неопределенное"
@@ -206,52 +241,112 @@ async def classify_items(master_list: List[Dict], progress_callback=None, projec
         if progress_callback and i % 5 == 0:  # Каждые 5 элементов
             progress_callback(i + 1, total_items)
     
+    # Шаг 3.3: Обогащение работ из справочника нормативов и API (только если есть API ключ)
+    normative_index = open_default_index()
+    enrich_token = api_token if SMETNOEDELO_ENABLED else None
+    
+    if normative_index is not None or enrich_token:
+        try:
+            updated_count = await enrich_official_names(classified_list, enrich_token, normative_index)
+            logging.info(f"Официальные наименования: обновлено работ - {updated_count}")
+        finally:
+            if normative_index is not None:
+                normative_index.close()
+    
     # Шаг 3.4: Групповая обработка неопределенных позиций И "Иное" через Gemini
     # Теперь отправляем в Gemini всё что не "Работа" и не "Материал"
     undefined_items = [item for item in classified_list if item['classification'] in ['Неопределенное', 'Иное']]
     
     if undefined_items:
-        logging.info(f"Отправляю {len(undefined_items)} позиций в Claude для анализа ('Иное' + 'Неопределенные')")
-        
         try:
             from .gemini_classifier import classify_with_gemini, convert_gemini_result
             
-            # Подготавливаем данные для Gemini (только код и название)
-            gemini_input = []
-            item_mapping = {}
-            
-            for i, item in enumerate(undefined_items):
-                gemini_input.append({
-                    'code': item.get('code', ''),
-                    'name': item.get('name', '')
-                })
-                item_mapping[i] = item
+            # Шаг 3.4.1: Позиции, уже классифицированные в прошлых проектах, берем из кэша
+            if cache is not None:
+                cached_results = cache.get_many(undefined_items)
+                pending_items = []
+                
+                for item in undefined_items:
+                    cached_result = cached_results.get(make_item_key(item))
+                    if cached_result:
+                        item.update(convert_gemini_result(cached_result))
+                    else:
+                        pending_items.append(item)
+                
+                logging.info(f"💾 Кэш классификации: {len(undefined_items) - len(pending_items)} "
+                             f"из {len(undefined_items)} позиций")
+                undefined_items = pending_items
             
-            # Получаем результаты от Gemini
-            gemini_results = await classify_with_gemini(gemini_input, project_dir)
+            # Шаг 3.4.2: Типовые позиции классифицирует локальная модель, обученная на ответах LLM
+            local_model = load_default_model() if undefined_items else None
+            if local_model is not None:
+                labels, confidences = local_model.predict(undefined_items)
+                pending_items = []
+                
+                for item, label, confidence in zip(undefined_items, labels, confidences):
+                    if confidence >= LOCAL_MODEL_THRESHOLD:
+                        item['classification'] = label
+                        item['local_model_confidence'] = round(float(confidence), 4)
+                    else:
+                        pending_items.append(item)
+                
+                logging.info(f"🧠 Локальная модель: {len(undefined_items) - len(pending_items)} "
+                             f"из {len(undefined_items)} позиций")
+                undefined_items = pending_items
             
-            # Обновляем классификацию для найденных позиций
-            updated_count = 0
-            for item_uuid, gemini_result in gemini_results.items():
-                # item_uuid это ID позиции, которую нужно обновить
-                for classified_item in classified_list:
-                    if classified_item.get('id') == item_uuid:
-
-                        # Конвертируем результат Claude
-                        converted_result = convert_gemini_result(gemini_result)
-
+            if undefined_items:
+                # Шаг 3.4.3: Повторяющиеся позиции отправляем одним представителем группы
+                groups = group_by_normalized_name(undefined_items)
+                
+                # Подготавливаем данные для Gemini (id, код и название); индекс id -> позиции группы
+                gemini_input = []
+                item_mapping = {}
+                
+                for i, members in enumerate(groups):
+                    representative = members[0]
+                    item_id = representative.get('id') or f"item-{i}"
+                    gemini_input.append({
+                        'id': item_id,
+                        'code': representative.get('code', ''),
+                        'name': representative.get('name', '')
+                    })
+                    item_mapping[item_id] = members
+                
+                logging.info(f"Отправляю {len(gemini_input)} уникальных из {len(undefined_items)} позиций в Claude "
+                             f"для анализа ('Иное' + 'Неопределенные')")
+                
+                # Получаем результаты от Gemini
+                gemini_results = await classify_with_gemini(gemini_input, project_dir)
+                
+                # Обновляем классификацию для найденных позиций - результат представителя для всей группы
+                updated_count = 0
+                member_results = {}
+                for item_uuid, gemini_result in gemini_results.items():
+                    # item_uuid это ID представителя группы, которую нужно обновить
+                    members = item_mapping.get(item_uuid)
+                    if members is None:
+                        continue
+                    
+                    # Конвертируем результат Claude
+                    converted_result = convert_gemini_result(gemini_result)
+                    
+                    for classified_item in members:
                         # Обновляем позицию (заменяем "Иное" или "Неопределенное" на результат Claude)
                         old_classification = classified_item.get('classification', 'Неопределенное')
                         classified_item.update(converted_result)
                         new_classification = classified_item.get('classification', 'Неопределенное')
-
-                        logging.debug(f"Обновлено: {old_classification} → {new_classification} для {item_uuid}")
+                        
+                        logging.debug(f"Обновлено: {old_classification} → {new_classification} для {classified_item.get('id')}")
+                        member_results[make_item_key(classified_item)] = gemini_result
                         updated_count += 1
-                        break
-
-            logging.info(f"Claude успешно обновил классификацию для {updated_count} из {len(undefined_items)} позиций")
+                
+                logging.info(f"Claude успешно обновил классификацию для {updated_count} из {len(undefined_items)} позиций")
 
-            logging.info(f"Claude обработал {len(undefined_items)} позиций (включая 'Иное' и 'Неопределенные'), получил результат для {len(gemini_results)} из них")
+                logging.info(f"Claude обработал {len(gemini_input)} позиций (включая 'Иное' и 'Неопределенные'), получил результат для {len(gemini_results)} из них")
+                
+                # Запоминаем ответы LLM для следующих проектов
+                if cache is not None:
+                    cache.put_many(member_results)
             
         except Exception as e:
             logging.error(f"Ошибка при обработке неопределенных позиций через Claude: {e}")
@@ -272,12 +367,13 @@ async def classify_items(master_list: List[Dict], progress_callback=None, projec
     return classified_list
 
 
-async def classify_estimates(input_file: str) -> List[Dict]:
+async def classify_estimates(input_file: str, cache: Optional[ClassificationCache] = None) -> List[Dict]:
     """
     Главная функция для пайплайна - классификация извлеченных данных
     
     Args:
         input_file: Путь к файлу raw_estimates.json
+        cache: Кэш классификации между проектами
         
     Returns:
         Список классифицированных записей
@@ -301,7 +397,7 @@ async def classify_estimates(input_file: str) -> List[Dict]:
                 project_dir = "/".join(parts[:project_idx + 3])
     
     # Классифицируем данные
-    classified_data = await classify_items(raw_data, project_dir=project_dir)
+    classified_data = await classify_items(raw_data, project_dir=project_dir, cache=cache)
     
     logging.info(f"Классификация завершена: {len(classified_data)} записей")
     
@@ -0,0 +1,132 @@
+"""
+Кэш извлечения для HerZog v3.0
+Задача: Не разбирать повторно один и тот же Excel-файл сметы (Шаг 1 пайплайна)
+
+Ключ - SHA-256 содержимого книги + версия extractor + режим извлечения,
+поэтому переименованный или повторно загруженный файл дает попадание в кэш,
+а любое изменение логики extractor (EXTRACTOR_VERSION) - промах.
+Размер кэша ограничен, при переполнении удаляются давно не использованные записи (LRU).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.getenv('CACHE_DIR', 'cache'), 'extraction')
+DEFAULT_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '512')) * 1024 * 1024
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 содержимого файла (читается блоками)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Дисковый content-addressed кэш результатов extractor
+
+    Хранит строки сметы без id и source_file: они зависят от имени файла
+    и проставляются заново при чтении из кэша.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, file_path: str, version: str, variant: str = '') -> str:
+        """
+        Ключ кэша для файла
+
+        Args:
+            file_path: Путь к XLSX файлу
+            version: Версия логики extractor
+            variant: Режим извлечения, влияющий на результат (например, все листы или первый)
+        """
+        return hashlib.sha256(f"{file_sha256(file_path)}|{version}|{variant}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """
+        Строки сметы из кэша или None при промахе
+        """
+        entry_path = self._entry_path(key)
+
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"⚠️ Поврежденная запись кэша извлечения {key[:12]}: {e}")
+            self._remove(entry_path)
+            return None
+
+        # Время доступа для LRU храним в mtime записи
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+        return rows
+
+    def put(self, key: str, rows: List[Dict]) -> None:
+        """
+        Сохраняет строки сметы (атомарно: временный файл + rename) и применяет лимит размера
+        """
+        entry_path = self._entry_path(key)
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(rows, f, ensure_ascii=False)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось записать кэш извлечения: {e}")
+            return
+
+        self._evict()
+
+    def _evict(self) -> None:
+        """Удаляет давно не использованные записи, пока кэш больше max_bytes"""
+        entries = []
+        total_bytes = 0
+
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith('.json'):
+                continue
+            entry_path = os.path.join(self.cache_dir, file_name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+            total_bytes += stat.st_size
+
+        if total_bytes <= self.max_bytes:
+            return
+
+        for _, size, entry_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(entry_path)
+            total_bytes -= size
+            logger.info(f"🗑️ Кэш извлечения: удалена запись {os.path.basename(entry_path)}")
+
+    @staticmethod
+    def _remove(entry_path: str) -> None:
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
@@ -1,14 +1,55 @@
 """
 Модуль EXTRACTOR для HerZog v3.0
 Задача: Извлечение сырых данных из Excel-файлов смет (Шаг 1 пайплайна)
+
+Потоковый режим (streaming) ограничивает память только на чтении листа: строки
+идут из openpyxl read_only по одной, без DataFrame и без загрузки книги целиком.
+Итоговые записи по-прежнему собираются в список (шагам 2-3 и сквозной проверке
+уникальности ID нужен весь список), поэтому пиковая память растет с числом
+записей сметы - но это компактные словари, а не лист Excel в памяти.
+Без накопления записи отдает только iter_records_from_file.
 """
 
+import numpy as np
 import pandas as pd
-import uuid
 import os
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Iterator, Sequence, Any
 import logging
 
+from openpyxl import load_workbook
+from pandas._libs.parsers import STR_NA_VALUES
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from .extraction_cache import ExtractionCache
+from ..shared.work_ids import make_work_id, unique_work_id, assign_unique_ids
+
+# Версия логики извлечения - входит в ключ кэша, повышать при любом изменении результата
+EXTRACTOR_VERSION = '3.2'
+# Колонки итоговой записи: поле -> индекс колонки в листе сметы
+RECORD_COLUMNS = {'position_num': 0, 'code': 1, 'name': 2, 'unit': 7, 'quantity': 8}
+HEADER_TOKENS = ('п/п', 'обоснование', 'наименование')
+HEADER_CHUNK_ROWS = 1000
+# Все, что может принять float(): пробелы, знак, цифры (в т.ч. не-ASCII), точка, "_", e, nan, inf(inity)
+FLOAT_CANDIDATE = r'\s*[+-]?[\d._eEnNaAiIfFtTyY]+\s*'
+
+
+def is_header_row(cells: Sequence[Any]) -> bool:
+    """
+    Проверить, является ли строка заголовком таблицы ("№ п/п", "Обоснование", "Наименование")
+    
+    Args:
+        cells: Значения ячеек строки
+        
+    Returns:
+        True если строка - заголовок таблицы сметы
+    """
+    row_text = ' '.join([str(cell).lower() for cell in cells if pd.notna(cell) and str(cell).strip()])
+    
+    return ('№ п/п' in row_text or 'п/п' in row_text or '№п/п' in row_text) and \
+           ('обоснование' in row_text) and \
+           ('наименование' in row_text)
+
 
 def find_table_header(df: pd.DataFrame) -> Optional[int]:
     """
@@ -21,11 +62,7 @@ def find_table_header(df: pd.DataFrame) -> Optional[int]:
         Номер строки-заголовка или None если не найдено
     """
     for i, row in df.iterrows():
-        row_text = ' '.join([str(cell).lower() for cell in row if pd.notna(cell) and str(cell).strip()])
-        
-        if ('№ п/п' in row_text or 'п/п' in row_text or '№п/п' in row_text) and \
-           ('обоснование' in row_text) and \
-           ('наименование' in row_text):
+        if is_header_row(row):
             return i
     
     return None
@@ -43,10 +80,18 @@ def is_valid_row(row: pd.Series, position_col_idx: int = 0) -> bool:
     Returns:
         True если строка содержит валидные данные сметы
     """
+    return is_valid_values(list(row), position_col_idx)
+
+
+def is_valid_values(row: Sequence[Any], position_col_idx: int = 0) -> bool:
+    """
+    То же, что is_valid_row, но для простой последовательности значений
+    (используется потоковым извлечением без DataFrame)
+    """
     if len(row) <= position_col_idx:
         return False
         
-    position_value = row.iloc[position_col_idx]
+    position_value = row[position_col_idx]
     
     if pd.isna(position_value):
         return False
@@ -58,15 +103,15 @@ def is_valid_row(row: pd.Series, position_col_idx: int = 0) -> bool:
         return False
     
     # Проверяем второю колонку - должна быть не просто число
-    if len(row) > 1 and pd.notna(row.iloc[1]):
-        code_value = str(row.iloc[1]).strip()
+    if len(row) > 1 and pd.notna(row[1]):
+        code_value = str(row[1]).strip()
         
         # Исключаем строки где вторая колонка - просто число
         try:
             float(code_value)
             # Если это просто число, проверяем есть ли осмысленное содержимое в других колонках
-            if len(row) > 2 and pd.notna(row.iloc[2]):
-                name_value = str(row.iloc[2]).strip()
+            if len(row) > 2 and pd.notna(row[2]):
+                name_value = str(row[2]).strip()
                 # Если третья колонка тоже просто число - это мусорная строка
                 try:
                     float(name_value)
@@ -79,57 +124,190 @@ def is_valid_row(row: pd.Series, position_col_idx: int = 0) -> bool:
     return True
 
 
-def extract_from_file(file_path: str) -> List[Dict]:
+def make_record(file_name: str, sheet_name: str, position_num: str, code: str,
+                name: str, unit: str, quantity: str) -> Dict:
+    """
+    Запись сметы с ID, выведенным из ее содержимого (см. shared.work_ids)
+    
+    Суффикс для полностью совпадающих строк добавляет assign_unique_ids
+    на уровне итогового списка.
+    """
+    return {
+        'id': make_work_id(file_name, sheet_name, position_num, code, name, unit, quantity),
+        'source_file': file_name,
+        'source_sheet': sheet_name,
+        'position_num': position_num,
+        'code': code,
+        'name': name,
+        'unit': unit,
+        'quantity': quantity
+    }
+
+
+def build_record(row: Sequence[Any], file_name: str, sheet_name: str = '') -> Dict:
+    """
+    Собрать запись сметы из значений валидной строки
+    
+    Args:
+        row: Значения ячеек строки
+        file_name: Имя исходного файла
+        sheet_name: Имя листа книги
+        
+    Returns:
+        Плоский словарь позиции со стабильным ID
+    """
+    def cell(idx: int) -> str:
+        return str(row[idx]) if len(row) > idx and pd.notna(row[idx]) else ""
+    
+    return make_record(file_name, sheet_name, *(cell(idx) for idx in RECORD_COLUMNS.values()))
+
+
+def _cacheable_rows(records: List[Dict]) -> List[Dict]:
+    """Записи без полей, зависящих от имени файла (для кэша)"""
+    return [
+        {'source_sheet': record['source_sheet'], **{field: record[field] for field in RECORD_COLUMNS}}
+        for record in records
+    ]
+
+
+def _records_from_cache(rows: List[Dict], file_name: str) -> List[Dict]:
+    """Восстановить записи из кэша в том же формате, что дает build_record"""
+    return assign_unique_ids([
+        make_record(file_name, row['source_sheet'], *(row[field] for field in RECORD_COLUMNS))
+        for row in rows
+    ])
+
+
+def _normalize_cell(value: Any) -> Any:
+    """
+    Привести значение ячейки openpyxl к виду, который дает pd.read_excel,
+    чтобы потоковый режим давал те же строки, что и режим DataFrame
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return None if value in STR_NA_VALUES else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def list_sheet_names(file_path: str) -> List[str]:
+    """
+    Имена листов книги в порядке следования (без чтения самих листов)
+    """
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _sheet_rows(sheet) -> Iterator[List[Any]]:
+    """Нормализованные значения строк листа книги, открытой в режиме read_only"""
+    # Размеры листа в read_only берутся из XML и бывают неверными
+    sheet.reset_dimensions()
+    for values in sheet.iter_rows(values_only=True):
+        yield [_normalize_cell(value) for value in values]
+
+
+def iter_sheet_rows(file_path: str, sheet_name: Optional[str] = None) -> Iterator[List[Any]]:
+    """
+    Лениво читать строки листа через openpyxl в режиме read_only
+    
+    Args:
+        file_path: Путь к XLSX файлу
+        sheet_name: Имя листа (по умолчанию первый лист)
+        
+    Yields:
+        Список нормализованных значений ячеек строки
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        yield from _sheet_rows(sheet)
+    finally:
+        workbook.close()
+
+
+def iter_records_from_file(file_path: str) -> Iterator[Dict]:
+    """
+    Потоковое извлечение записей из первого листа XLSX файла
+    
+    Книга открывается один раз, строки читаются лениво, заголовок ищется той
+    же логикой, что и в find_table_header, а записи отдаются по одной - память
+    не зависит от размера листа, если вызывающий код не накапливает записи
+    (extract_from_file и extract_sheet накапливают). Исключения пробрасываются
+    вызывающему коду.
+    
+    Args:
+        file_path: Путь к XLSX файлу
+        
+    Yields:
+        Словари с извлеченными данными (тот же формат, что у extract_from_file)
+    """
+    file_name = os.path.basename(file_path)
+    header_found = False
+    # ID, уже выданные в этом файле - для суффикса совпадающих строк
+    issued_ids = set()
+    
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        for row in _sheet_rows(sheet):
+            if not header_found:
+                header_found = is_header_row(row)
+                continue
+            
+            if is_valid_values(row):
+                record = build_record(row, file_name, sheet.title)
+                record['id'] = unique_work_id(record['id'], issued_ids)
+                yield record
+    finally:
+        workbook.close()
+    
+    if not header_found:
+        logging.warning(f"Не найден заголовок таблицы в файле {file_path}")
+
+
+def extract_from_file(file_path: str, streaming: bool = False, vectorized: bool = False) -> List[Dict]:
     """
     Извлечь данные из одного XLSX файла
     
     Args:
         file_path: Путь к XLSX файлу
+        streaming: Читать лист построчно через openpyxl read_only вместо pd.read_excel
+                   (без DataFrame листа; записи файла все равно собираются в список)
+        vectorized: Колоночная обработка DataFrame вместо iterrows (без streaming)
         
     Returns:
         Список словарей с извлеченными данными
     """
+    if streaming:
+        try:
+            extracted_data = list(iter_records_from_file(file_path))
+            logging.info(f"Извлечено {len(extracted_data)} записей из файла {os.path.basename(file_path)} (потоковый режим)")
+            return extracted_data
+        except Exception as e:
+            logging.error(f"Ошибка при обработке файла {file_path}: {str(e)}")
+            return []
+    
     try:
-        # Читаем весь лист
-        df = pd.read_excel(file_path, header=None)
+        # Читаем весь первый лист
+        with pd.ExcelFile(file_path) as workbook:
+            sheet_name = workbook.sheet_names[0]
+            df = workbook.parse(sheet_name, header=None)
+        
+        file_name = os.path.basename(file_path)
         
-        # Находим заголовок таблицы
-        header_row = find_table_header(df)
+        if vectorized:
+            extracted_data = extract_records_vectorized(df, file_name, sheet_name)
+        else:
+            extracted_data = extract_records_from_dataframe(df, file_name, sheet_name)
         
-        if header_row is None:
+        if extracted_data is None:
             logging.warning(f"Не найден заголовок таблицы в файле {file_path}")
             return []
-        
-        # Работаем с данными под заголовком
-        data_df = df.iloc[header_row + 1:]
-        
-        extracted_data = []
-        file_name = os.path.basename(file_path)
-        
-        for idx, row in data_df.iterrows():
-            # Проверяем валидность строки
-            if not is_valid_row(row):
-                continue
-            
-            # Извлекаем данные из колонок согласно найденной структуре
-            position_num = str(row.iloc[0]) if len(row) > 0 and pd.notna(row.iloc[0]) else ""
-            code = str(row.iloc[1]) if len(row) > 1 and pd.notna(row.iloc[1]) else ""
-            name = str(row.iloc[2]) if len(row) > 2 and pd.notna(row.iloc[2]) else ""
-            unit = str(row.iloc[7]) if len(row) > 7 and pd.notna(row.iloc[7]) else ""
-            quantity = str(row.iloc[8]) if len(row) > 8 and pd.notna(row.iloc[8]) else ""
-            
-            # Создаем плоский словарь с единым UUID
-            record = {
-                'id': str(uuid.uuid4()),
-                'source_file': file_name,
-                'position_num': position_num,
-                'code': code,
-                'name': name,
-                'unit': unit,
-                'quantity': quantity
-            }
-            
-            extracted_data.append(record)
             
         logging.info(f"Извлечено {len(extracted_data)} записей из файла {file_name}")
         return extracted_data
@@ -139,12 +317,317 @@ def extract_from_file(file_path: str) -> List[Dict]:
         return []
 
 
-def extract_from_files(file_paths: List[str]) -> List[Dict]:
+def extract_records_from_dataframe(df: pd.DataFrame, file_name: str, sheet_name: str = '') -> Optional[List[Dict]]:
+    """
+    Построчное извлечение записей из DataFrame листа сметы
+    
+    Args:
+        df: DataFrame листа (header=None)
+        file_name: Имя исходного файла
+        sheet_name: Имя листа книги
+        
+    Returns:
+        Список записей или None если заголовок таблицы не найден
+    """
+    # Находим заголовок таблицы
+    header_row = find_table_header(df)
+    
+    if header_row is None:
+        return None
+    
+    # Работаем с данными под заголовком
+    data_df = df.iloc[header_row + 1:]
+    
+    extracted_data = []
+    
+    for idx, row in data_df.iterrows():
+        # Проверяем валидность строки
+        if not is_valid_row(row):
+            continue
+        
+        # Извлекаем данные из колонок согласно найденной структуре
+        extracted_data.append(build_record(list(row), file_name, sheet_name))
+    
+    return assign_unique_ids(extracted_data)
+
+
+def _column(df: pd.DataFrame, idx: int) -> pd.Series:
+    """Колонка по позиции; отсутствующая колонка - целиком пустая"""
+    if idx < df.shape[1]:
+        return df.iloc[:, idx]
+    return pd.Series(np.nan, index=df.index, dtype=object)
+
+
+def _as_text(column: pd.Series) -> np.ndarray:
+    """str() каждого значения колонки, как при построчной обработке"""
+    if is_numeric_dtype(column) or column.dtype == object:
+        return column.astype(str).to_numpy(dtype=object)
+    # datetime и прочие dtypes pandas форматирует иначе, чем str() скаляра
+    return column.map(str).to_numpy(dtype=object)
+
+
+def _float_mask(column: pd.Series, decimal_comma: bool = False) -> np.ndarray:
+    """
+    Маска значений, для которых float(str(value)) не бросает исключение
+    
+    pd.to_numeric принимает строго меньше форм, чем float() ("nan", "1_000",
+    не-ASCII цифры), поэтому его отказы, похожие на число по FLOAT_CANDIDATE,
+    перепроверяются через float() - это единицы значений, а не весь столбец.
+    """
+    if is_numeric_dtype(column) and not is_bool_dtype(column):
+        return np.ones(len(column), dtype=bool)
+    
+    text = column.astype(str)
+    if decimal_comma:
+        text = text.str.replace(',', '.', regex=False)
+    
+    mask = pd.to_numeric(text, errors='coerce').notna().to_numpy(copy=True)
+    
+    rejected = ~mask & column.notna().to_numpy()
+    if rejected.any():
+        candidates = text[rejected].str.fullmatch(FLOAT_CANDIDATE).fillna(False).to_numpy(dtype=bool)
+        text_values = text.to_numpy(dtype=object)
+        for i in np.flatnonzero(rejected)[candidates]:
+            try:
+                float(text_values[i])
+            except (ValueError, TypeError):
+                continue
+            mask[i] = True
+    
+    return mask
+
+
+def find_table_header_vectorized(df: pd.DataFrame) -> Optional[int]:
+    """
+    Векторная версия find_table_header
+    
+    Все маркеры заголовка не содержат пробелов, поэтому условие по склеенной
+    строке равносильно условию "маркер встречается хотя бы в одной ячейке".
+    Лист проверяется блоками, чтобы не переводить в текст всю смету ради
+    заголовка в первых строках.
+    """
+    for start in range(0, len(df), HEADER_CHUNK_ROWS):
+        chunk = df.iloc[start:start + HEADER_CHUNK_ROWS]
+        found = {token: np.zeros(len(chunk), dtype=bool) for token in HEADER_TOKENS}
+        
+        for idx in range(chunk.shape[1]):
+            column = chunk.iloc[:, idx]
+            if is_numeric_dtype(column):
+                continue
+            text = column.astype(str).str.lower()
+            notna = column.notna().to_numpy()
+            for token in HEADER_TOKENS:
+                found[token] |= notna & text.str.contains(token, regex=False).fillna(False).to_numpy(dtype=bool)
+        
+        header_mask = np.logical_and.reduce([found[token] for token in HEADER_TOKENS])
+        hits = np.flatnonzero(header_mask)
+        if len(hits):
+            return chunk.index[hits[0]]
+    
+    return None
+
+
+def extract_records_vectorized(df: pd.DataFrame, file_name: str, sheet_name: str = '') -> Optional[List[Dict]]:
+    """
+    Колоночное извлечение записей - результат совпадает с extract_records_from_dataframe
+    
+    Проверка числа в "№ п/п", правило мусорных строк (колонки 2 и 3 - числа)
+    и выбор колонок выполняются масками по столбцам, без iterrows.
+    
+    Args:
+        df: DataFrame листа (header=None)
+        file_name: Имя исходного файла
+        sheet_name: Имя листа книги
+        
+    Returns:
+        Список записей или None если заголовок таблицы не найден
+    """
+    header_row = find_table_header_vectorized(df)
+    
+    if header_row is None:
+        return None
+    
+    data_df = df.iloc[header_row + 1:]
+    
+    position = _column(data_df, 0)
+    code = _column(data_df, 1)
+    name = _column(data_df, 2)
+    
+    # Число в колонке "№ п/п" (запятая как десятичный разделитель допустима)
+    valid = position.notna().to_numpy() & _float_mask(position, decimal_comma=True)
+    
+    # Мусорные строки типа "1, 2, 3": и шифр, и наименование - просто числа.
+    # Каждую следующую колонку проверяем только там, где предыдущая условие прошла
+    suspects = np.flatnonzero(valid & code.notna().to_numpy())
+    suspects = suspects[_float_mask(code.iloc[suspects])]
+    suspects = suspects[name.iloc[suspects].notna().to_numpy()]
+    suspects = suspects[_float_mask(name.iloc[suspects])]
+    valid[suspects] = False
+    
+    rows = np.flatnonzero(valid)
+    if not len(rows):
+        return []
+    
+    columns = {}
+    for field, idx in RECORD_COLUMNS.items():
+        column = _column(data_df, idx).iloc[rows]
+        text = _as_text(column)
+        columns[field] = np.where(column.notna().to_numpy(), text, '').tolist()
+    
+    return assign_unique_ids([
+        make_record(file_name, sheet_name, *values)
+        for values in zip(*(columns[field] for field in RECORD_COLUMNS))
+    ])
+
+
+def extract_sheet(file_path: str, sheet_name: str, streaming: bool = True) -> Optional[List[Dict]]:
+    """
+    Извлечь записи из одного листа книги (единица работы для пула процессов)
+    
+    Args:
+        file_path: Путь к XLSX файлу
+        sheet_name: Имя листа
+        streaming: Потоковое чтение через openpyxl; иначе pd.read_excel + маски.
+                   Ограничено только чтение листа: записи листа возвращаются
+                   списком (результат задачи пула процессов)
+        
+    Returns:
+        Список записей или None если на листе нет таблицы сметы
+    """
+    file_name = os.path.basename(file_path)
+    
+    if not streaming:
+        df = pd.read_excel(file_path, sheet_name=sheet_name, header=None)
+        return extract_records_vectorized(df, file_name, sheet_name)
+    
+    rows = iter_sheet_rows(file_path, sheet_name)
+    for row in rows:
+        if is_header_row(row):
+            break
+    else:
+        return None
+    
+    return assign_unique_ids([build_record(row, file_name, sheet_name) for row in rows if is_valid_values(row)])
+
+
+def extract_from_files_parallel(file_paths: List[str], max_workers: Optional[int] = None,
+                                streaming: bool = True, cache: Optional[ExtractionCache] = None) -> Dict[str, Any]:
+    """
+    Параллельное извлечение из всех файлов и всех листов через пул процессов
+    
+    Каждый лист каждой книги - отдельная задача, поэтому время шага примерно
+    равно времени самого тяжелого листа. Порядок записей детерминирован:
+    файл (в порядке file_paths), лист (в порядке книги), строка. Ошибка в одном
+    файле или листе попадает в errors и не прерывает остальные.
+    
+    Args:
+        file_paths: Список путей к XLSX файлам
+        max_workers: Число процессов (по умолчанию - число CPU)
+        streaming: Режим чтения листа (см. extract_sheet)
+        cache: Кэш извлечения - файлы с попаданием в пул не отправляются
+        
+    Returns:
+        Словарь: records, errors ({имя_файла: [сообщения]}), files_processed,
+        sheets_processed, cache_hits
+    """
+    errors: Dict[str, List[str]] = {}
+    existing_files = []
+    
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            existing_files.append(file_path)
+        else:
+            logging.warning(f"Файл не найден: {file_path}")
+            errors.setdefault(os.path.basename(file_path), []).append("Файл не найден")
+    
+    file_records: Dict[str, List[Dict]] = {file_path: [] for file_path in existing_files}
+    sheets_processed = 0
+    
+    cache_keys: Dict[str, str] = {}
+    files_to_extract = []
+    for file_path in existing_files:
+        if cache is None:
+            files_to_extract.append(file_path)
+            continue
+        cache_keys[file_path] = cache.make_key(file_path, EXTRACTOR_VERSION, 'all_sheets')
+        cached_rows = cache.get(cache_keys[file_path])
+        if cached_rows is None:
+            files_to_extract.append(file_path)
+        else:
+            logging.info(f"Кэш извлечения: {os.path.basename(file_path)} ({len(cached_rows)} записей)")
+            file_records[file_path] = _records_from_cache(cached_rows, os.path.basename(file_path))
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # Фаза 1: состав листов каждой книги
+        sheet_futures = [(file_path, pool.submit(list_sheet_names, file_path)) for file_path in files_to_extract]
+        
+        # Фаза 2: по задаче на каждый лист
+        sheet_tasks = []
+        for file_path, future in sheet_futures:
+            try:
+                sheet_names = future.result()
+            except Exception as e:
+                logging.error(f"Ошибка при обработке файла {file_path}: {str(e)}")
+                errors.setdefault(os.path.basename(file_path), []).append(str(e))
+                continue
+            
+            for sheet_name in sheet_names:
+                sheet_tasks.append((file_path, sheet_name, pool.submit(extract_sheet, file_path, sheet_name, streaming)))
+        
+        # Собираем в порядке постановки задач - он и задает порядок записей
+        for file_path, sheet_name, future in sheet_tasks:
+            try:
+                sheet_data = future.result()
+            except Exception as e:
+                logging.error(f"Ошибка при обработке листа '{sheet_name}' файла {file_path}: {str(e)}")
+                errors.setdefault(os.path.basename(file_path), []).append(f"{sheet_name}: {str(e)}")
+                continue
+            
+            if sheet_data is None:
+                logging.debug(f"Лист '{sheet_name}' файла {file_path} не содержит таблицы сметы")
+                continue
+            
+            file_records[file_path].extend(sheet_data)
+            sheets_processed += 1
+    
+    if cache is not None:
+        for file_path in files_to_extract:
+            if os.path.basename(file_path) not in errors:
+                cache.put(cache_keys[file_path], _cacheable_rows(file_records[file_path]))
+    
+    master_list = []
+    for file_path, records in file_records.items():
+        if not records and os.path.basename(file_path) not in errors:
+            logging.warning(f"Не найден заголовок таблицы в файле {file_path}")
+        logging.info(f"Извлечено {len(records)} записей из файла {os.path.basename(file_path)}")
+        master_list.extend(records)
+    
+    # Одноименные файлы из разных папок дали бы одинаковые ID
+    assign_unique_ids(master_list)
+    
+    logging.info(f"Общее количество извлеченных записей: {len(master_list)} "
+                 f"({sheets_processed} листов, ошибок в файлах: {len(errors)})")
+    
+    return {
+        'records': master_list,
+        'errors': errors,
+        'files_processed': len([path for path in existing_files if os.path.basename(path) not in errors]),
+        'sheets_processed': sheets_processed,
+        'cache_hits': len(existing_files) - len(files_to_extract)
+    }
+
+
+def extract_from_files(file_paths: List[str], streaming: bool = False, vectorized: bool = False,
+                       cache: Optional[ExtractionCache] = None) -> List[Dict]:
     """
     Главная функция модуля EXTRACTOR
     
     Args:
         file_paths: Список путей к XLSX файлам
+        streaming: Потоковое чтение листов без DataFrame (память на чтение листа
+                   ограничена; записи всех файлов собираются в master_list)
+        vectorized: Колоночная обработка DataFrame (см. extract_records_vectorized)
+        cache: Кэш извлечения по содержимому файла
         
     Returns:
         master_list: Единый, плоский список словарей
@@ -156,38 +639,77 @@ def extract_from_files(file_paths: List[str]) -> List[Dict]:
             logging.warning(f"Файл не найден: {file_path}")
             continue
             
-        file_data = extract_from_file(file_path)
+        if cache is not None:
+            cache_key = cache.make_key(file_path, EXTRACTOR_VERSION, 'first_sheet')
+            cached_rows = cache.get(cache_key)
+            if cached_rows is not None:
+                logging.info(f"Кэш извлечения: {os.path.basename(file_path)} ({len(cached_rows)} записей)")
+                master_list.extend(_records_from_cache(cached_rows, os.path.basename(file_path)))
+                continue
+            
+        file_data = extract_from_file(file_path, streaming=streaming, vectorized=vectorized)
+        # Пустой результат может означать ошибку чтения - такой не кэшируем
+        if cache is not None and file_data:
+            cache.put(cache_key, _cacheable_rows(file_data))
         master_list.extend(file_data)
     
+    # Одноименные файлы из разных папок дали бы одинаковые ID
+    assign_unique_ids(master_list)
+    
     logging.info(f"Общее количество извлеченных записей: {len(master_list)}")
     return master_list
 
 
-def extract_estimates(input_path: str) -> List[Dict]:
+def find_excel_files(input_path: str) -> List[str]:
     """
-    Главная функция для пайплайна - извлечение данных из всех Excel файлов в папке
+    Все Excel файлы сметы в папке (без временных файлов Excel), в порядке имен
     
     Args:
-        input_path: Путь к папке 0_input с Excel файлами
+        input_path: Путь к папке 0_input
         
     Returns:
-        Список извлеченных записей
+        Отсортированный список путей к XLSX файлам
     """
     excel_files = []
     
-    # Поиск всех Excel файлов в папке input
-    for file_name in os.listdir(input_path):
+    for file_name in sorted(os.listdir(input_path)):
         if file_name.endswith('.xlsx') and not file_name.startswith('~'):
             excel_files.append(os.path.join(input_path, file_name))
     
     if not excel_files:
         logging.warning(f"Не найдено Excel файлов в папке: {input_path}")
+    else:
+        logging.info(f"Найдено Excel файлов для обработки: {len(excel_files)}")
+    
+    return excel_files
+
+
+def extract_estimates(input_path: str, streaming: bool = False, vectorized: bool = False,
+                      parallel: bool = False, cache: Optional[ExtractionCache] = None) -> List[Dict]:
+    """
+    Главная функция для пайплайна - извлечение данных из всех Excel файлов в папке
+    
+    Args:
+        input_path: Путь к папке 0_input с Excel файлами
+        streaming: Использовать потоковое чтение (openpyxl read_only; записи
+                   возвращаются списком, см. описание модуля)
+        vectorized: Колоночная обработка DataFrame
+        parallel: Все файлы и все листы через пул процессов (см. extract_from_files_parallel)
+        cache: Кэш извлечения по содержимому файла
+        
+    Returns:
+        Список извлеченных записей
+    """
+    excel_files = find_excel_files(input_path)
+    
+    if not excel_files:
         return []
     
-    logging.info(f"Найдено Excel файлов для обработки: {len(excel_files)}")
+    if parallel:
+        return extract_from_files_parallel(excel_files, streaming=streaming, cache=cache)['records']
     
     # Извлекаем данные из всех найденных файлов
-    return extract_from_files(excel_files)
+    return extract_from_files(excel_files, streaming=streaming, vectorized=vectorized, cache=cache)
 
 
 if __name__ == "__main__":
@@ -2,16 +2,27 @@
 Модуль для классификации сметных позиций через Gemini 2.5 Pro
 """
 
+import asyncio
 import json
 import logging
 import os
 import uuid
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 from ..shared.claude_client import claude_client as gemini_client  # Migrated to Claude
+from ..shared.debug_artifacts import artifact_writer
 
 load_dotenv()
 
+# Бюджет выходных токенов на один запрос; лимит ответа claude_client - 8000, запас на ошибку оценки
+SHARD_OUTPUT_TOKENS = int(os.getenv('CLASSIFIER_SHARD_OUTPUT_TOKENS', '5000'))
+MAX_CONCURRENT_SHARDS = int(os.getenv('CLASSIFIER_MAX_CONCURRENCY', '4'))
+SHARD_RETRY_ROUNDS = 2
+
+# Оценка ответа на позицию: JSON-обвязка и обоснование в одно предложение, ~2.5 символа кириллицы на токен
+RESPONSE_CHARS_PER_ITEM = 220
+CHARS_PER_TOKEN = 2.5
+
 def load_prompt_template() -> str:
     """Загружает шаблон промпта из файла"""
     try:
@@ -22,112 +33,149 @@ def load_prompt_template() -> str:
         logging.error(f"Ошибка загрузки промпта: {e}")
         return ""
 
+def estimate_output_tokens(item: Dict) -> int:
+    """Оценка выходных токенов ответа LLM на одну позицию: id, классификация и обоснование"""
+    return int((len(item['id']) + RESPONSE_CHARS_PER_ITEM) / CHARS_PER_TOKEN)
+
+
+def split_into_shards(items: List[Dict], token_budget: Optional[int] = None) -> List[List[Dict]]:
+    """
+    Делит позиции на порции, ответ на каждую из которых укладывается в token_budget
+
+    Args:
+        items: Позиции с полями id, full_name
+        token_budget: Бюджет выходных токенов на порцию (по умолчанию SHARD_OUTPUT_TOKENS)
+
+    Returns:
+        Список порций в исходном порядке
+    """
+    token_budget = token_budget or SHARD_OUTPUT_TOKENS
+    shards = []
+    shard = []
+    shard_tokens = 0
+
+    for item in items:
+        item_tokens = estimate_output_tokens(item)
+        if shard and shard_tokens + item_tokens > token_budget:
+            shards.append(shard)
+            shard = []
+            shard_tokens = 0
+        shard.append(item)
+        shard_tokens += item_tokens
+
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def _parse_classifications(gemini_response: Dict) -> List[Dict]:
+    """Массив классификаций из ответа LLM (пустой список при ошибке)"""
+    if not gemini_response.get('success', False):
+        logging.error(f"Ошибка Claude API: {gemini_response.get('error', 'Неизвестная ошибка')}")
+        return []
+
+    # Парсим JSON ответ - сначала пробуем response, потом raw_text
+    classifications = gemini_response.get('response', [])
+
+    # Если response не список, пробуем распарсить raw_text
+    if not isinstance(classifications, list):
+        try:
+            raw_text = gemini_response.get('raw_text', '[]')
+            classifications = json.loads(raw_text)
+            logging.info(f"✅ Успешно распарсили массив из raw_text: {len(classifications)} элементов")
+        except (json.JSONDecodeError, ValueError) as e:
+            logging.error(f"❌ Ошибка парсинга raw_text: {e}")
+            return []
+
+    if not isinstance(classifications, list):
+        logging.error("Claude вернул ответ не в виде списка")
+        return []
+
+    return [classification for classification in classifications if isinstance(classification, dict)]
+
+
+async def _classify_shard(shard: List[Dict], system_instruction: str,
+                          semaphore: asyncio.Semaphore) -> Tuple[List[Dict], Dict]:
+    """
+    Один запрос к LLM для порции позиций
+
+    Returns:
+        (классификации из ответа, сырой ответ клиента для отладки)
+    """
+    user_prompt = json.dumps(shard, ensure_ascii=False, indent=2)
+
+    async with semaphore:
+        try:
+            logging.info(f"📡 Отправка порции из {len(shard)} позиций на классификацию в Claude")
+            gemini_response = await gemini_client.generate_response(
+                prompt=user_prompt,
+                agent_name="classifier",
+                system_instruction=system_instruction
+            )
+        except Exception as e:
+            logging.error(f"Ошибка при запросе к Claude API: {str(e)}")
+            gemini_response = {'success': False, 'error': str(e)}
+
+    return _parse_classifications(gemini_response), gemini_response
+
+
 async def classify_with_gemini(items: List[Dict], project_dir: str = None) -> Dict[str, Dict]:
     """
     Классификация неопределенных позиций через Gemini 2.5 Pro
-    
+
+    Позиции делятся на порции по бюджету выходных токенов (ответ на один большой запрос
+    обрезается по лимиту и теряется целиком), порции идут параллельно под семафором.
+    Позиции, не получившие ответа, повторяются более мелкими порциями.
+
     Args:
-        items: Список неопределенных позиций с полями code, name
+        items: Список неопределенных позиций с полями id, code, name
         project_dir: Путь к папке проекта для сохранения llm_input/response
-        
+
     Returns:
         Словарь {id: {"classification": str, "reasoning": str}}
     """
     if not items:
         return {}
-    
+
     # Используем реальные ID из данных и готовим минимальные данные
     items_with_id = []
     id_mapping = {}
-    
+
     for item in items:
-        item_id = item.get('id', str(uuid.uuid4()))  # Используем реальный id или генерируем если нет
+        item_id = item.get('id') or str(uuid.uuid4())  # Используем реальный id или генерируем если нет
         id_mapping[item_id] = item
-        
+
         items_with_id.append({
             "id": item_id,
             "full_name": f"{item.get('code', '')} {item.get('name', '')}"
         })
-    
+
     # Загружаем и заполняем шаблон промпта
     prompt_template = load_prompt_template()
     if not prompt_template:
         logging.error("Не удалось загрузить шаблон промпта")
         return {}
-    
+
     # Разделяем системную инструкцию и пользовательские данные
     system_instruction = prompt_template.replace('{ITEMS_JSON}', "")  # Убираем плейсхолдер
     system_instruction = system_instruction.replace("Анализируй следующие позиции:", "Проанализируй строительные позиции в формате JSON, которые будут предоставлены пользователем:")
-    user_prompt = json.dumps(items_with_id, ensure_ascii=False, indent=2)
 
-    try:
-        # Используем асинхронный gemini_client с системной инструкцией
-        logging.info("📡 Отправка запроса на классификацию в Claude (classifier -> claude-3.5-sonnet)")
-        gemini_response = await gemini_client.generate_response(
-            prompt=user_prompt,
-            agent_name="classifier",
-            system_instruction=system_instruction
-        )
-
-        # Сохраняем llm_input и llm_response если указана папка проекта
-        if project_dir:
-            classified_dir = os.path.join(project_dir, "2_classified")
-            os.makedirs(classified_dir, exist_ok=True)
-
-            # Сохраняем структурированные данные для отладки
-            llm_input_path = os.path.join(classified_dir, "llm_input.json")
-            llm_input_data = {
-                "system_instruction": system_instruction,
-                "user_prompt": user_prompt,
-                "items": []
-            }
-
-            # Добавляем реальные ID к каждой позиции
-            for item in items:
-                # Используем item_id напрямую - он уже есть в id_mapping
-                item_id = item.get('id')
-                if item_id and item_id in id_mapping:
-                    llm_input_data["items"].append({
-                        "id": item_id,
-                        "code": item.get('code', ''),
-                        "name": item.get('name', '')
-                    })
-
-            with open(llm_input_path, 'w', encoding='utf-8') as f:
-                json.dump(llm_input_data, f, ensure_ascii=False, indent=2)
-
-            # Сохраняем ответ от Gemini
-            llm_response_path = os.path.join(classified_dir, "llm_response.json")
-            with open(llm_response_path, 'w', encoding='utf-8') as f:
-                json.dump(gemini_response, f, ensure_ascii=False, indent=2)
-
-            logging.info(f"Сохранены llm_input.json и llm_response.json в {classified_dir}")
-
-        # Проверяем успешность ответа
-        if not gemini_response.get('success', False):
-            logging.error(f"Ошибка Claude API: {gemini_response.get('error', 'Неизвестная ошибка')}")
-            return {}
-
-        # Извлекаем текст ответа
-        response_text = gemini_response.get('raw_text', '')
-        logging.info(f"Получен ответ от Claude: {response_text[:200]}...")
-
-        # Парсим JSON ответ - сначала пробуем response, потом raw_text
-        classifications = gemini_response.get('response', [])
-
-        # Если response не список, пробуем распарсить raw_text
-        if not isinstance(classifications, list):
-            try:
-                raw_text = gemini_response.get('raw_text', '[]')
-                classifications = json.loads(raw_text)
-                logging.info(f"✅ Успешно распарсили массив из raw_text: {len(classifications)} элементов")
-            except (json.JSONDecodeError, ValueError) as e:
-                logging.error(f"❌ Ошибка парсинга raw_text: {e}")
-                classifications = []
-
-        if isinstance(classifications, list):
-            # Преобразуем в словарь по ID
-            result = {}
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SHARDS)
+    pending_shards = split_into_shards(items_with_id)
+    logging.info(f"📦 {len(items_with_id)} позиций разбиты на {len(pending_shards)} порций")
+
+    result = {}
+    llm_requests = []
+
+    for retry_round in range(SHARD_RETRY_ROUNDS + 1):
+        shard_outputs = await asyncio.gather(*(
+            _classify_shard(shard, system_instruction, semaphore) for shard in pending_shards
+        ))
+
+        failed_items = []
+        for shard, (classifications, gemini_response) in zip(pending_shards, shard_outputs):
+            llm_requests.append({'items': shard, 'response': gemini_response})
+
             for classification in classifications:
                 item_id = classification.get('id') or classification.get('uuid')  # Поддерживаем оба варианта для обратной совместимости
                 if item_id in id_mapping:
@@ -137,15 +185,41 @@ async def classify_with_gemini(items: List[Dict], project_dir: str = None) -> Di
                         'original_item': id_mapping[item_id]
                     }
 
-            logging.info(f"Claude успешно классифицировал {len(result)} позиций")
-            return result
+            failed_items.extend(item for item in shard if item['id'] not in result)
+
+        if not failed_items:
+            break
+
+        if retry_round < SHARD_RETRY_ROUNDS:
+            # Частичный ответ обычно означает обрезку по лимиту - повторяем порциями вдвое меньше
+            retry_budget = max(SHARD_OUTPUT_TOKENS >> (retry_round + 1), 1)
+            pending_shards = split_into_shards(failed_items, retry_budget)
+            logging.warning(f"🔄 {len(failed_items)} позиций без ответа, повтор {retry_round + 1}/{SHARD_RETRY_ROUNDS} "
+                            f"в {len(pending_shards)} порциях")
         else:
-            logging.error("Claude вернул ответ не в виде списка")
-            return {}
+            logging.error(f"❌ {len(failed_items)} позиций остались без ответа Claude")
 
-    except Exception as e:
-        logging.error(f"Ошибка при запросе к Claude API: {str(e)}")
-        return {}
+    # Сохраняем llm_input и llm_response если указана папка проекта
+    # Сериализация и запись идут вне event loop (уровень и сжатие - HERZOG_DEBUG_*)
+    if project_dir:
+        classified_dir = os.path.join(project_dir, "2_classified")
+        llm_input_data = {
+            "system_instruction": system_instruction,
+            "requests": [request['items'] for request in llm_requests],
+            "items": [
+                {"id": item_id, "code": item.get('code', ''), "name": item.get('name', '')}
+                for item_id, item in id_mapping.items()
+            ]
+        }
+        await artifact_writer.write_async(os.path.join(classified_dir, "llm_input.json"), llm_input_data)
+
+        # Ответы по каждому запросу в порядке отправки
+        await artifact_writer.write_async(os.path.join(classified_dir, "llm_response.json"),
+                                          [request['response'] for request in llm_requests])
+        logging.info(f"llm_input.json и llm_response.json поставлены в очередь записи в {classified_dir}")
+
+    logging.info(f"Claude успешно классифицировал {len(result)} из {len(items)} позиций")
+    return result
 
 def convert_gemini_result(gemini_result: Dict) -> Dict:
     """
@@ -0,0 +1,248 @@
+"""
+Локальная модель классификации для HerZog v3.0
+Задача: Классифицировать типовые позиции без LLM по истории его ответов (Шаг 2 пайплайна)
+
+Мультиномиальный наивный Байес на символьных n-граммах "шифр + наименование".
+N-граммы хэшируются в фиксированное число признаков, поэтому модель - массивы NumPy
+без словаря. Наивный Байес самоуверен на незнакомом тексте, поэтому уверенность
+умножается на долю n-грамм позиции, встречавшихся при обучении.
+Обучается на ответах LLM, сохраненных в 2_classified/llm_input.json
+и llm_response.json всех проектов; работает только на CPU.
+
+Переобучение:
+    python -m src.data_processing.local_model [projects_dir] [model_path]
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..shared.debug_artifacts import read_artifact
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROJECTS_DIR = os.getenv('PROJECTS_DIR', 'projects')
+DEFAULT_MODEL_PATH = os.getenv('LOCAL_MODEL_PATH', os.path.join(os.getenv('CACHE_DIR', 'cache'), 'local_classifier.npz'))
+CONFIDENCE_THRESHOLD = float(os.getenv('LOCAL_MODEL_THRESHOLD', '0.95'))
+
+MODEL_VERSION = 1
+N_FEATURES = 2 ** 18
+NGRAM_SIZES = (2, 3, 4)
+SMOOTHING = 0.1
+MIN_TRAINING_SAMPLES = 50
+
+_DIGITS = re.compile(r'\d+')
+
+
+def _normalize_text(item: Dict) -> str:
+    text = f"{item.get('code') or ''} {item.get('name') or ''}".lower().replace('ё', 'е')
+    # Числа различаются от сметы к смете, их значение для класса не важно
+    return f" {' '.join(_DIGITS.sub('0', text).split())} "
+
+
+def item_features(item: Dict) -> np.ndarray:
+    """Индексы хэшированных символьных n-грамм позиции (с повторами)"""
+    text = _normalize_text(item)
+    grams = [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+    # crc32 стабилен между процессами, в отличие от hash()
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) % N_FEATURES for gram in grams),
+                       dtype=np.int64, count=len(grams))
+
+
+def _flatten_features(items: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Признаки всех позиций одним массивом и номер позиции для каждого признака"""
+    features = [item_features(item) for item in items]
+    doc_ids = np.repeat(np.arange(len(items)), [len(f) for f in features])
+    indices = np.concatenate(features) if features else np.empty(0, dtype=np.int64)
+    return indices, doc_ids
+
+
+class LocalClassifier:
+    """
+    Наивный Байес на хэшированных n-граммах
+    """
+
+    def __init__(self, classes: np.ndarray, class_log_prior: np.ndarray, feature_log_prob: np.ndarray,
+                 seen_features: np.ndarray):
+        self.classes = classes
+        self.class_log_prior = class_log_prior
+        self.feature_log_prob = feature_log_prob
+        self.seen_features = seen_features
+
+    @classmethod
+    def fit(cls, items: List[Dict], labels: List[str]) -> 'LocalClassifier':
+        """Обучение на позициях (code, name) и их классах"""
+        classes, label_ids = np.unique(np.array(labels, dtype=str), return_inverse=True)
+        indices, doc_ids = _flatten_features(items)
+
+        counts = np.zeros((len(classes), N_FEATURES), dtype=np.float64)
+        np.add.at(counts, (label_ids[doc_ids], indices), 1.0)
+
+        smoothed = counts + SMOOTHING
+        feature_log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        class_log_prior = np.log(np.bincount(label_ids, minlength=len(classes)) / len(labels))
+
+        return cls(classes, class_log_prior, feature_log_prob.astype(np.float32), counts.any(axis=0))
+
+    def predict(self, items: List[Dict]) -> Tuple[List[str], np.ndarray]:
+        """
+        Классы и уверенность для позиций
+
+        Уверенность - апостериорная вероятность класса, умноженная на долю знакомых n-грамм.
+        """
+        if not items:
+            return [], np.empty(0)
+
+        indices, doc_ids = _flatten_features(items)
+        scores = np.tile(self.class_log_prior, (len(items), 1))
+        np.add.at(scores, doc_ids, self.feature_log_prob.T[indices])
+
+        # softmax со сдвигом на максимум для устойчивости
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        coverage = (np.bincount(doc_ids, weights=self.seen_features[indices], minlength=len(items))
+                    / np.maximum(np.bincount(doc_ids, minlength=len(items)), 1))
+
+        best = probabilities.argmax(axis=1)
+        return self.classes[best].tolist(), probabilities[np.arange(len(items)), best] * coverage
+
+    def save(self, model_path: str = DEFAULT_MODEL_PATH) -> None:
+        """Сохраняет модель (атомарно: временный файл + rename)"""
+        os.makedirs(os.path.dirname(os.path.abspath(model_path)), exist_ok=True)
+        tmp_path = f"{model_path}.tmp.npz"
+        np.savez_compressed(tmp_path, version=MODEL_VERSION, n_features=N_FEATURES, classes=self.classes,
+                            class_log_prior=self.class_log_prior, feature_log_prob=self.feature_log_prob,
+                            seen_features=self.seen_features)
+        os.replace(tmp_path, model_path)
+
+    @classmethod
+    def load(cls, model_path: str = DEFAULT_MODEL_PATH) -> 'LocalClassifier':
+        with np.load(model_path, allow_pickle=False) as data:
+            if int(data['version']) != MODEL_VERSION or int(data['n_features']) != N_FEATURES:
+                raise ValueError(f"Модель {model_path} собрана другой версией, нужно переобучение")
+            return cls(data['classes'], data['class_log_prior'], data['feature_log_prob'], data['seen_features'])
+
+
+def load_default_model() -> Optional[LocalClassifier]:
+    """Модель по LOCAL_MODEL_PATH или None, если модель не обучена"""
+    if not os.path.exists(DEFAULT_MODEL_PATH):
+        return None
+
+    try:
+        return LocalClassifier.load(DEFAULT_MODEL_PATH)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"⚠️ Не удалось загрузить локальную модель {DEFAULT_MODEL_PATH}: {e}")
+        return None
+
+
+def _response_classifications(llm_response) -> List[Dict]:
+    """Классификации из llm_response.json: один ответ или список ответов по порциям"""
+    responses = llm_response if isinstance(llm_response, list) else [llm_response]
+    classifications = []
+
+    for response in responses:
+        if not isinstance(response, dict) or not response.get('success', False):
+            continue
+
+        parsed = response.get('response')
+        if not isinstance(parsed, list):
+            try:
+                parsed = json.loads(response.get('raw_text') or '[]')
+            except (json.JSONDecodeError, ValueError):
+                continue
+
+        if isinstance(parsed, list):
+            classifications.extend(entry for entry in parsed if isinstance(entry, dict))
+
+    return classifications
+
+
+def _input_items_by_id(llm_input: Dict) -> Dict[str, Dict]:
+    """
+    Позиции запроса из llm_input.json по id
+
+    В проектах до порционной классификации список items пуст, а id и наименования
+    есть только в user_prompt (JSON-строка [{id, full_name}]); в порционном формате
+    они же - в requests. full_name - это "шифр наименование", поэтому при обучении
+    он дает тот же текст, что и пара code/name.
+    """
+    items_by_id = {item['id']: item for item in llm_input.get('items') or [] if item.get('id')}
+
+    prompt_items = []
+    for request in llm_input.get('requests') or []:
+        prompt_items.extend(request if isinstance(request, list) else [])
+    if isinstance(llm_input.get('user_prompt'), str):
+        try:
+            parsed = json.loads(llm_input['user_prompt'])
+        except (json.JSONDecodeError, ValueError):
+            parsed = []
+        prompt_items.extend(parsed if isinstance(parsed, list) else [])
+
+    for entry in prompt_items:
+        if isinstance(entry, dict) and entry.get('id') and entry['id'] not in items_by_id:
+            items_by_id[entry['id']] = {'code': '', 'name': entry.get('full_name') or entry.get('name', '')}
+    return items_by_id
+
+
+def collect_training_data(projects_dir: str = DEFAULT_PROJECTS_DIR) -> Tuple[List[Dict], List[str]]:
+    """
+    Позиции и классы из ответов LLM всех проектов
+
+    Одинаковые позиции (шифр + наименование) учитываются один раз, берется последний ответ.
+    """
+    samples = {}
+
+    for root, dirs, files in os.walk(projects_dir):
+        # Артефакты могут быть сжаты (HERZOG_DEBUG_COMPRESSION)
+        if os.path.basename(root) != '2_classified' or not any(name.startswith('llm_response.json') for name in files):
+            continue
+        dirs.clear()
+
+        try:
+            items_by_id = _input_items_by_id(read_artifact(os.path.join(root, 'llm_input.json')))
+            llm_response = read_artifact(os.path.join(root, 'llm_response.json'))
+        except (OSError, RuntimeError, ValueError, AttributeError, TypeError) as e:
+            logger.warning(f"⚠️ Пропускаю ответы LLM в {root}: {e}")
+            continue
+
+        for classification in _response_classifications(llm_response):
+            item = items_by_id.get(classification.get('id') or classification.get('uuid'))
+            label = classification.get('classification')
+            if item is None or not label or label == 'Неопределенное':
+                continue
+            item = {'code': item.get('code', ''), 'name': item.get('name', '')}
+            samples[_normalize_text(item)] = (item, label)
+
+    return [item for item, _ in samples.values()], [label for _, label in samples.values()]
+
+
+def retrain(projects_dir: str = DEFAULT_PROJECTS_DIR, model_path: str = DEFAULT_MODEL_PATH) -> Optional[LocalClassifier]:
+    """
+    Переобучает модель по ответам LLM всех проектов и сохраняет ее
+
+    Returns:
+        Модель или None, если данных недостаточно
+    """
+    items, labels = collect_training_data(projects_dir)
+
+    if len(items) < MIN_TRAINING_SAMPLES or len(set(labels)) < 2:
+        logger.warning(f"⚠️ Недостаточно ответов LLM для обучения: {len(items)} позиций, классов {len(set(labels))}")
+        return None
+
+    model = LocalClassifier.fit(items, labels)
+    model.save(model_path)
+    logger.info(f"🧠 Локальная модель обучена на {len(items)} позициях, классы: {', '.join(model.classes)}")
+    return model
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(0 if retrain(*sys.argv[1:3]) else 1)
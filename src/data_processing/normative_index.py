@@ -0,0 +1,200 @@
+"""
+Офлайн-справочник нормативных расценок для HerZog v3.0
+Задача: Официальные наименования ГЭСН/ФЕР без обращения к API "Сметного Дела"
+
+Выгрузка нормативной базы (CSV: code, name, section, unit) один раз собирается
+в компактный индексный файл - хэш-таблицу с открытой адресацией по (база, шифр).
+Файл читается через mmap: поиск O(1) без загрузки справочника в память,
+а страницы файла разделяются между процессами-воркерами через page cache ОС.
+База определяется тем же сопоставлением префиксов, что и в клиенте API.
+
+Сборка индекса:
+    python -m src.data_processing.normative_index dump.csv data/normative_index.bin
+"""
+
+import csv
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Optional
+
+from .smetnoedelo_client import detect_base
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.getenv('NORMATIVE_INDEX_PATH', os.path.join('data', 'normative_index.bin'))
+
+MAGIC = b'HZNI'
+FORMAT_VERSION = 1
+
+# Заголовок: сигнатура, версия формата, число слотов, число записей
+_HEADER = struct.Struct('<4sIII')
+# Слот: хэш ключа (0 - пустой слот), смещение записи от начала области записей
+_SLOT = struct.Struct('<QI')
+# Длина строки в записи
+_LENGTH = struct.Struct('<H')
+
+# Доля заполнения хэш-таблицы
+_MAX_LOAD_FACTOR = 0.5
+
+
+def make_index_key(code: str) -> str:
+    """Ключ справочника: база API и шифр без пробелов в верхнем регистре"""
+    normalized_code = ''.join(code.split()).upper()
+    return f"{detect_base(normalized_code) or ''}|{normalized_code}"
+
+
+def _key_hash(key: str) -> int:
+    # Стабильный между процессами хэш (hash() рандомизирован); 0 зарезервирован под пустой слот
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+def _pack_string(value: str) -> bytes:
+    encoded = value.encode('utf-8')[:0xFFFF]
+    return _LENGTH.pack(len(encoded)) + encoded
+
+
+def build_index(source_path: str, index_path: str = DEFAULT_INDEX_PATH) -> int:
+    """
+    Собирает индексный файл из выгрузки нормативной базы
+
+    Args:
+        source_path: CSV с заголовком code, name[, section, unit]
+        index_path: Путь к индексному файлу (пишется атомарно)
+
+    Returns:
+        Количество записей в индексе
+    """
+    records = {}
+    duplicates = 0
+
+    with open(source_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            code = (row.get('code') or '').strip()
+            name = (row.get('name') or '').strip()
+            if not code or not name:
+                continue
+
+            key = make_index_key(code)
+            if key in records:
+                duplicates += 1
+                continue
+            records[key] = (name, (row.get('section') or '').strip(), (row.get('unit') or '').strip())
+
+    if duplicates:
+        logger.warning(f"⚠️ Справочник: пропущено повторов шифров - {duplicates}")
+
+    slot_count = 1
+    while slot_count * _MAX_LOAD_FACTOR < max(len(records), 1):
+        slot_count *= 2
+
+    slots = [(0, 0)] * slot_count
+    record_area = bytearray()
+
+    for key, (name, section, unit) in records.items():
+        key_hash = _key_hash(key)
+        slot = key_hash % slot_count
+        while slots[slot][0]:
+            slot = (slot + 1) % slot_count
+        slots[slot] = (key_hash, len(record_area))
+        record_area += b''.join(_pack_string(value) for value in (key, name, section, unit))
+
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, slot_count, len(records)))
+        f.write(b''.join(_SLOT.pack(key_hash, offset) for key_hash, offset in slots))
+        f.write(record_area)
+    os.replace(tmp_path, index_path)
+
+    logger.info(f"📚 Справочник нормативов: {len(records)} записей в {index_path}")
+    return len(records)
+
+
+class NormativeIndex:
+    """
+    Чтение индексного файла через mmap (только чтение, без загрузки в память)
+    """
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        self.index_path = index_path
+
+        with open(index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.slot_count, self.record_count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"Неподдерживаемый формат справочника: {index_path}")
+
+        self._slots_offset = _HEADER.size
+        self._records_offset = self._slots_offset + self.slot_count * _SLOT.size
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self) -> 'NormativeIndex':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _read_string(self, offset: int):
+        (length,) = _LENGTH.unpack_from(self._mmap, offset)
+        start = offset + _LENGTH.size
+        return self._mmap[start:start + length].decode('utf-8'), start + length
+
+    def lookup(self, code: str) -> Optional[Dict[str, str]]:
+        """
+        Запись справочника по шифру расценки
+
+        Returns:
+            {"official_name", "section", "unit"} или None, если шифра нет в справочнике
+        """
+        key = make_index_key(code)
+        key_hash = _key_hash(key)
+        slot = key_hash % self.slot_count
+
+        while True:
+            slot_hash, record_offset = _SLOT.unpack_from(self._mmap, self._slots_offset + slot * _SLOT.size)
+            if not slot_hash:
+                return None
+
+            if slot_hash == key_hash:
+                record_key, offset = self._read_string(self._records_offset + record_offset)
+                if record_key == key:
+                    official_name, offset = self._read_string(offset)
+                    section, offset = self._read_string(offset)
+                    unit, _ = self._read_string(offset)
+                    return {'official_name': official_name, 'section': section, 'unit': unit}
+
+            slot = (slot + 1) % self.slot_count
+
+
+def open_default_index() -> Optional[NormativeIndex]:
+    """Справочник по NORMATIVE_INDEX_PATH или None, если индекс не собран"""
+    if not os.path.exists(DEFAULT_INDEX_PATH):
+        return None
+
+    try:
+        return NormativeIndex(DEFAULT_INDEX_PATH)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"⚠️ Не удалось открыть справочник нормативов {DEFAULT_INDEX_PATH}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) not in (2, 3):
+        print("Использование: python -m src.data_processing.normative_index <dump.csv> [index.bin]")
+        sys.exit(1)
+
+    build_index(*sys.argv[1:])
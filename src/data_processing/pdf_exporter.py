@@ -7,9 +7,10 @@ import os
 import logging
 from typing import Optional, List, Dict, Any
 import subprocess
-import json
 from datetime import datetime
 
+from ..shared.truth_sections import load_truth
+
 logger = logging.getLogger(__name__)
 
 class PDFExporter:
@@ -280,8 +281,7 @@ class PDFExporter:
                 return False
             
             # Читаем данные
-            with open(truth_file, 'r', encoding='utf-8') as f:
-                truth_data = json.load(f)
+            truth_data = load_truth(truth_file)
             
             # Создаем простой текстовый PDF
             return self._create_simple_text_pdf(truth_data, output_file)
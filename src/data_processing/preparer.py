@@ -34,6 +34,7 @@ def filter_works_from_classified(classified_data: List[Dict]) -> List[Dict]:
             work_item = {
                 'id': item.get('id'),
                 'source_file': item.get('source_file'),
+                'source_sheet': item.get('source_sheet'),
                 'position_num': item.get('position_num'),
                 'code': item.get('code'),
                 'name': item.get('name'),
@@ -53,6 +54,8 @@ def prepare_project_data(raw_estimates_file: str, directives_file: str) -> Dict[
     """
     ОРКЕСТРАТОР: Вызывает модули и собирает результаты в project_data.json
     
+    Файловая обертка над build_project_data: читает результаты шагов 1-2 с диска.
+    
     Args:
         raw_estimates_file: Путь к файлу raw_estimates.json (из extractor)
         directives_file: Путь к файлу directives.json
@@ -61,11 +64,10 @@ def prepare_project_data(raw_estimates_file: str, directives_file: str) -> Dict[
         Единый словарь с данными проекта
     """
     
-    logger.info("🎭 PREPARER: Начинаю оркестрацию модулей...")
-    
     # ШАГ 1: Читаем уже готовые классифицированные данные
     logger.info("📋 Читаю классифицированные данные...")
-    classified_file = raw_estimates_file.replace('1_extracted/raw_estimates.json', '2_classified/classified_estimates.json')
+    project_dir = os.path.dirname(os.path.dirname(raw_estimates_file))
+    classified_file = os.path.join(project_dir, '2_classified', 'classified_estimates.json')
     
     with open(classified_file, 'r', encoding='utf-8') as f:
         classified_data = json.load(f)
@@ -76,6 +78,23 @@ def prepare_project_data(raw_estimates_file: str, directives_file: str) -> Dict[
     
     logger.info(f"📄 Загружены директивы пользователя")
     
+    return build_project_data(classified_data, directives)
+
+
+def build_project_data(classified_data: List[Dict], directives: Dict) -> Dict[str, Any]:
+    """
+    Сборка данных проекта из результатов классификации в памяти
+    
+    Args:
+        classified_data: Результат классификации (шаг 2)
+        directives: Директивы пользователя
+        
+    Returns:
+        Единый словарь с данными проекта
+    """
+    
+    logger.info("🎭 PREPARER: Начинаю оркестрацию модулей...")
+    
     # ШАГ 3: Фильтруем только работы для AI-агентов
     work_items = filter_works_from_classified(classified_data)
     
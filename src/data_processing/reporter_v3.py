@@ -14,7 +14,11 @@ from openpyxl.styles import PatternFill, Font, Border, Side, Alignment, NamedSty
 from openpyxl.formatting.rule import CellIsRule
 from openpyxl.utils import get_column_letter
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Any
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from ..shared.truth_initializer import load_pipeline_status
+from ..shared.truth_index import TruthIndex, group_works_by_package, index_packages
+from ..shared.truth_sections import load_truth
 
 logger = logging.getLogger(__name__)
 
@@ -61,21 +65,27 @@ class MultiPageScheduleGenerator:
         self.right_align = Alignment(horizontal='right', vertical='center')
         self.top_left_align = Alignment(horizontal='left', vertical='top', wrap_text=True)
     
-    def generate_multipage_excel(self, input_file: str, output_path: str) -> str:
+    def generate_multipage_excel(self, input_file: str, output_path: str,
+                                 truth_data: Optional[Mapping] = None,
+                                 truth_index: Optional[TruthIndex] = None) -> str:
         """
         Генерация многостраничного Excel отчета из true.json
         
         Args:
             input_file: Путь к файлу true.json
             output_path: Папка для сохранения
+            truth_data: Уже открытые данные true.json (хранилище пайплайна)
+            truth_index: Индексы по truth_data (хранилище пайплайна)
             
         Returns:
             Путь к созданному файлу
         """
         try:
-            # Читаем данные из true.json
-            with open(input_file, 'r', encoding='utf-8') as f:
-                truth_data = json.load(f)
+            # Читаем данные из true.json, если пайплайн не передал их
+            if truth_data is None:
+                truth_data = load_truth(input_file)
+            if truth_index is None:
+                truth_index = TruthIndex(truth_data)
             
             # Определяем версию структуры
             # Проверяем наличие work_breakdown_structure как индикатор новой версии
@@ -86,9 +96,11 @@ class MultiPageScheduleGenerator:
 
             # Извлекаем данные в зависимости от версии
             if has_hierarchical_structure or structure_version == "2.0":
-                extracted_data = self._extract_data_v2(truth_data)
+                extracted_data = self._extract_data_v2(truth_data, truth_index)
             else:
                 extracted_data = self._extract_data_v1(truth_data)
+                # Статусы агентов хранятся в журнале рядом с true.json
+                extracted_data['pipeline_status'] = load_pipeline_status(input_file)
 
             work_packages = extracted_data['work_packages']
             timeline_blocks = extracted_data['timeline_blocks']
@@ -105,7 +117,7 @@ class MultiPageScheduleGenerator:
             logger.info(f"📊 Создание отчета для {len(work_packages)} пакетов на {len(timeline_blocks)} недель")
             
             # Загружаем scheduling_reasoning данные
-            scheduling_data = self._load_scheduling_reasoning(input_file)
+            scheduling_data = self._load_scheduling_reasoning(truth_data)
             
             # Создаем Excel с несколькими листами
             wb = Workbook()
@@ -147,22 +159,11 @@ class MultiPageScheduleGenerator:
             logger.error(f"📋 Полная трассировка ошибки:\\n{traceback.format_exc()}")
             raise
     
-    def _load_scheduling_reasoning(self, input_file: str) -> Dict[str, Any]:
+    def _load_scheduling_reasoning(self, truth_data: Mapping) -> Dict[str, Any]:
         """
         Загружает данные scheduling_reasoning из true.json (уже обработанные scheduler_and_staffer агентом)
         """
         try:
-            # Читаем true.json напрямую
-            project_folder = os.path.dirname(input_file)
-            truth_path = os.path.join(project_folder, "true.json")
-
-            if not os.path.exists(truth_path):
-                logger.warning(f"Файл true.json не найден: {truth_path}")
-                return {}
-
-            with open(truth_path, 'r', encoding='utf-8') as f:
-                truth_data = json.load(f)
-
             # Собираем scheduling_reasoning из scheduled_packages или work_breakdown_structure в true.json
             scheduled_packages = truth_data.get('results', {}).get('scheduled_packages', [])
             work_breakdown_structure = truth_data.get('results', {}).get('work_breakdown_structure', [])
@@ -191,14 +192,16 @@ class MultiPageScheduleGenerator:
             logger.error(f"❌ Ошибка загрузки scheduling_reasoning: {e}")
             return {}
     
-    def _extract_data_v2(self, truth_data: Dict) -> Dict[str, Any]:
+    def _extract_data_v2(self, truth_data: Dict, truth_index: Optional[TruthIndex] = None) -> Dict[str, Any]:
         """Извлекает данные из структуры v2.0 с поддержкой иерархии"""
         # Проверяем, есть ли новая иерархическая структура
         work_breakdown_structure = truth_data.get('results', {}).get('work_breakdown_structure', [])
 
         if work_breakdown_structure:
             # Новая иерархическая структура
-            categories, packages = self._parse_hierarchical_structure(work_breakdown_structure, truth_data)
+            categories, packages = self._parse_hierarchical_structure(
+                work_breakdown_structure, truth_data, truth_index
+            )
             return {
                 'work_packages': packages,
                 'categories': categories,
@@ -241,31 +244,31 @@ class MultiPageScheduleGenerator:
                 'created_at': truth_data.get('metadata', {}).get('created_at'),
                 'structure_version': '1.0'
             },
-            'user_inputs': truth_data.get('project_inputs', {}),
-            'pipeline_status': truth_data.get('metadata', {}).get('pipeline_status', [])
+            'user_inputs': truth_data.get('project_inputs', {})
         }
 
-    def _parse_hierarchical_structure(self, work_breakdown_structure: List[Dict], truth_data: Dict) -> Tuple[List[Dict], List[Dict]]:
+    def _parse_hierarchical_structure(self, work_breakdown_structure: List[Dict], truth_data: Dict,
+                                      truth_index: Optional[TruthIndex] = None) -> Tuple[List[Dict], List[Dict]]:
         """
         Парсит иерархическую структуру и подготавливает данные для красивого отображения
 
+        Args:
+            truth_index: Индексы по truth_data (строятся, если не переданы)
+
         Returns:
             Tuple[List[Dict], List[Dict]]: (categories, packages_with_data)
         """
         categories = []
+        categories_by_id = {}
         packages = []
+        index = truth_index or TruthIndex(truth_data)
 
-        # Получаем данные из результатов агентов
-        scheduled_packages = truth_data.get('results', {}).get('scheduled_packages', [])
-        package_assignments = truth_data.get('results', {}).get('package_assignments', {})
-        volume_calculations = truth_data.get('results', {}).get('volume_calculations', [])
-
-        # Создаем индексы для быстрого поиска
-        schedule_by_id = {pkg.get('package_id'): pkg for pkg in scheduled_packages}
-        volume_by_id = {vol.get('package_id'): vol for vol in volume_calculations}
+        # Индексы для быстрого поиска по результатам агентов
+        schedule_by_id = index.schedule_by_package
+        volume_by_id = index.volume_by_package
 
         # Если нет отдельных scheduled_packages, извлекаем данные из work_breakdown_structure напрямую
-        if not scheduled_packages:
+        if not schedule_by_id:
             logger.info("📊 Используем данные напрямую из work_breakdown_structure (календарь в пакетах)")
             schedule_by_id = {}
             for item in work_breakdown_structure:
@@ -282,11 +285,13 @@ class MultiPageScheduleGenerator:
         # Обрабатываем структуру
         for item in work_breakdown_structure:
             if item.get('type') == 'category':
-                categories.append({
+                category = {
                     'id': item.get('id'),
                     'name': item.get('name'),
                     'child_packages': []
-                })
+                }
+                categories.append(category)
+                categories_by_id.setdefault(category['id'], category)
             elif item.get('type') == 'package':
                 package_id = item.get('id')
 
@@ -296,7 +301,7 @@ class MultiPageScheduleGenerator:
                     'name': item.get('name'),
                     'description': item.get('description', ''),
                     'parent_id': item.get('parent_id'),
-                    'category_name': self._find_category_name(item.get('parent_id'), work_breakdown_structure),
+                    'category_name': index.category_name(item.get('parent_id')),
 
                     # Данные планирования
                     'schedule_blocks': schedule_by_id.get(package_id, {}).get('schedule_blocks', []),
@@ -312,20 +317,12 @@ class MultiPageScheduleGenerator:
                 packages.append(package_data)
 
                 # Добавляем пакет к соответствующей категории
-                for category in categories:
-                    if category['id'] == item.get('parent_id'):
-                        category['child_packages'].append(package_data)
-                        break
+                category = categories_by_id.get(item.get('parent_id'))
+                if category is not None:
+                    category['child_packages'].append(package_data)
 
         return categories, packages
 
-    def _find_category_name(self, category_id: str, work_breakdown_structure: List[Dict]) -> str:
-        """Находит название категории по её ID"""
-        for item in work_breakdown_structure:
-            if item.get('type') == 'category' and item.get('id') == category_id:
-                return item.get('name', 'Без категории')
-        return 'Без категории'
-
     def _create_hierarchical_schedule_sheet(self, ws, categories: List[Dict], work_packages: List[Dict], timeline_blocks: List[Dict], project_info: Dict):
         """Создает красивый иерархический лист с календарным графиком"""
 
@@ -841,6 +838,10 @@ class MultiPageScheduleGenerator:
         
         current_row = 3
         
+        # Индексы для поиска работ пакета
+        packages_by_id = index_packages(work_packages)
+        works_by_package = group_works_by_package(project_info.get('source_work_items', []))
+        
         # Создаем детальную информацию для каждого пакета
         for i, package in enumerate(work_packages, 1):
             # Заголовок пакета
@@ -932,7 +933,7 @@ class MultiPageScheduleGenerator:
             current_row += 1
             
             # Найдем работы этого пакета
-            package_works = self._get_package_works(package.get('package_id'), work_packages, project_info)
+            package_works = self._get_package_works(package.get('package_id'), packages_by_id, works_by_package)
             
             for j, work in enumerate(package_works, 1):
                 ws.cell(row=current_row, column=1, value=j).alignment = self.center_align
@@ -952,40 +953,37 @@ class MultiPageScheduleGenerator:
         # Применяем форматирование
         self._format_packages_sheet(ws)
     
-    def _get_package_works(self, package_id, work_packages, project_info):
-        """Получает список работ для указанного пакета"""
+    def _get_package_works(self, package_id, packages_by_id, works_by_package):
+        """Получает список работ для указанного пакета (по индексам index_packages и group_works_by_package)"""
         works = []
         
         # Сначала ищем в source_work_items
-        source_works = project_info.get('source_work_items', [])
-        for work in source_works:
-            if work.get('package_id') == package_id:
-                works.append({
-                    'code': work.get('code', 'N/A'),
-                    'name': work.get('name', 'Без названия'),
-                    'unit': work.get('unit', 'шт'),
-                    'quantity': work.get('quantity', 0),
-                    'role': 'исходная работа'
-                })
+        for work in works_by_package.get(package_id, []):
+            works.append({
+                'code': work.get('code', 'N/A'),
+                'name': work.get('name', 'Без названия'),
+                'unit': work.get('unit', 'шт'),
+                # Количество в записи сметы, для true.json до quantity_raw - число
+                'quantity': work.get('quantity_raw') or work.get('quantity', 0),
+                'role': 'исходная работа'
+            })
         
         # Если не нашли в source_work_items, ищем в calculations или volume_data пакета
-        if not works:
-            for pkg in work_packages:
-                if pkg.get('package_id') == package_id or pkg.get('id') == package_id:
-                    # Приоритет: calculations -> volume_data (новая структура первее)
-                    calculations = pkg.get('calculations', {})
-                    volume_data = pkg.get('volume_data', {})
-                    component_analysis = calculations.get('component_analysis', []) or volume_data.get('component_analysis', [])
-
-                    for component in component_analysis:
-                        works.append({
-                            'code': component.get('code', 'N/A'),
-                            'name': component.get('work_name', 'Без названия'),
-                            'unit': component.get('unit', 'шт'),
-                            'quantity': component.get('quantity', 0),
-                            'role': 'компонент пакета'
-                        })
-                    break
+        pkg = packages_by_id.get(package_id)
+        if not works and pkg is not None:
+            # Приоритет: calculations -> volume_data (новая структура первее)
+            calculations = pkg.get('calculations', {})
+            volume_data = pkg.get('volume_data', {})
+            component_analysis = calculations.get('component_analysis', []) or volume_data.get('component_analysis', [])
+
+            for component in component_analysis:
+                works.append({
+                    'code': component.get('code', 'N/A'),
+                    'name': component.get('work_name', 'Без названия'),
+                    'unit': component.get('unit', 'шт'),
+                    'quantity': component.get('quantity', 0),
+                    'role': 'компонент пакета'
+                })
         
         return works
     
@@ -1254,19 +1252,23 @@ class MultiPageScheduleGenerator:
 
 
 # Обновленная функция для использования в пайплайне
-def generate_multipage_excel_report(input_file: str, output_path: str) -> str:
+def generate_multipage_excel_report(input_file: str, output_path: str,
+                                    truth_data: Optional[Mapping] = None,
+                                    truth_index: Optional[TruthIndex] = None) -> str:
     """
     Генерация многостраничного Excel отчета в новом формате
     
     Args:
         input_file: Путь к файлу true.json
         output_path: Папка для сохранения
+        truth_data: Уже открытые данные true.json (хранилище пайплайна)
+        truth_index: Индексы по truth_data (хранилище пайплайна)
         
     Returns:
         Путь к созданному файлу
     """
     generator = MultiPageScheduleGenerator()
-    return generator.generate_multipage_excel(input_file, output_path)
+    return generator.generate_multipage_excel(input_file, output_path, truth_data, truth_index)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+"""
+Клиент API "Сметного Дела" для HerZog v3.0
+Задача: Обогащение работ официальными наименованиями расценок (Шаг 2 пайплайна)
+
+Все уникальные шифры запрашиваются параллельно через общий пул соединений aiohttp
+с ограничением одновременных запросов. Ответы хранятся в постоянном кэше
+по (база, шифр) с TTL, поэтому повторные проекты не обращаются к API. Кэш читается
+одним запросом до обращений к API и пишется одной транзакцией после них, в отдельном
+потоке - SQLite не блокирует event loop.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = os.getenv('SMETNOEDELO_API_URL', 'https://cs.smetnoedelo.ru/api/')
+DEFAULT_DB_PATH = os.path.join(os.getenv('CACHE_DIR', 'cache'), 'smetnoedelo.sqlite3')
+DEFAULT_TTL_SECONDS = int(os.getenv('SMETNOEDELO_CACHE_TTL_DAYS', '30')) * 24 * 3600
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('SMETNOEDELO_MAX_CONCURRENCY', '8'))
+REQUEST_TIMEOUT_SECONDS = 10
+
+# Базы API по префиксу шифра (согласно документации API)
+BASE_MAPPING = {
+    'ГЭСН': 'gesn',
+    'ГЭСНм': 'gesnm',
+    'ГЭСНмр': 'gesnmr',
+    'ГЭСНп': 'gesnp',
+    'ГЭСНр': 'gesnr',
+    'ФЕР': 'fer',
+    'ФЕРм': 'ferm',
+    'ФЕРмр': 'fermr',
+    'ФЕРп': 'ferp',
+    'ФЕРр': 'ferr',
+    'ТЕР': 'gesn',  # Территориальные расценки обычно в ГЭСН
+    # Материалы - пока не работают в API
+    'ФСБЦ': 'fsbcm',
+    'ФССЦм': 'fsscm',
+    'ФССЦо': 'fssco',
+    'ФСЭМ': 'fsem'
+}
+
+# Шифров в одном запросе IN (...) к кэшу SQLite
+SQLITE_IN_CHUNK = 500
+
+# Шифр сравнивается в верхнем регистре; длинные префиксы первыми (ГЭСНмр раньше ГЭСН).
+# Прежний перебор брал первый совпавший префикс в исходном регистре, и все шифры
+# ГЭСНм/ГЭСНмр/ГЭСНп/ГЭСНр и ФЕРм/ФЕРмр/ФЕРп/ФЕРр уходили в базы gesn и fer
+_BASE_PREFIXES = sorted(((prefix.upper(), base) for prefix, base in BASE_MAPPING.items()),
+                        key=lambda entry: len(entry[0]), reverse=True)
+
+
+def detect_base(code: str) -> Optional[str]:
+    """База API для шифра расценки или None"""
+    code_upper = code.upper().strip()
+    for prefix, base in _BASE_PREFIXES:
+        if code_upper.startswith(prefix):
+            return base
+    return None
+
+
+class SmetnoedeloCache:
+    """
+    Постоянный кэш официальных наименований в SQLite
+
+    Хранит и отрицательные ответы (шифр не найден) - пустым наименованием.
+    Ошибки базы не прерывают обогащение: get возвращает промахи, put пропускается.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS official_names ("
+                    " base TEXT NOT NULL,"
+                    " code TEXT NOT NULL,"
+                    " official_name TEXT NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " PRIMARY KEY (base, code))"
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Не удалось открыть кэш Сметного Дела {self.db_path}: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, base: str, code: str) -> Optional[str]:
+        """
+        Наименование из кэша: строка (пустая - шифр не найден в API) или None при промахе
+        """
+        return self.get_many([(base, code)]).get((base, code))
+
+    def get_many(self, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """Наименования из кэша для пар (база, шифр) одним соединением; промахов в ответе нет"""
+        keys = set(keys)
+        codes = sorted({code for _, code in keys})
+        found = {}
+        try:
+            with closing(self._connect()) as conn:
+                for start in range(0, len(codes), SQLITE_IN_CHUNK):
+                    chunk = codes[start:start + SQLITE_IN_CHUNK]
+                    rows = conn.execute(
+                        f"SELECT base, code, official_name FROM official_names "
+                        f"WHERE created_at >= ? AND code IN ({', '.join('?' * len(chunk))})",
+                        (time.time() - self.ttl_seconds, *chunk)
+                    )
+                    found.update(((base, code), name) for base, code, name in rows if (base, code) in keys)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Ошибка чтения кэша Сметного Дела: {e}")
+            return {}
+        return found
+
+    def put(self, base: str, code: str, official_name: str) -> None:
+        """Сохраняет ответ API"""
+        self.put_many([(base, code, official_name)])
+
+    def put_many(self, rows: List[Tuple[str, str, str]]) -> None:
+        """Сохраняет ответы API (база, шифр, наименование) одной транзакцией"""
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO official_names VALUES (?, ?, ?, ?)",
+                    [(base, code, official_name, now) for base, code, official_name in rows]
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Не удалось записать кэш Сметного Дела: {e}")
+
+
+class SmetnoedeloClient:
+    """
+    Асинхронный клиент API с общим пулом соединений
+
+    Использование:
+        async with SmetnoedeloClient(api_token) as client:
+            names = await client.enrich(codes)
+    """
+
+    def __init__(self, api_token: str, api_url: str = DEFAULT_API_URL,
+                 cache: Optional[SmetnoedeloCache] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.api_token = api_token
+        self.api_url = api_url
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> 'SmetnoedeloClient':
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self._session.close()
+        self._session = None
+
+    async def get_official_name(self, code: str) -> Optional[str]:
+        """
+        Официальное наименование расценки
+
+        Returns:
+            Наименование или None (база не определена, шифр не найден, ошибка API)
+        """
+        return (await self.enrich([code])).get(code)
+
+    async def _request(self, base: str, code: str) -> Optional[str]:
+        """
+        Запрос к API
+
+        Returns:
+            BASE_NAME, пустая строка если шифр не найден, None при ошибке
+        """
+        params = {'token': self.api_token, 'base': base, 'code': code}
+
+        try:
+            async with self._semaphore:
+                async with self._session.get(self.api_url, params=params) as response:
+                    if response.status == 404:
+                        logger.warning(f"Код {code} не найден в API Сметного Дела")
+                        return ''
+
+                    if response.status != 200:
+                        logger.error(f"Ошибка API Сметного Дела: {response.status}")
+                        return None
+
+                    data = await response.json(content_type=None)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Ошибка при запросе к API Сметного Дела для кода {code}: {str(e)}")
+            return None
+
+        # Ответ не объектом (список, строка) - неожиданный формат, не кэшируем
+        if not isinstance(data, dict):
+            logger.warning(f"API вернул неожиданный ответ для кода {code}: {str(data)[:200]}")
+            return None
+
+        # Проверяем на ошибки в ответе (например, исчерпан лимит токена) - не кэшируем
+        if data.get('error'):
+            logger.warning(f"API вернул ошибку для кода {code}: {data.get('error')}")
+            return None
+
+        official_name = data.get('BASE_NAME', '')  # Используем BASE_NAME вместо NAME
+        logger.info(f"API успешно вернул данные для {code}: {official_name}")
+        return official_name
+
+    async def enrich(self, codes: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Официальные наименования для всех уникальных шифров (параллельно)
+
+        Returns:
+            Словарь {шифр: наименование или None}
+        """
+        bases = {}
+        for code in dict.fromkeys(code for code in codes if code):
+            bases[code] = detect_base(code)
+            if not bases[code]:
+                logger.warning(f"Не удалось определить базу для кода {code}")
+        keys = [(base, code) for code, base in bases.items() if base]
+
+        names = {}
+        if self.cache is not None and keys:
+            names = await asyncio.to_thread(self.cache.get_many, keys)
+
+        missing = [key for key in keys if key not in names]
+        fetched = await asyncio.gather(*(self._request(base, code) for base, code in missing))
+
+        # Ошибки сети и сервера (None) не кэшируем, "не найдено" (пустая строка) - кэшируем
+        answered = [(base, code, name) for (base, code), name in zip(missing, fetched) if name is not None]
+        if self.cache is not None and answered:
+            await asyncio.to_thread(self.cache.put_many, answered)
+        names.update(((base, code), name) for base, code, name in answered)
+
+        return {code: names.get((base, code)) or None for code, base in bases.items()}
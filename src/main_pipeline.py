@@ -5,11 +5,16 @@
 
 import os
 import json
+import asyncio
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 from .shared.truth_initializer import create_true_json, get_current_agent, update_pipeline_status
+from .shared.revision import load_revision_mapping, carry_over_classifications, apply_revision
+from .shared.truth_store import TruthStore
+from .shared.debug_artifacts import artifact_writer
+from .shared.claude_client import claude_client
 from .ai_agents.agent_runner import run_agent
 from .ai_agents.new_agent_runner import run_new_agent
 
@@ -18,8 +23,17 @@ logger = logging.getLogger(__name__)
 class HerzogPipeline:
     """Главный класс пайплайна обработки"""
     
-    def __init__(self, project_path: str):
+    def __init__(self, project_path: str, previous_project_path: Optional[str] = None,
+                 persist_intermediates: bool = False):
         self.project_path = project_path
+        # Отладка: читаемые (с отступами) raw/classified_estimates.json и project_data.json
+        self.persist_intermediates = persist_intermediates
+        self._pending_writes = []
+        # true.json разбирается один раз и передается агентам и генератору отчета
+        self.truth_store: Optional[TruthStore] = None
+        # Режим ревизии: проект с предыдущей версией сметы, результаты которого переиспользуются
+        self.previous_project_path = previous_project_path
+        self.revision_mapping = None
         self.progress_callback = None
         self.steps = {
             1: "extraction",
@@ -64,18 +78,26 @@ class HerzogPipeline:
             await self._notify_progress(0, 'started', '🚀 Запуск обработки проекта...')
             
             # Шаг 1-3: Подготовка данных (как раньше)
-            await self._prepare_project_data()
+            project_data = await self._prepare_project_data()
             
             # Создаем true.json из подготовленных данных
             truth_path = os.path.join(self.project_path, "true.json")
             
-            if not os.path.exists(truth_path):
+            created = not os.path.exists(truth_path)
+            if created:
                 logger.info("📄 Создание true.json...")
-                success = create_true_json(self.project_path)
+                success = create_true_json(self.project_path, project_data)
                 if not success:
                     raise Exception("Не удалось создать true.json")
                 logger.info("✅ true.json создан успешно")
             
+            self.truth_store = TruthStore(truth_path)
+            
+            if created and self.revision_mapping is not None:
+                results['revision'] = apply_revision(
+                    truth_path, self.previous_project_path, self.revision_mapping, self.truth_store
+                )
+            
             # Запускаем агентов по очереди
             while True:
                 current_agent = get_current_agent(truth_path)
@@ -106,7 +128,7 @@ class HerzogPipeline:
                 
                 if current_agent in new_agents:
                     # Запускаем нового агента
-                    result = await run_new_agent(current_agent, self.project_path)
+                    result = await run_new_agent(current_agent, self.project_path, self.truth_store)
                     success = result.get('success', False)
                 else:
                     # Запускаем старую логику
@@ -146,10 +168,14 @@ class HerzogPipeline:
             results['failed_at'] = datetime.now().isoformat()
             logger.error(f"❌ Ошибка в пайплайне: {e}")
         
+        finally:
+            await self._flush_pending_writes()
+            self._log_rate_limit_metrics()
+        
         return results
     
-    async def _prepare_project_data(self):
-        """Выполняет шаги 1-3: подготовка данных для true.json"""
+    async def _prepare_project_data(self) -> Dict:
+        """Выполняет шаги 1-3: подготовка данных для true.json (данные передаются между шагами в памяти)"""
         
         # Шаг 1: Извлечение данных из Excel
         await self._notify_progress(1, 'started', '📊 Извлекаю данные из Excel файлов...')
@@ -163,7 +189,7 @@ class HerzogPipeline:
         # Шаг 2: Классификация работ/материалов
         await self._notify_progress(2, 'started', '🏷️ Классифицирую работы и материалы...')
         logger.info("Шаг 2: Классификация...")
-        step2_result = await self.run_classification()
+        step2_result = await self.run_classification(step1_result['records'])
         if not step2_result['success']:
             await self._notify_progress(2, 'error', '❌ Ошибка классификации')
             raise Exception(f"Ошибка на шаге 2: {step2_result['error']}")
@@ -172,30 +198,75 @@ class HerzogPipeline:
         # Шаг 3: Подготовка единого файла проекта
         await self._notify_progress(3, 'started', '📋 Подготавливаю данные проекта...')
         logger.info("Шаг 3: Подготовка проекта...")
-        step3_result = await self.run_preparation()
+        step3_result = await self.run_preparation(step2_result['records'])
         if not step3_result['success']:
             await self._notify_progress(3, 'error', '❌ Ошибка подготовки данных')
             raise Exception(f"Ошибка на шаге 3: {step3_result['error']}")
         await self._notify_progress(3, 'completed', '✅ Данные подготовлены')
+        
+        return step3_result['project_data']
+    
+    def _persist_json(self, path: str, data) -> None:
+        """
+        Запись промежуточного артефакта в фоновом потоке, вне критического пути пайплайна
+        
+        Данные между шагами 1-3 передаются в памяти и после передачи не изменяются.
+        """
+        indent = 2 if self.persist_intermediates else None
+        
+        def write():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+        
+        self._pending_writes.append(asyncio.create_task(asyncio.to_thread(write)))
+    
+    def _log_rate_limit_metrics(self) -> None:
+        """Ожидание запросов к LLM в очереди ограничителя (общие для процесса метрики)"""
+        for model, metrics in claude_client.get_rate_limit_metrics().items():
+            if metrics['waited_requests'] or metrics['rate_limited']:
+                logger.info(f"⏳ Лимиты {model}: ждали {metrics['waited_requests']}/{metrics['requests']} запросов, "
+                            f"всего {metrics['total_wait_seconds']} с, максимум {metrics['max_wait_seconds']} с, "
+                            f"429: {metrics['rate_limited']}")
+    
+    async def _flush_pending_writes(self) -> None:
+        """Дожидается фоновой записи артефактов (промежуточных файлов и отладочных файлов агентов)"""
+        pending, self._pending_writes = self._pending_writes, []
+        for outcome in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(outcome, Exception):
+                logger.warning(f"⚠️ Не удалось сохранить промежуточный файл: {outcome}")
+        await asyncio.to_thread(artifact_writer.flush)
     
     async def run_extraction(self) -> Dict:
         """Шаг 1: Извлечение данных из Excel файлов"""
         try:
-            from .data_processing.extractor import extract_estimates
+            from .data_processing.extractor import find_excel_files, extract_from_files_parallel
+            from .data_processing.extraction_cache import ExtractionCache
             
             input_path = f"{self.project_path}/0_input"
             output_path = f"{self.project_path}/1_extracted"
             
-            # Извлекаем данные из всех Excel файлов в папке input
-            raw_data = extract_estimates(input_path)
+            # Извлекаем данные из всех Excel файлов и всех листов в папке input параллельно
+            # Потоковый режим: лист читается построчно, память не растет с размером сметы
+            # Повторно загруженные файлы берутся из кэша по SHA-256 содержимого
+            extraction = extract_from_files_parallel(
+                find_excel_files(input_path), streaming=True, cache=ExtractionCache()
+            )
+            raw_data = extraction['records']
             
-            # Сохраняем сырые данные
-            with open(f"{output_path}/raw_estimates.json", 'w', encoding='utf-8') as f:
-                json.dump(raw_data, f, ensure_ascii=False, indent=2)
+            if extraction['errors']:
+                logger.warning(f"⚠️ Ошибки извлечения по файлам: {extraction['errors']}")
+            
+            # Сохраняем сырые данные (нужны режиму ревизии следующих версий сметы)
+            self._persist_json(f"{output_path}/raw_estimates.json", raw_data)
             
             return {
                 'success': True,
+                'records': raw_data,
                 'items_extracted': len(raw_data),
+                'sheets_processed': extraction['sheets_processed'],
+                'cache_hits': extraction['cache_hits'],
+                'file_errors': extraction['errors'],
                 'output_file': f"{output_path}/raw_estimates.json"
             }
             
@@ -203,20 +274,24 @@ class HerzogPipeline:
             logger.error(f"Ошибка извлечения: {e}")
             return {'success': False, 'error': str(e)}
     
-    async def run_classification(self) -> Dict:
+    async def run_classification(self, raw_data: List[Dict]) -> Dict:
         """Шаг 2: Классификация работ и материалов"""
         try:
-            from .data_processing.classifier import classify_estimates
+            from .data_processing.classifier import classify_items
+            from .data_processing.classification_cache import ClassificationCache
             
-            input_file = f"{self.project_path}/1_extracted/raw_estimates.json"
             output_path = f"{self.project_path}/2_classified"
             
-            # Классифицируем все позиции
-            classified_data = await classify_estimates(input_file)
+            if self.previous_project_path:
+                classified_data = await self._classify_revision(raw_data)
+            else:
+                # Классифицируем все позиции, уже встречавшиеся в прошлых проектах берутся из кэша
+                logger.info(f"Загружено {len(raw_data)} записей для классификации")
+                classified_data = await classify_items(raw_data, project_dir=self.project_path,
+                                                       cache=ClassificationCache())
             
             # Сохраняем классифицированные данные
-            with open(f"{output_path}/classified_estimates.json", 'w', encoding='utf-8') as f:
-                json.dump(classified_data, f, ensure_ascii=False, indent=2)
+            self._persist_json(f"{output_path}/classified_estimates.json", classified_data)
             
             # Считаем статистику
             work_count = len([item for item in classified_data if item.get('classification') == 'Работа'])
@@ -224,6 +299,7 @@ class HerzogPipeline:
             
             return {
                 'success': True,
+                'records': classified_data,
                 'total_items': len(classified_data),
                 'work_items': work_count,
                 'material_items': material_count,
@@ -234,24 +310,45 @@ class HerzogPipeline:
             logger.error(f"Ошибка классификации: {e}")
             return {'success': False, 'error': str(e)}
     
-    async def run_preparation(self) -> Dict:
-        """Шаг 3: Подготовка единого файла проекта"""
+    async def _classify_revision(self, raw_data: List[Dict]) -> list:
+        """Классификация ревизии: неизмененные позиции берут результат предыдущего проекта"""
+        from .data_processing.classifier import classify_items
+        from .data_processing.classification_cache import ClassificationCache
+        
+        self.revision_mapping = load_revision_mapping(self.project_path, self.previous_project_path, raw_data)
+        
+        with open(f"{self.previous_project_path}/2_classified/classified_estimates.json", 'r', encoding='utf-8') as f:
+            previous_classified = json.load(f)
+        
+        classified_data, pending = carry_over_classifications(raw_data, previous_classified, self.revision_mapping)
+        logger.info(f"🔁 Классификация перенесена для {len(raw_data) - len(pending)} позиций, "
+                    f"к классификации {len(pending)}")
+        
+        newly_classified = iter(
+            await classify_items(pending, project_dir=self.project_path, cache=ClassificationCache()) if pending else []
+        )
+        return [item if item is not None else next(newly_classified) for item in classified_data]
+    
+    async def run_preparation(self, classified_data: List[Dict]) -> Dict:
+        """Шаг 3: Подготовка единых данных проекта"""
         try:
-            from .data_processing.preparer import prepare_project_data
+            from .data_processing.preparer import build_project_data
             
-            raw_estimates_file = f"{self.project_path}/1_extracted/raw_estimates.json"
             directives_file = f"{self.project_path}/0_input/directives.json"
             output_path = f"{self.project_path}/3_prepared"
             
-            # Подготавливаем единый файл проекта (preparer сам вызовет classifier)
-            project_data = prepare_project_data(raw_estimates_file, directives_file)
+            with open(directives_file, 'r', encoding='utf-8') as f:
+                directives = json.load(f)
             
-            # Сохраняем подготовленные данные
-            with open(f"{output_path}/project_data.json", 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, ensure_ascii=False, indent=2)
+            project_data = build_project_data(classified_data, directives)
+            
+            # Мастер-файл этапа (CODE_GUIDELINES) пишется всегда, в фоне и компактно;
+            # true.json создается из данных в памяти и этой записи не ждет
+            self._persist_json(f"{output_path}/project_data.json", project_data)
             
             return {
                 'success': True,
+                'project_data': project_data,
                 'work_items': len(project_data.get('work_items', [])),
                 'timeline_blocks': len(project_data.get('timeline_blocks', [])),
                 'output_file': f"{output_path}/project_data.json"
@@ -284,7 +381,12 @@ class HerzogPipeline:
             
             # 1. Генерируем многостраничный Excel отчет
             logger.info("📋 Создание многостраничного Excel отчета...")
-            excel_file = generate_multipage_excel_report(input_file, output_path)
+            if self.truth_store is not None:
+                excel_file = generate_multipage_excel_report(
+                    input_file, output_path, self.truth_store.data, self.truth_store.index
+                )
+            else:
+                excel_file = generate_multipage_excel_report(input_file, output_path)
             results['excel_file'] = excel_file
             logger.info(f"✅ Excel создан: {excel_file}")
             
@@ -321,8 +423,40 @@ class HerzogPipeline:
             return {'success': False, 'error': str(e)}
 
 # Публичная функция для запуска пайплайна
-async def run_pipeline(project_path: str, progress_callback=None) -> Dict:
-    """Запуск полного пайплайна обработки проекта"""
-    pipeline = HerzogPipeline(project_path)
+async def run_pipeline(project_path: str, progress_callback=None,
+                       previous_project_path: Optional[str] = None,
+                       persist_intermediates: bool = False) -> Dict:
+    """
+    Запуск полного пайплайна обработки проекта
+    
+    previous_project_path включает режим ревизии: результаты агентов для
+    неизмененных позиций берутся из указанного проекта.
+    persist_intermediates сохраняет промежуточные файлы шагов 1-3 с отступами для отладки
+    """
+    pipeline = HerzogPipeline(project_path, previous_project_path, persist_intermediates)
     pipeline.progress_callback = progress_callback
-    return await pipeline.run_full_pipeline()
\ No newline at end of file
+    return await pipeline.run_full_pipeline()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    parser = argparse.ArgumentParser(description="Запуск пайплайна HerZog для папки проекта")
+    parser.add_argument('project_path', help="Путь к проекту (с 0_input)")
+    parser.add_argument('--previous', dest='previous_project_path', help="Проект предыдущей версии сметы (режим ревизии)")
+    parser.add_argument('--persist-intermediates', action='store_true',
+                        help="Сохранять raw/classified_estimates.json и project_data.json с отступами (для отладки)")
+    args = parser.parse_args()
+    
+    async def main():
+        await claude_client.start()
+        try:
+            return await run_pipeline(args.project_path, previous_project_path=args.previous_project_path,
+                                      persist_intermediates=args.persist_intermediates)
+        finally:
+            await claude_client.close()
+    
+    result = asyncio.run(main())
+    print(json.dumps(result, ensure_ascii=False, indent=2))
\ No newline at end of file
@@ -4,16 +4,18 @@
 
 import logging
 import asyncio
-from typing import Dict
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
-async def launch_pipeline(project_path: str, progress_callback=None) -> Dict:
+async def launch_pipeline(project_path: str, progress_callback=None,
+                          previous_project_path: Optional[str] = None) -> Dict:
     """
     Запуск главного пайплайна HerZog v3.0
     
     Args:
         project_path: Путь к проекту
+        previous_project_path: Предыдущая версия проекта (режим ревизии, /revision в боте)
         
     Returns:
         Результат выполнения пайплайна
@@ -25,7 +27,8 @@ async def launch_pipeline(project_path: str, progress_callback=None) -> Dict:
         from .main_pipeline import run_pipeline
         
         # Запускаем пайплайн с колбеком
-        result = await run_pipeline(project_path, progress_callback)
+        result = await run_pipeline(project_path, progress_callback,
+                                    previous_project_path=previous_project_path)
         
         logger.info(f"📊 Пайплайн завершен: success={result.get('success')}")
         
@@ -0,0 +1,57 @@
+"""
+Чекпоинты ответов LLM для агентов HerZog v3.0
+Задача: Повторный запуск агента не оплачивает заново уже полученные ответы
+
+Ответ LLM на батч (works_to_packages) или пакет (counter) сохраняется вместе
+с ключом - хэшем входных данных запроса и шаблона промпта (без "соли").
+При перезапуске ответ берется из файла, только если ключ совпал и ответ успешный;
+проверку содержимого ответа выполняет сам агент. Файл пишется атомарно,
+поэтому прерванная запись не оставляет поврежденного чекпоинта.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY_FIELD = 'checkpoint_key'
+
+
+def checkpoint_key(*parts: Any) -> str:
+    """Стабильный ключ входных данных запроса"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_checkpoint(path: str, key: str) -> Optional[Dict]:
+    """
+    Успешный ответ LLM из чекпоинта
+
+    Returns:
+        Ответ или None (файла нет, он поврежден, ответ с ошибкой или для других входных данных)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            response = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Чекпоинт {path} не читается, запрос будет повторен: {e}")
+        return None
+
+    if not isinstance(response, dict) or response.get(CHECKPOINT_KEY_FIELD) != key:
+        return None
+    if not response.get('success', False):
+        return None
+    return response
+
+
+def save_checkpoint(path: str, key: str, response: Dict) -> None:
+    """Сохраняет ответ LLM с ключом входных данных (атомарно: временный файл + rename)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({**response, CHECKPOINT_KEY_FIELD: key}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -14,9 +14,19 @@ import ast
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+from .rate_limiter import backoff_delay, estimate_request_tokens, parse_retry_after, rate_limiter
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Пул HTTP-соединений к OpenRouter: одна сессия на клиента, соединения переиспользуются (keep-alive)
+HTTP_POOL_LIMIT = int(os.getenv('HERZOG_HTTP_POOL_LIMIT', '20'))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HERZOG_HTTP_KEEPALIVE_TIMEOUT', '60'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HERZOG_HTTP_CONNECT_TIMEOUT', '15'))
+# Ожидание данных ответа: генерация 8000 токенов занимает минуты
+HTTP_READ_TIMEOUT = float(os.getenv('HERZOG_HTTP_READ_TIMEOUT', '300'))
+DNS_CACHE_TTL = 300
+
 class ClaudeClient:
     def __init__(self):
         self.api_key = os.getenv('OPENROUTER_API_KEY')
@@ -52,6 +62,60 @@ class ClaudeClient:
             'estimated_cost': 0.0
         }
 
+        # Общий для процесса ограничитель RPM/TPM по моделям
+        self.rate_limiter = rate_limiter
+
+        # Общая HTTP-сессия (создается в работающем event loop при первом запросе или в start())
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        """Открывает общую HTTP-сессию заранее (хук запуска бота и пайплайна)"""
+        self._get_session()
+
+    async def close(self) -> None:
+        """Закрывает общую HTTP-сессию и ее соединения (хук остановки бота и пайплайна)"""
+        session, self._session = self._session, None
+        session_loop, self._session_loop = self._session_loop, None
+        if session is None or session.closed:
+            return
+        if session_loop is not asyncio.get_running_loop():
+            logger.warning("⚠️ HTTP-сессия Claude создана в другом event loop, закрыть ее нельзя")
+            return
+        await session.close()
+        logger.info("🔌 HTTP-сессия Claude закрыта")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Общая HTTP-сессия для текущего event loop
+
+        Сессия привязана к event loop, в котором создана: после asyncio.run в новом
+        цикле (CLI, синхронные обертки) создается новая сессия.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._session_loop is loop:
+            return self._session
+
+        if self._session is not None and not self._session.closed:
+            logger.warning("⚠️ HTTP-сессия Claude от завершенного event loop не была закрыта")
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL
+        )
+        # Ожидание свободного соединения в пуле не ограничено: запросы к LLM длятся минутами
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=HTTP_CONNECT_TIMEOUT,
+            sock_read=HTTP_READ_TIMEOUT
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        self._session_loop = loop
+        logger.info(f"🔌 Открыта HTTP-сессия Claude (пул {HTTP_POOL_LIMIT} соединений)")
+        return self._session
+
     def get_model_for_agent(self, agent_name: str) -> str:
         """Получает имя модели для конкретного агента"""
         return self.agent_models.get(agent_name, self.model_name)
@@ -112,119 +176,144 @@ class ClaudeClient:
             "X-Title": "Herzog v3.0 AI Pipeline"
         }
 
+        # Оценка токенов для резерва в лимите TPM: промпт и ожидаемый ответ (уточняется по usage ответа)
+        estimated_tokens = estimate_request_tokens(prompt, system_instruction, max_tokens)
+        limiter = self.rate_limiter
+        reserved_model = None
+
+        async def release_reservation():
+            """Возвращает резерв попытки, не дошедшей до ответа 200 (429, ошибки, исключения)"""
+            nonlocal reserved_model
+            if reserved_model is not None:
+                model, reserved_model = reserved_model, None
+                await limiter.offload(limiter.release, model, estimated_tokens)
+
         for attempt in range(max_retries):
             try:
+                await limiter.acquire(model_name, estimated_tokens)
+                reserved_model = model_name
                 logger.info(f"📡 Claude запрос {attempt + 1}/{max_retries}: {model_name} {f'({agent_name})' if agent_name else ''} (промт: {len(prompt)} символов, лимит токенов: {max_tokens})")
 
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(self.base_url, json=payload, headers=headers) as response:
-                        response_data = await response.json()
-
-                        if response.status == 200:
-                            # Успешный ответ
-                            choice = response_data.get('choices', [{}])[0]
-                            message = choice.get('message', {})
-                            content = message.get('content', '')
-
-                            # Обновляем статистику
-                            usage = response_data.get('usage', {})
-                            input_tokens = usage.get('prompt_tokens', 0)
-                            output_tokens = usage.get('completion_tokens', 0)
-                            total_tokens = usage.get('total_tokens', input_tokens + output_tokens)
-
-                            # Проверяем какая модель реально использовалась
-                            actual_model = usage.get('model', model_name)
-                            if actual_model != model_name:
-                                logger.warning(f"⚠️  Запрошена {model_name}, но использована {actual_model}")
-                            else:
-                                logger.info(f"✅ Подтверждено использование модели: {actual_model}")
-
-                            self.usage_stats['total_requests'] += 1
-                            self.usage_stats['total_input_tokens'] += input_tokens
-                            self.usage_stats['total_output_tokens'] += output_tokens
-
-                            # Реальная стоимость для Claude через OpenRouter (anthropic/claude-sonnet-4 → 3.5 Sonnet)
-                            input_cost = input_tokens * 0.000003  # $0.000003 за токен (из OpenRouter документации)
-                            output_cost = output_tokens * 0.000015  # $0.000015 за токен
-                            estimated_cost = input_cost + output_cost
-                            self.usage_stats['estimated_cost'] += estimated_cost
-
-                            # Парсим JSON ответ
-                            try:
-                                cleaned_content = self._clean_json_from_markdown(content)
-                                response_json = self._try_fix_broken_json(cleaned_content)
-                                json_parse_success = True
-                            except (json.JSONDecodeError, SyntaxError, ValueError) as e:
-                                logger.error(f"❌ Ошибка парсинга JSON от Claude: {e}")
-
-                                if attempt < max_retries - 1:
-                                    logger.info(f"🔄 Повторная попытка из-за невалидного JSON (попытка {attempt + 2}/{max_retries})")
-                                    await asyncio.sleep(1 + attempt)
-                                    continue
-                                else:
-                                    return {
-                                        'success': False,
-                                        'error': f'JSON парсинг не удался после {max_retries} попыток: {e}',
-                                        'response': None,
-                                        'raw_text': content
-                                    }
-
-                            result = {
-                                'success': True,
-                                'response': response_json,
-                                'json_parse_success': json_parse_success,
-                                'raw_text': content,
-                                'model_used': model_name,
-                                'agent_name': agent_name,
-                                'usage_metadata': {
-                                    'prompt_token_count': input_tokens,
-                                    'candidates_token_count': output_tokens,
-                                    'total_token_count': total_tokens
-                                },
-                                'attempt': attempt + 1,
-                                'llm_input': prompt,
-                                'estimated_cost': estimated_cost
-                            }
-
-                            logger.info(f"✅ Успешный ответ от Claude {model_name} {f'({agent_name})' if agent_name else ''} за {attempt + 1} попытку")
-                            logger.info(f"💰 Токены: {total_tokens} (~${estimated_cost:.4f}), Общая стоимость сессии: ~${self.usage_stats['estimated_cost']:.4f}")
-
-                            return result
-
-                        elif response.status == 429:
-                            # Rate limiting - переключаемся на Claude 3.5 для экономии времени
-                            if model_name == 'anthropic/claude-sonnet-4' and attempt == 0:
-                                logger.warning(f"⏰ 429 Rate Limit на Sonnet 4! Переключаюсь на Claude 3.5")
-                                model_name = 'anthropic/claude-3.5-sonnet-20241022'
-                                payload["model"] = model_name
-                                continue
-
-                            retry_after = response.headers.get('retry-after', '60')
-                            retry_delay = min(int(retry_after), 10)  # Максимум 10 сек
+                session = self._get_session()
+                async with session.post(self.base_url, json=payload, headers=headers) as response:
+                    response_data = await response.json()
+
+                    if response.status == 200:
+                        # Успешный ответ
+                        choice = response_data.get('choices', [{}])[0]
+                        message = choice.get('message', {})
+                        content = message.get('content', '')
+
+                        # Обновляем статистику
+                        usage = response_data.get('usage', {})
+                        input_tokens = usage.get('prompt_tokens', 0)
+                        output_tokens = usage.get('completion_tokens', 0)
+                        total_tokens = usage.get('total_tokens', input_tokens + output_tokens)
+
+                        # Проверяем какая модель реально использовалась
+                        actual_model = usage.get('model', model_name)
+                        if actual_model != model_name:
+                            logger.warning(f"⚠️  Запрошена {model_name}, но использована {actual_model}")
+                        else:
+                            logger.info(f"✅ Подтверждено использование модели: {actual_model}")
+
+                        reserved_model = None
+                        await limiter.offload(limiter.record_usage, model_name, estimated_tokens, total_tokens)
+                        self.usage_stats['total_requests'] += 1
+                        self.usage_stats['total_input_tokens'] += input_tokens
+                        self.usage_stats['total_output_tokens'] += output_tokens
+
+                        # Реальная стоимость для Claude через OpenRouter (anthropic/claude-sonnet-4 → 3.5 Sonnet)
+                        input_cost = input_tokens * 0.000003  # $0.000003 за токен (из OpenRouter документации)
+                        output_cost = output_tokens * 0.000015  # $0.000015 за токен
+                        estimated_cost = input_cost + output_cost
+                        self.usage_stats['estimated_cost'] += estimated_cost
+
+                        # Парсим JSON ответ
+                        try:
+                            cleaned_content = self._clean_json_from_markdown(content)
+                            response_json = self._try_fix_broken_json(cleaned_content)
+                            json_parse_success = True
+                        except (json.JSONDecodeError, SyntaxError, ValueError) as e:
+                            logger.error(f"❌ Ошибка парсинга JSON от Claude: {e}")
 
                             if attempt < max_retries - 1:
-                                logger.warning(f"⏰ 429 Rate Limit! Ждем {retry_delay} секунд перед попыткой {attempt + 2}...")
-                                await asyncio.sleep(retry_delay)
+                                logger.info(f"🔄 Повторная попытка из-за невалидного JSON (попытка {attempt + 2}/{max_retries})")
+                                await asyncio.sleep(1 + attempt)
                                 continue
                             else:
-                                logger.error(f"❌ Превышено максимальное количество попыток ({max_retries}) для rate limit")
-
-                        else:
-                            # Другие HTTP ошибки
-                            error_msg = response_data.get('error', {}).get('message', f'HTTP {response.status}')
-                            logger.error(f"❌ Claude API ошибка: {error_msg}")
-
-                            if attempt == max_retries - 1:
                                 return {
                                     'success': False,
-                                    'error': f'Claude API error: {error_msg}',
+                                    'error': f'JSON парсинг не удался после {max_retries} попыток: {e}',
                                     'response': None,
-                                    'attempts': max_retries
+                                    'raw_text': content
                                 }
 
-                            await asyncio.sleep(1 + attempt)
+                        result = {
+                            'success': True,
+                            'response': response_json,
+                            'json_parse_success': json_parse_success,
+                            'raw_text': content,
+                            'model_used': model_name,
+                            'agent_name': agent_name,
+                            'usage_metadata': {
+                                'prompt_token_count': input_tokens,
+                                'candidates_token_count': output_tokens,
+                                'total_token_count': total_tokens
+                            },
+                            'attempt': attempt + 1,
+                            'llm_input': prompt,
+                            'estimated_cost': estimated_cost
+                        }
+
+                        logger.info(f"✅ Успешный ответ от Claude {model_name} {f'({agent_name})' if agent_name else ''} за {attempt + 1} попытку")
+                        logger.info(f"💰 Токены: {total_tokens} (~${estimated_cost:.4f}), Общая стоимость сессии: ~${self.usage_stats['estimated_cost']:.4f}")
+
+                        return result
+
+                    elif response.status == 429:
+                        # Модель приостанавливается для всех запросов на retry-after или backoff с jitter
+                        await release_reservation()
+                        retry_after = parse_retry_after(response.headers.get('retry-after'))
+                        retry_delay = await limiter.offload(limiter.on_rate_limited, model_name, retry_after, attempt)
+
+                        # Rate limiting - переключаемся на Claude 3.5 для экономии времени
+                        # Пауза выдерживается и здесь: блокировка записана на Sonnet 4, а повтор идет на 3.5
+                        if model_name == 'anthropic/claude-sonnet-4' and attempt == 0:
+                            logger.warning(f"⏰ 429 Rate Limit на Sonnet 4! Ждем {retry_delay:.1f} секунд и переключаюсь на Claude 3.5")
+                            await asyncio.sleep(retry_delay)
+                            model_name = 'anthropic/claude-3.5-sonnet-20241022'
+                            payload["model"] = model_name
+                            continue
+
+                        if attempt < max_retries - 1:
+                            logger.warning(f"⏰ 429 Rate Limit! Ждем {retry_delay:.1f} секунд перед попыткой {attempt + 2}...")
+                            continue
+                        else:
+                            logger.error(f"❌ Превышено максимальное количество попыток ({max_retries}) для rate limit")
+
+                    else:
+                        # Другие HTTP ошибки
+                        await release_reservation()
+                        error_msg = response_data.get('error', {}).get('message', f'HTTP {response.status}')
+                        logger.error(f"❌ Claude API ошибка: {error_msg}")
+
+                        if attempt == max_retries - 1:
+                            return {
+                                'success': False,
+                                'error': f'Claude API error: {error_msg}',
+                                'response': None,
+                                'attempts': max_retries
+                            }
+
+                        await asyncio.sleep(backoff_delay(attempt))
+
+            except asyncio.CancelledError:
+                await release_reservation()
+                raise
 
             except Exception as e:
+                await release_reservation()
                 logger.error(f"❌ Ошибка при обращении к Claude API (попытка {attempt + 1}): {e}")
 
                 if attempt == max_retries - 1:
@@ -235,7 +324,7 @@ class ClaudeClient:
                         'attempts': max_retries
                     }
 
-                await asyncio.sleep(1 + attempt)
+                await asyncio.sleep(backoff_delay(attempt))
 
         return {
             'success': False,
@@ -343,6 +432,10 @@ class ClaudeClient:
         """Возвращает статистику использования API"""
         return self.usage_stats.copy()
 
+    def get_rate_limit_metrics(self) -> Dict[str, Dict]:
+        """Возвращает метрики ожидания в очереди ограничителя запросов по моделям"""
+        return self.rate_limiter.get_metrics()
+
     def reset_usage_stats(self):
         """Сбрасывает статистику использования"""
         self.usage_stats = {
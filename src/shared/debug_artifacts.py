@@ -0,0 +1,218 @@
+"""
+Отладочные артефакты агентов для HerZog v3.0
+Задача: Не блокировать event loop записью входов/ответов LLM и не раздувать папку проекта
+
+Уровень детализации - переменная HERZOG_DEBUG_ARTIFACTS:
+    off     - артефакты не сохраняются
+    summary - только сводка: раздел meta, статус ответа, модель, токены
+    full    - полные данные, каждый вызов LLM документируется целиком обычным JSON (по умолчанию)
+    dedup   - как full, но крупные значения (структура пакетов, промпты, ответы), повторяющиеся
+              между батчами, сохраняются один раз в _blobs/<sha256>.json, а в артефакте
+              заменяются ссылкой {"$blob": <sha256>, "file": <путь>}; читать через read_artifact
+Сжатие - HERZOG_DEBUG_COMPRESSION: none (по умолчанию), gzip или zstd
+(пакет zstandard; если он не установлен - gzip).
+
+Агенты вызывают write_async: данные сериализуются в отдельном потоке (снимок
+на момент вызова, event loop не блокируется), хэширование, сжатие и запись идут
+в фоновом потоке. Чекпоинты агентов (agent_checkpoints.py) нужны для продолжения
+работы и пишутся не здесь.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('off', 'summary', 'full', 'dedup')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+DEFAULT_LEVEL = os.getenv('HERZOG_DEBUG_ARTIFACTS', 'full').lower()
+DEFAULT_COMPRESSION = os.getenv('HERZOG_DEBUG_COMPRESSION', 'none').lower()
+
+BLOBS_DIR = '_blobs'
+# Значения короче не выносятся в _blobs
+BLOB_MIN_CHARS = 2048
+# Поля, которые попадают в артефакт уровня summary
+SUMMARY_FIELDS = ('meta', 'success', 'error', 'model_used', 'agent_name', 'usage_metadata',
+                  'attempt', 'estimated_cost', 'optimization')
+
+_EXTENSIONS = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def _load_zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def summarize(data: Any) -> Dict:
+    """Сводка артефакта: meta и статусные поля ответа LLM"""
+    if not isinstance(data, dict):
+        return {'type': type(data).__name__, 'length': len(data) if hasattr(data, '__len__') else None}
+    return {key: data[key] for key in SUMMARY_FIELDS if key in data}
+
+
+class ArtifactWriter:
+    """
+    Фоновая запись отладочных артефактов с уровнями детализации и дедупликацией
+    """
+
+    def __init__(self, level: Optional[str] = None, compression: Optional[str] = None):
+        self.level = (level or DEFAULT_LEVEL).lower()
+        if self.level not in LEVELS:
+            logger.warning(f"⚠️ Неизвестный уровень артефактов '{self.level}', используется full")
+            self.level = 'full'
+
+        self.compression = (compression or DEFAULT_COMPRESSION).lower()
+        self._zstd = None
+        if self.compression == 'zstd':
+            self._zstd = _load_zstd()
+            if self._zstd is None:
+                logger.warning("⚠️ zstandard не установлен, артефакты сжимаются gzip")
+                self.compression = 'gzip'
+        elif self.compression not in COMPRESSIONS:
+            logger.warning(f"⚠️ Неизвестное сжатие '{self.compression}', артефакты не сжимаются")
+            self.compression = 'none'
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: List[Future] = []
+        self._lock = threading.Lock()
+        # Уже записанные blob-файлы (пути), чтобы не писать повторно
+        self._blobs = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.level != 'off'
+
+    async def write_async(self, path: str, data: Union[Any, Callable[[], Any]],
+                          summary: Optional[Dict] = None) -> None:
+        """write в отдельном потоке: сериализация не блокирует event loop"""
+        if self.level == 'off':
+            return
+        await asyncio.to_thread(self.write, path, data, summary)
+
+    def write(self, path: str, data: Union[Any, Callable[[], Any]], summary: Optional[Dict] = None) -> None:
+        """
+        Ставит артефакт в очередь на запись
+
+        Args:
+            path: Путь к файлу (расширение сжатия добавляется автоматически)
+            data: Данные артефакта (JSON-совместимые) или функция, которая их строит
+            summary: Сводка для уровня summary (по умолчанию - summarize(data))
+        """
+        if self.level == 'off':
+            return
+        if callable(data):
+            data = data()
+
+        if self.level == 'summary':
+            text = json.dumps(summary if summary is not None else summarize(data), ensure_ascii=False)
+            parts = None
+        elif self.level == 'dedup' and isinstance(data, dict):
+            text = None
+            parts = [(key, json.dumps(value, ensure_ascii=False)) for key, value in data.items()]
+        else:
+            text = json.dumps(data, ensure_ascii=False)
+            parts = None
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='herzog-artifacts')
+            self._pending = [future for future in self._pending if not future.done()]
+            self._pending.append(self._executor.submit(self._write, path, text, parts))
+
+    def flush(self) -> None:
+        """Дожидается записи всех артефактов из очереди"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self) -> None:
+        """Дописывает очередь и останавливает фоновый поток"""
+        self.flush()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _write(self, path: str, text: Optional[str], parts) -> None:
+        try:
+            if parts is not None:
+                base_dir = os.path.dirname(path)
+                fields = []
+                for key, value_text in parts:
+                    if len(value_text) >= BLOB_MIN_CHARS:
+                        value_text = self._store_blob(base_dir, value_text)
+                    fields.append(f"{json.dumps(key, ensure_ascii=False)}: {value_text}")
+                text = '{' + ', '.join(fields) + '}'
+            self._write_file(path + _EXTENSIONS[self.compression], text)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить отладочный артефакт {path}: {e}")
+
+    def _store_blob(self, base_dir: str, value_text: str) -> str:
+        """Сохраняет значение один раз по хэшу содержимого, возвращает ссылку"""
+        digest = hashlib.sha256(value_text.encode('utf-8')).hexdigest()
+        relative_path = f"{BLOBS_DIR}/{digest}.json{_EXTENSIONS[self.compression]}"
+        blob_path = os.path.join(base_dir, relative_path)
+        if blob_path not in self._blobs:
+            if not os.path.exists(blob_path):
+                self._write_file(blob_path, value_text)
+            self._blobs.add(blob_path)
+        return json.dumps({'$blob': digest, 'file': relative_path})
+
+    def _write_file(self, path: str, text: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = text.encode('utf-8')
+        if self.compression == 'gzip':
+            payload = gzip.compress(payload, compresslevel=6)
+        elif self.compression == 'zstd':
+            payload = self._zstd.ZstdCompressor(level=3).compress(payload)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+
+def read_artifact(path: str, resolve_blobs: bool = True) -> Any:
+    """
+    Читает артефакт (в том числе сжатый) и подставляет значения из _blobs
+
+    Args:
+        path: Путь к артефакту без расширения сжатия или с ним
+    """
+    for extension in ('', '.gz', '.zst'):
+        if os.path.exists(path + extension):
+            path = path + extension
+            break
+
+    with open(path, 'rb') as f:
+        payload = f.read()
+    if path.endswith('.gz'):
+        payload = gzip.decompress(payload)
+    elif path.endswith('.zst'):
+        zstandard = _load_zstd()
+        if zstandard is None:
+            raise RuntimeError("Для чтения .zst нужен пакет zstandard")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    data = json.loads(payload.decode('utf-8'))
+
+    if resolve_blobs and isinstance(data, dict):
+        base_dir = os.path.dirname(path)
+        for key, value in data.items():
+            if isinstance(value, dict) and '$blob' in value:
+                data[key] = read_artifact(os.path.join(base_dir, value['file']), resolve_blobs=False)
+    return data
+
+
+# Глобальный экземпляр для использования в агентах
+artifact_writer = ArtifactWriter()
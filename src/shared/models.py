@@ -0,0 +1,95 @@
+"""
+Компактная модель данных работ для HerZog v3.0
+Задача: Меньше памяти и копирований на проектах с десятками тысяч работ
+
+WorkItem - работа сметы в виде dataclass со __slots__: фиксированные поля без
+словаря на каждый объект, количество - число (разбирается один раз на входе);
+исходная запись количества из сметы хранится в quantity_raw для отчетов.
+Словари остаются форматом хранения (true.json) и промптов: преобразование
+идет только на границах ввода-вывода (from_dict / to_dict).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+# Поля WorkItem в порядке их записи в true.json
+WORK_ITEM_FIELDS = ('id', 'source_file', 'source_sheet', 'code', 'name', 'unit', 'quantity', 'quantity_raw')
+
+Quantity = Union[float, str]
+
+
+def parse_quantity(value: Any) -> Quantity:
+    """
+    Количество из сметы в число ("12,5" -> 12.5, пусто -> 0.0)
+
+    Нечисловые значения ("по проекту") возвращаются как есть, чтобы не потерять данные.
+    """
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace('\xa0', '').replace(' ', '').replace(',', '.'))
+    except ValueError:
+        return value
+
+
+@dataclass(slots=True)
+class WorkItem:
+    """Работа сметы в source_work_items"""
+
+    id: str
+    source_file: str = ''
+    source_sheet: str = ''
+    code: str = ''
+    name: str = ''
+    unit: str = ''
+    quantity: Quantity = 0.0
+    # Количество как в ячейке сметы ("12,50"); пусто в true.json, созданных до появления поля
+    quantity_raw: str = ''
+    package_id: Optional[str] = None
+    # Прочие поля записи (сохраняются при обратном преобразовании)
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'WorkItem':
+        extra = {key: value for key, value in data.items()
+                 if key not in WORK_ITEM_FIELDS and key != 'package_id'}
+        return cls(
+            id=data.get('id'),
+            source_file=data.get('source_file', ''),
+            source_sheet=data.get('source_sheet', ''),
+            code=data.get('code', ''),
+            name=data.get('name', ''),
+            unit=data.get('unit', ''),
+            quantity=parse_quantity(data.get('quantity')),
+            quantity_raw=data.get('quantity_raw', ''),
+            package_id=data.get('package_id'),
+            extra=extra or None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'id': self.id,
+            'source_file': self.source_file,
+            'source_sheet': self.source_sheet,
+            'code': self.code,
+            'name': self.name,
+            'unit': self.unit,
+            'quantity': self.quantity
+        }
+        if self.quantity_raw:
+            data['quantity_raw'] = self.quantity_raw
+        if self.package_id is not None:
+            data['package_id'] = self.package_id
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def work_items_from_dicts(items: Iterable[Dict[str, Any]]) -> List[WorkItem]:
+    return [WorkItem.from_dict(item) for item in items]
+
+
+def work_items_to_dicts(items: Iterable[WorkItem]) -> List[Dict[str, Any]]:
+    return [item.to_dict() for item in items]
@@ -0,0 +1,92 @@
+"""
+Журнал статусов пайплайна для HerZog v3.0
+Задача: Статусы агентов отдельно от true.json - без перезаписи многомегабайтного файла
+
+Журнал pipeline_status.jsonl лежит рядом с true.json и только дописывается.
+Каждая строка - событие (агент, статус, время) и снимок статусов всех агентов
+после него, поэтому текущее состояние читается по последней строке с конца файла
+без разбора всего журнала. Строка, оборванная сбоем записи, пропускается.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+JOURNAL_FILE_NAME = 'pipeline_status.jsonl'
+
+# Порядок агентов пайплайна
+PIPELINE_AGENTS = ['work_packager', 'works_to_packages', 'counter', 'scheduler_and_staffer']
+
+# Размер блока чтения с конца файла (снимок четырех агентов - несколько сотен байт)
+_TAIL_CHUNK_SIZE = 4096
+
+
+def journal_path_for(truth_path: str) -> str:
+    """Путь к журналу статусов для true.json"""
+    return os.path.join(os.path.dirname(os.path.abspath(truth_path)), JOURNAL_FILE_NAME)
+
+
+def initial_pipeline_status() -> List[Dict]:
+    """Статусы нового проекта: все агенты ожидают запуска"""
+    return [{'agent_name': agent_name, 'status': 'pending'} for agent_name in PIPELINE_AGENTS]
+
+
+class PipelineJournal:
+    """
+    Append-only журнал статусов агентов одного проекта
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def start(self, pipeline_status: List[Dict]) -> None:
+        """Начинает журнал заново (новый true.json)"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(self._format_entry(None, pipeline_status))
+
+    def append(self, event: Dict, pipeline_status: List[Dict]) -> None:
+        """Дописывает событие и снимок статусов одной строкой"""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(self._format_entry(event, pipeline_status))
+
+    @staticmethod
+    def _format_entry(event: Optional[Dict], pipeline_status: List[Dict]) -> str:
+        entry = {'at': datetime.now().isoformat(), 'event': event, 'pipeline_status': pipeline_status}
+        return json.dumps(entry, ensure_ascii=False) + '\n'
+
+    def read_status(self) -> Optional[List[Dict]]:
+        """
+        Снимок статусов из последней целой строки журнала
+
+        Returns:
+            Список статусов агентов или None, если журнала нет или он пуст
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                chunk_size = _TAIL_CHUNK_SIZE
+
+                while True:
+                    start = max(0, end - chunk_size)
+                    f.seek(start)
+                    lines = f.read(end - start).split(b'\n')
+                    # Первая строка блока может быть обрезана - разбираем ее, только если блок с начала файла
+                    candidates = lines if start == 0 else lines[1:]
+
+                    for line in reversed(candidates):
+                        if not line.strip():
+                            continue
+                        try:
+                            return json.loads(line.decode('utf-8'))['pipeline_status']
+                        except (ValueError, KeyError, TypeError):
+                            continue  # оборванная запись
+
+                    if start == 0:
+                        return None
+                    chunk_size *= 2
+
+        except FileNotFoundError:
+            return None
+
@@ -0,0 +1,316 @@
+"""
+Ограничение частоты запросов к LLM для HerZog v3.0
+Задача: Не превышать лимиты провайдера, когда одновременно работают пайплайны нескольких пользователей
+
+Для каждой модели - два token bucket: запросы в минуту (RPM) и токены в минуту (TPM).
+Запрос заранее резервирует место по оценке токенов (estimate_request_tokens: промпт
+и ожидаемый ответ) и ждет, пока бакет восполнится; бакет уходит в минус, и следующие
+запросы встают в очередь за ним (обслуживаются в порядке резервирования). После
+ответа резерв уточняется фактическим расходом (record_usage), а резерв попытки без
+ответа (429, ошибка, исключение) возвращается (release).
+
+Ответ 429 приостанавливает модель для всех запросов на retry-after или, если
+заголовка нет, на экспоненциальную задержку с jitter (on_rate_limited).
+
+Настройки:
+    HERZOG_LLM_RPM, HERZOG_LLM_TPM - лимиты каждой модели по умолчанию (0 - без лимита)
+    HERZOG_LLM_LIMITS - лимиты отдельных моделей: "модель=rpm:tpm,модель=rpm:tpm"
+    HERZOG_LLM_EXPECTED_OUTPUT_TOKENS - ожидаемый размер ответа в резерве TPM (не больше
+                                        max_tokens запроса); фактический расход уточняется
+    HERZOG_LLM_RATE_STATE - файл общего состояния для нескольких процессов (блокировка fcntl);
+                            по умолчанию состояние хранится в памяти процесса
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows - только ограничение внутри процесса
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPM = float(os.getenv('HERZOG_LLM_RPM', '50'))
+DEFAULT_TPM = float(os.getenv('HERZOG_LLM_TPM', '200000'))
+DEFAULT_LIMITS = os.getenv('HERZOG_LLM_LIMITS', '')
+DEFAULT_STATE_PATH = os.getenv('HERZOG_LLM_RATE_STATE', '')
+EXPECTED_OUTPUT_TOKENS = int(os.getenv('HERZOG_LLM_EXPECTED_OUTPUT_TOKENS', '2000'))
+
+# Оценка токенов промпта: ~2.5 символа кириллицы на токен (как в gemini_classifier)
+CHARS_PER_TOKEN = 2.5
+
+# Экспоненциальная задержка: BACKOFF_BASE * 2^attempt, не больше BACKOFF_MAX секунд
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# Ожидание дольше порога попадает в лог
+WAIT_LOG_THRESHOLD = 1.0
+
+Limits = Tuple[float, float]
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Оценка числа токенов текста до отправки"""
+    if not text:
+        return 0
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def estimate_request_tokens(prompt: Optional[str], system_instruction: Optional[str] = None,
+                            max_tokens: Optional[int] = None) -> int:
+    """
+    Резерв токенов запроса: промпт, системная инструкция и ожидаемый ответ
+
+    Провайдер учитывает в TPM и выходные токены; резерв на весь max_tokens
+    занижал бы пропускную способность, поэтому берется EXPECTED_OUTPUT_TOKENS.
+    """
+    output_tokens = EXPECTED_OUTPUT_TOKENS if max_tokens is None else min(EXPECTED_OUTPUT_TOKENS, max_tokens)
+    return estimate_tokens(prompt) + estimate_tokens(system_instruction) + output_tokens
+
+
+def parse_limits(spec: str) -> Dict[str, Limits]:
+    """
+    Лимиты отдельных моделей из строки "модель=rpm:tpm,..."
+
+    Некорректные записи пропускаются с предупреждением.
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        try:
+            model, values = entry.rsplit('=', 1)
+            rpm, tpm = values.split(':')
+            limits[model.strip()] = (float(rpm), float(tpm))
+        except ValueError:
+            logger.warning(f"⚠️ Некорректный лимит модели '{entry}', ожидается модель=rpm:tpm")
+    return limits
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Заголовок retry-after в секундах (число секунд или HTTP-дата), None если его нет"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Пауза перед повтором: retry-after от провайдера или экспоненциальная задержка
+
+    Jitter разносит повторы одновременных запросов, чтобы они не пришли снова разом.
+    """
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX) + random.uniform(0, BACKOFF_BASE)
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class _MemoryState:
+    """Состояние бакетов в памяти процесса"""
+
+    def __init__(self):
+        self._states: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, Dict]]:
+        with self._lock:
+            yield self._states
+
+
+class _FileState:
+    """Состояние бакетов в JSON-файле, общем для процессов (эксклюзивная блокировка fcntl)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, Dict]]:
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, 'r+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    try:
+                        states = json.loads(f.read() or '{}')
+                    except json.JSONDecodeError:
+                        states = {}
+                    yield states
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(states, f)
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """
+    Ограничитель запросов к LLM по моделям (RPM и TPM)
+
+    Использование:
+        await rate_limiter.acquire(model, estimated_tokens)   # перед отправкой
+        rate_limiter.record_usage(model, estimated_tokens, actual_tokens)  # ответ 200
+        rate_limiter.release(model, estimated_tokens)  # 429, ошибка или исключение
+        rate_limiter.on_rate_limited(model, retry_after, attempt)  # при 429
+
+    Из event loop синхронные методы вызываются через offload.
+    """
+
+    def __init__(self, default_rpm: float = DEFAULT_RPM, default_tpm: float = DEFAULT_TPM,
+                 limits: Optional[Dict[str, Limits]] = None, state_path: Optional[str] = None):
+        self.default_limits = (default_rpm, default_tpm)
+        self.limits = parse_limits(DEFAULT_LIMITS) if limits is None else dict(limits)
+
+        state_path = DEFAULT_STATE_PATH if state_path is None else state_path
+        if state_path and fcntl is None:
+            logger.warning("⚠️ fcntl недоступен, лимиты LLM действуют только внутри процесса")
+            state_path = ''
+        self._state = _FileState(state_path) if state_path else _MemoryState()
+
+        # Метрики ожидания в очереди (по процессу)
+        self._metrics: Dict[str, Dict] = {}
+        self._metrics_lock = threading.Lock()
+
+    def get_limits(self, model: str) -> Limits:
+        return self.limits.get(model, self.default_limits)
+
+    async def acquire(self, model: str, tokens: int = 0) -> float:
+        """
+        Резервирует запрос и токены модели, ждет своей очереди
+
+        Returns:
+            Время ожидания в секундах
+        """
+        wait = await self.offload(self._reserve, model, tokens)
+        if wait >= WAIT_LOG_THRESHOLD:
+            logger.info(f"⏳ Лимит {model}: запрос ждет {wait:.1f} с (оценка {tokens} токенов)")
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                await self.offload(self.release, model, tokens)
+                raise
+        self._record_wait(model, wait)
+        return wait
+
+    async def offload(self, method, *args):
+        """
+        Вызов метода ограничителя из event loop
+
+        С общим файлом состояния блокировка fcntl и чтение/запись файла идут
+        в отдельном потоке; состояние в памяти обновляется сразу.
+        """
+        if isinstance(self._state, _FileState):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def release(self, model: str, tokens: int = 0) -> None:
+        """Возвращает резерв запроса, который не получил ответа (429, ошибка сервера, исключение)"""
+        rpm, tpm = self.get_limits(model)
+        with self._state.transaction() as states:
+            state = self._refilled_state(states, model, time.time())
+            if rpm:
+                state['requests'] = min(rpm, state['requests'] + 1)
+            if tpm:
+                state['tokens'] = min(tpm, state['tokens'] + min(tokens, tpm))
+
+    def record_usage(self, model: str, estimated_tokens: int, actual_tokens: int) -> None:
+        """Уточняет резерв фактическим расходом токенов из ответа"""
+        rpm, tpm = self.get_limits(model)
+        if not tpm or actual_tokens == estimated_tokens:
+            return
+        with self._state.transaction() as states:
+            state = self._refilled_state(states, model, time.time())
+            state['tokens'] -= actual_tokens - estimated_tokens
+
+    def on_rate_limited(self, model: str, retry_after: Optional[float] = None, attempt: int = 0) -> float:
+        """
+        Приостанавливает модель после ответа 429 для всех запросов
+
+        Returns:
+            Пауза в секундах (следующий acquire этой модели дождется ее окончания)
+        """
+        delay = backoff_delay(attempt, retry_after)
+        now = time.time()
+        with self._state.transaction() as states:
+            state = self._refilled_state(states, model, now)
+            state['blocked_until'] = max(state['blocked_until'], now + delay)
+        with self._metrics_lock:
+            self._model_metrics(model)['rate_limited'] += 1
+        return delay
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Метрики ожидания по моделям: запросы, ожидавшие запросы, суммарное/максимальное ожидание, 429"""
+        with self._metrics_lock:
+            return {model: dict(metrics, total_wait_seconds=round(metrics['total_wait_seconds'], 3),
+                                max_wait_seconds=round(metrics['max_wait_seconds'], 3))
+                    for model, metrics in self._metrics.items()}
+
+    def reset_metrics(self) -> None:
+        with self._metrics_lock:
+            self._metrics = {}
+
+    def _reserve(self, model: str, tokens: int) -> float:
+        rpm, tpm = self.get_limits(model)
+        now = time.time()
+        with self._state.transaction() as states:
+            state = self._refilled_state(states, model, now)
+            wait = max(0.0, state['blocked_until'] - now)
+            if rpm:
+                state['requests'] -= 1
+                wait = max(wait, -state['requests'] * 60 / rpm)
+            if tpm:
+                # Запрос больше минутного бюджета ждет полного бакета, а не бесконечно
+                state['tokens'] -= min(tokens, tpm)
+                wait = max(wait, -state['tokens'] * 60 / tpm)
+        return wait
+
+    def _refilled_state(self, states: Dict[str, Dict], model: str, now: float) -> Dict:
+        """Состояние бакетов модели, пополненное на прошедшее время"""
+        rpm, tpm = self.get_limits(model)
+        state = states.get(model)
+        if state is None:
+            state = states[model] = {'requests': rpm, 'tokens': tpm, 'updated': now, 'blocked_until': 0.0}
+            return state
+
+        elapsed = max(0.0, now - state['updated'])
+        state['requests'] = min(rpm, state['requests'] + elapsed * rpm / 60)
+        state['tokens'] = min(tpm, state['tokens'] + elapsed * tpm / 60)
+        state['updated'] = now
+        return state
+
+    def _model_metrics(self, model: str) -> Dict:
+        return self._metrics.setdefault(model, {
+            'requests': 0, 'waited_requests': 0, 'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0, 'rate_limited': 0
+        })
+
+    def _record_wait(self, model: str, wait: float) -> None:
+        with self._metrics_lock:
+            metrics = self._model_metrics(model)
+            metrics['requests'] += 1
+            if wait > 0:
+                metrics['waited_requests'] += 1
+                metrics['total_wait_seconds'] += wait
+                metrics['max_wait_seconds'] = max(metrics['max_wait_seconds'], wait)
+
+
+# Глобальный экземпляр для всех запросов к LLM
+rate_limiter = RateLimiter()
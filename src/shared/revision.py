@@ -0,0 +1,261 @@
+"""
+Режим ревизии сметы для HerZog v3.0
+Задача: При повторной отправке сметы (ревизия B) переиспользовать результаты
+предыдущего проекта и прогонять через LLM только добавленные или измененные позиции.
+
+Позиции сопоставляются по содержимому (шифр, наименование, ед. изм., количество),
+а не по ID: у ревизии обычно другое имя файла и сдвинутые номера позиций.
+Сопоставление идет по raw_estimates.json обоих проектов - до обогащения
+наименований classifier'ом.
+"""
+
+import copy
+import json
+import logging
+import os
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .truth_initializer import load_pipeline_status, update_pipeline_status
+from .truth_sections import load_truth
+from .truth_store import TruthStore
+
+logger = logging.getLogger(__name__)
+
+# Поля позиции, совпадение которых означает "позиция не изменилась"
+REVISION_MATCH_FIELDS = ('code', 'name', 'unit', 'quantity')
+
+# Поля классифицированной позиции, которые относятся к новой ревизии, а не к результату classifier
+ITEM_IDENTITY_FIELDS = ('id', 'source_file', 'source_sheet', 'position_num')
+
+
+def _match_key(item: Dict) -> Tuple:
+    return tuple(str(item.get(field, '') or '').strip() for field in REVISION_MATCH_FIELDS)
+
+
+def match_revision_items(previous_items: List[Dict], new_items: List[Dict]) -> Dict[str, str]:
+    """
+    Сопоставляет позиции новой ревизии с позициями предыдущей
+
+    Совпадающие по содержимому позиции сопоставляются по порядку следования,
+    поэтому дубликаты строк не склеиваются.
+
+    Args:
+        previous_items: Записи raw_estimates.json предыдущего проекта
+        new_items: Записи raw_estimates.json новой ревизии
+
+    Returns:
+        Словарь {id в новой ревизии: id в предыдущей} для неизмененных позиций
+    """
+    previous_by_key = defaultdict(deque)
+    for item in previous_items:
+        previous_by_key[_match_key(item)].append(item['id'])
+
+    mapping = {}
+    for item in new_items:
+        candidates = previous_by_key.get(_match_key(item))
+        if candidates:
+            mapping[item['id']] = candidates.popleft()
+
+    return mapping
+
+
+def load_revision_mapping(project_path: str, previous_project_path: str,
+                          new_items: Optional[List[Dict]] = None) -> Dict[str, str]:
+    """
+    Сопоставление позиций по raw_estimates.json двух проектов
+
+    Args:
+        new_items: Записи новой ревизии, уже загруженные в память (иначе читаются из project_path)
+
+    Returns:
+        Словарь {id в новой ревизии: id в предыдущей}
+    """
+    if new_items is None:
+        with open(os.path.join(project_path, '1_extracted', 'raw_estimates.json'), 'r', encoding='utf-8') as f:
+            new_items = json.load(f)
+    with open(os.path.join(previous_project_path, '1_extracted', 'raw_estimates.json'), 'r', encoding='utf-8') as f:
+        previous_items = json.load(f)
+
+    mapping = match_revision_items(previous_items, new_items)
+    logger.info(f"🔁 Ревизия: без изменений {len(mapping)} из {len(new_items)} позиций "
+                f"(в предыдущей версии {len(previous_items)})")
+    return mapping
+
+
+def carry_over_classifications(new_items: List[Dict], previous_classified: List[Dict],
+                               mapping: Dict[str, str]) -> Tuple[List[Optional[Dict]], List[Dict]]:
+    """
+    Переносит результат classifier на неизмененные позиции
+
+    Args:
+        new_items: Записи raw_estimates.json новой ревизии
+        previous_classified: classified_estimates.json предыдущего проекта
+        mapping: Результат match_revision_items
+
+    Returns:
+        (classified, pending): classified - список той же длины, что new_items,
+        с перенесенными позициями или None; pending - позиции для классификации
+    """
+    previous_by_id = {item.get('id'): item for item in previous_classified}
+    classified: List[Optional[Dict]] = []
+    pending = []
+
+    for item in new_items:
+        previous = previous_by_id.get(mapping.get(item['id']))
+        if previous is None:
+            classified.append(None)
+            pending.append(item)
+            continue
+
+        carried = {key: value for key, value in previous.items() if key not in ITEM_IDENTITY_FIELDS}
+        carried.update({key: item[key] for key in ITEM_IDENTITY_FIELDS if key in item})
+        classified.append(carried)
+
+    return classified, pending
+
+
+def _agent_completed(pipeline_status: List[Dict], agent_name: str) -> bool:
+    for agent in pipeline_status:
+        if agent.get('agent_name') == agent_name:
+            return agent.get('status') == 'completed'
+    return False
+
+
+def apply_revision(truth_path: str, previous_project_path: str, mapping: Dict[str, str],
+                   truth_store: Optional[TruthStore] = None) -> Dict[str, Any]:
+    """
+    Переносит результаты агентов предыдущего проекта в новый true.json
+
+    - структура пакетов work_packager берется целиком, агент отмечается завершенным;
+    - неизмененные работы сохраняют package_id - works_to_packages назначит только остальные;
+    - расчеты counter сохраняются для пакетов, все работы которых не изменились;
+    - календарный план сохраняется, если не изменились ни пакеты, ни сроки и директивы.
+
+    Args:
+        truth_path: Путь к true.json новой ревизии (только что созданному)
+        previous_project_path: Папка предыдущего проекта
+        mapping: {id в новой ревизии: id в предыдущей} (см. load_revision_mapping)
+        truth_store: Общее хранилище true.json запуска пайплайна
+
+    Returns:
+        Статистика ревизии (сохраняется также в truth_data['revision'])
+    """
+    previous_truth_path = os.path.join(previous_project_path, 'true.json')
+    previous_truth = load_truth(previous_truth_path)
+    store = truth_store or TruthStore(truth_path)
+    truth_data = store.data
+    previous_status = load_pipeline_status(previous_truth_path)
+
+    previous_results = previous_truth.get('results', {})
+    work_breakdown_structure = previous_results.get('work_breakdown_structure', [])
+
+    if not work_breakdown_structure or not _agent_completed(previous_status, 'work_packager'):
+        logger.warning("⚠️ Ревизия: в предыдущем проекте нет структуры пакетов - полный прогон")
+        return {'applied': False}
+
+    previous_works = previous_truth.get('source_work_items', [])
+    previous_package_by_work = {work.get('id'): work.get('package_id') for work in previous_works}
+    previous_to_new = {previous_id: new_id for new_id, previous_id in mapping.items()}
+
+    # Работы -> пакеты: неизмененные работы сохраняют назначение
+    carried_assignments = 0
+    for work in truth_data.get('source_work_items', []):
+        package_id = previous_package_by_work.get(mapping.get(work['id']))
+        if package_id:
+            work['package_id'] = package_id
+            carried_assignments += 1
+
+    # Пакет "чистый", если все его работы перенесены без изменений
+    package_ids = [item.get('id') for item in work_breakdown_structure if item.get('type') == 'package']
+    package_works: Dict[str, List[str]] = {package_id: [] for package_id in package_ids}
+    dirty_packages = set()
+    for work in previous_works:
+        package_id = work.get('package_id')
+        if package_id not in package_works:
+            continue
+        new_id = previous_to_new.get(work.get('id'))
+        if new_id is None:
+            dirty_packages.add(package_id)
+        else:
+            package_works[package_id].append(new_id)
+
+    volume_calculations = {}
+    if _agent_completed(previous_status, 'counter'):
+        for calculated_package in previous_results.get('volume_calculations', []):
+            package_id = calculated_package.get('id') or calculated_package.get('package_id')
+            if package_id in package_works and package_id not in dirty_packages:
+                volume_calculations[package_id] = {
+                    'work_ids': sorted(package_works[package_id]),
+                    'calculation': calculated_package
+                }
+
+    schedule_inputs_unchanged = (
+        truth_data.get('timeline_blocks') == previous_truth.get('timeline_blocks') and
+        truth_data.get('project_inputs') == previous_truth.get('project_inputs')
+    )
+    scheduled_packages = None
+    if (_agent_completed(previous_status, 'scheduler_and_staffer') and schedule_inputs_unchanged and
+            all(package_id in volume_calculations for package_id in package_ids)):
+        scheduled_packages = previous_results.get('scheduled_packages')
+
+    truth_data.setdefault('results', {})['work_breakdown_structure'] = copy.deepcopy(work_breakdown_structure)
+
+    total_works = len(truth_data.get('source_work_items', []))
+    stats = {
+        'applied': True,
+        'unchanged_works': carried_assignments,
+        'new_or_changed_works': total_works - carried_assignments,
+        'removed_works': sum(1 for work in previous_works if work.get('id') not in previous_to_new),
+        'reusable_calculations': len(volume_calculations),
+        'schedule_reusable': scheduled_packages is not None
+    }
+
+    truth_data['revision'] = {
+        'previous_project': previous_project_path,
+        'created_at': datetime.now().isoformat(),
+        'stats': stats,
+        'volume_calculations': volume_calculations,
+        'scheduled_packages': scheduled_packages,
+        'recalculated_packages': None
+    }
+
+    store.mark_dirty('source_work_items', 'results.work_breakdown_structure', 'revision')
+    store.flush()
+
+    update_pipeline_status(truth_path, 'work_packager', 'completed', reused_from=previous_project_path)
+
+    logger.info(f"🔁 Ревизия применена: {stats}")
+    return stats
+
+
+def reusable_calculation(truth_data: Dict, package_id: str, work_ids: List[str]) -> Optional[Dict]:
+    """
+    Расчет counter из предыдущей ревизии, если состав работ пакета не изменился
+
+    Args:
+        truth_data: Данные true.json
+        package_id: ID пакета
+        work_ids: ID работ пакета в текущей ревизии
+
+    Returns:
+        Рассчитанный пакет (формат volume_calculations) или None
+    """
+    entry = (truth_data.get('revision') or {}).get('volume_calculations', {}).get(package_id)
+    if entry and entry['work_ids'] == sorted(work_ids):
+        return entry['calculation']
+    return None
+
+
+def reusable_schedule(truth_data: Dict) -> Optional[List[Dict]]:
+    """
+    Календарный план предыдущей ревизии, если counter ничего не пересчитывал
+
+    Returns:
+        scheduled_packages предыдущего проекта или None
+    """
+    revision = truth_data.get('revision') or {}
+    if revision.get('scheduled_packages') and revision.get('recalculated_packages') == []:
+        return revision['scheduled_packages']
+    return None
@@ -1,24 +1,55 @@
 """
 Модуль для формирования временной сетки по неделям (БЛОКАМ) с учетом праздников РФ
 Создает структуру недель с понедельника по пятницу, исключая праздничные дни
+
+Рабочие дни считаются календарем numpy (busdaycalendar/busday_count) сразу для всех недель
+проекта; праздники РФ вычисляются один раз на год. Рабочая неделя задается маской
+(по умолчанию пятидневка "1111100", шестидневка - "1111110").
 """
 
 import json
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
 import logging
 import holidays
+import numpy as np
+
+# Пятидневная рабочая неделя: понедельник-пятница
+DEFAULT_WEEKMASK = "1111100"
 
 # Получаем официальные праздники РФ через библиотеку holidays
 def get_russian_holidays(year: int):
     """Получает официальные праздники РФ для указанного года"""
     return holidays.Russia(years=year)
 
+
+@lru_cache(maxsize=None)
+def _russian_holidays_array(year: int) -> np.ndarray:
+    """Праздники РФ за год как отсортированный массив datetime64[D] (кэшируется по году)"""
+    return np.array(sorted(get_russian_holidays(year)), dtype='datetime64[D]')
+
+
+def russian_holidays_between(start_year: int, end_year: int) -> np.ndarray:
+    """Праздники РФ за годы start_year..end_year включительно"""
+    return np.concatenate([_russian_holidays_array(year) for year in range(start_year, end_year + 1)])
+
+
+def _normalize_weekmask(weekmask: str) -> str:
+    # busdaycalendar нормализует "Mon Tue ..." и "1111100" к булевой маске
+    mask = np.busdaycalendar(weekmask=weekmask).weekmask
+    if not mask.any():
+        raise ValueError("В маске рабочей недели нет ни одного рабочего дня")
+    return ''.join('1' if day else '0' for day in mask)
+
+
 class TimelineBlockGenerator:
-    def __init__(self):
+    def __init__(self, weekmask: str = DEFAULT_WEEKMASK):
         self.logger = logging.getLogger(__name__)
-        self._holidays_cache = {}  # Кэш для праздников по годам
+        self.weekmask = _normalize_weekmask(weekmask)
+        # Последний рабочий день недели по маске: пятница для пятидневки, суббота для шестидневки
+        self._week_last_day = self.weekmask.rindex('1')
         
     def generate_weekly_blocks(
         self, 
@@ -27,7 +58,7 @@ class TimelineBlockGenerator:
         max_workers_per_week: int = 15
     ) -> Dict[str, Any]:
         """
-        Генерирует временные блоки (недели) с понедельника по пятницу
+        Генерирует временные блоки (недели) с понедельника по последний рабочий день недели
         
         Args:
             start_date: дата начала в формате YYYY-MM-DD
@@ -51,44 +82,8 @@ class TimelineBlockGenerator:
         
         if start_dt > end_dt:
             raise ValueError("Дата начала не может быть позже даты окончания")
-            
-        blocks = []
-        block_id = 1
-        current_date = start_dt
-        
-        while current_date <= end_dt:
-            # Найти начало недели (понедельник)
-            monday = current_date - timedelta(days=current_date.weekday())
-            # Если это первый блок, начать с фактической даты начала
-            block_start = max(monday, start_dt)
-            
-            # Найти конец недели (пятница)
-            friday = monday + timedelta(days=4)  # пятница = понедельник + 4 дня
-            # Если это последний блок, закончить фактической датой окончания
-            block_end = min(friday, end_dt)
-            
-            # Рассчитать рабочие дни с учетом праздников
-            working_days, excluded_holidays = self._calculate_working_days(
-                block_start, block_end
-            )
-            
-            # Создать блок только если есть рабочие дни
-            if working_days > 0:
-                block = {
-                    "block_id": block_id,
-                    "start_date": block_start.strftime("%Y-%m-%d"),
-                    "end_date": block_end.strftime("%Y-%m-%d"),
-                    "working_days": working_days,
-                    "excluded_holidays": excluded_holidays,
-                    "calendar_days": (block_end - block_start).days + 1,
-                    "is_partial_start": block_start > monday,
-                    "is_partial_end": block_end < friday
-                }
-                blocks.append(block)
-                block_id += 1
-            
-            # Переход к следующей неделе
-            current_date = friday + timedelta(days=3)  # следующий понедельник
+        
+        blocks = self._build_blocks(start_dt, end_dt)
             
         result = {
             "project_metadata": {
@@ -104,37 +99,79 @@ class TimelineBlockGenerator:
         self.logger.info(f"Сгенерировано {len(blocks)} блоков с {start_date} по {end_date}")
         return result
     
-    def _calculate_working_days(self, start_date, end_date) -> tuple[int, List[str]]:
+    def _build_blocks(self, start_dt, end_dt) -> List[Dict[str, Any]]:
+        """
+        Все блоки периода одним векторным проходом по неделям
+        
+        Блок - часть недели от понедельника до последнего рабочего дня маски, обрезанная
+        датами проекта. Недели без рабочих дней пропускаются.
+        """
+        start = np.datetime64(start_dt, 'D')
+        end = np.datetime64(end_dt, 'D')
+        
+        # Понедельники всех недель периода (weekday: понедельник=0)
+        first_monday = start - np.timedelta64(start_dt.weekday(), 'D')
+        mondays = np.arange(first_monday, end + np.timedelta64(1, 'D'), np.timedelta64(7, 'D'))
+        week_ends = mondays + np.timedelta64(self._week_last_day, 'D')
+        
+        block_starts = np.maximum(mondays, start)
+        block_ends = np.minimum(week_ends, end)
+        # Начало проекта после последнего рабочего дня первой недели - пустая неделя
+        has_days = block_starts <= block_ends
+        mondays, week_ends = mondays[has_days], week_ends[has_days]
+        block_starts, block_ends = block_starts[has_days], block_ends[has_days]
+        
+        holidays_all = russian_holidays_between(start_dt.year, end_dt.year)
+        calendar = np.busdaycalendar(weekmask=self.weekmask, holidays=holidays_all)
+        working_days = np.busday_count(block_starts, block_ends + np.timedelta64(1, 'D'), busdaycal=calendar)
+        
+        # Праздники, выпавшие на рабочие дни маски, в пределах проекта - по блокам
+        holidays_in_range = holidays_all[(holidays_all >= start) & (holidays_all <= end)]
+        excluded = holidays_in_range[np.is_busday(holidays_in_range, weekmask=self.weekmask)]
+        excluded_from = np.searchsorted(excluded, block_starts, side='left')
+        excluded_to = np.searchsorted(excluded, block_ends, side='right')
+        excluded_str = np.datetime_as_string(excluded, unit='D').tolist()
+        
+        calendar_days = (block_ends - block_starts).astype(int) + 1
+        starts_str = np.datetime_as_string(block_starts, unit='D').tolist()
+        ends_str = np.datetime_as_string(block_ends, unit='D').tolist()
+        is_partial_start = (block_starts > mondays).tolist()
+        is_partial_end = (block_ends < week_ends).tolist()
+        
+        blocks = []
+        for i in np.flatnonzero(working_days > 0).tolist():
+            blocks.append({
+                "block_id": len(blocks) + 1,
+                "start_date": starts_str[i],
+                "end_date": ends_str[i],
+                "working_days": int(working_days[i]),
+                "excluded_holidays": excluded_str[excluded_from[i]:excluded_to[i]],
+                "calendar_days": int(calendar_days[i]),
+                "is_partial_start": is_partial_start[i],
+                "is_partial_end": is_partial_end[i]
+            })
+        
+        return blocks
+    
+    def _calculate_working_days(self, start_date, end_date) -> Tuple[int, List[str]]:
         """
         Рассчитывает количество рабочих дней исключая выходные и праздники
         
         Returns:
             tuple: (количество_рабочих_дней, список_исключенных_праздников)
         """
-        working_days = 0
-        excluded_holidays = []
-        current = start_date
-        
-        while current <= end_date:
-            # Проверяем, не выходной ли день (суббота=5, воскресенье=6)
-            if current.weekday() < 5:  # понедельник=0, пятница=4
-                # Проверяем, не праздник ли
-                date_str = current.strftime("%Y-%m-%d")
-                year = current.year
-                
-                # Получаем праздники для года с кэшированием
-                if year not in self._holidays_cache:
-                    self._holidays_cache[year] = get_russian_holidays(year)
-                
-                russian_holidays = self._holidays_cache[year]
-                if current in russian_holidays:
-                    excluded_holidays.append(date_str)
-                else:
-                    working_days += 1
-            
-            current += timedelta(days=1)
-            
-        return working_days, excluded_holidays
+        start = np.datetime64(start_date, 'D')
+        end = np.datetime64(end_date, 'D')
+        if start > end:
+            return 0, []
+        
+        holidays_all = russian_holidays_between(start_date.year, end_date.year)
+        working_days = np.busday_count(start, end + np.timedelta64(1, 'D'),
+                                       weekmask=self.weekmask, holidays=holidays_all)
+        
+        holidays_in_range = holidays_all[(holidays_all >= start) & (holidays_all <= end)]
+        excluded = holidays_in_range[np.is_busday(holidays_in_range, weekmask=self.weekmask)]
+        return int(working_days), np.datetime_as_string(excluded, unit='D').tolist()
     
     def save_timeline_config(self, user_id: int, config: Dict[str, Any]) -> str:
         """
@@ -207,9 +244,10 @@ class TimelineBlockGenerator:
         return summary
 
 # Функции для backward compatibility
-def generate_weekly_blocks(start_date: str, end_date: str, max_workers_per_week: int = 15) -> Dict[str, Any]:
+def generate_weekly_blocks(start_date: str, end_date: str, max_workers_per_week: int = 15,
+                           weekmask: str = DEFAULT_WEEKMASK) -> Dict[str, Any]:
     """Wrapper функция для совместимости"""
-    generator = TimelineBlockGenerator()
+    generator = TimelineBlockGenerator(weekmask)
     return generator.generate_weekly_blocks(start_date, end_date, max_workers_per_week)
 
 def save_timeline_config(user_id: int, config: Dict[str, Any]) -> str:
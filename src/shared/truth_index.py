@@ -0,0 +1,102 @@
+"""
+Индексы по данным true.json для HerZog v3.0
+Задача: Убрать линейные поиски в циклах агентов и генератора отчета
+
+TruthIndex строит словари один раз на версию данных:
+    works_by_package    - package_id -> работы пакета (в порядке source_work_items)
+    work_by_id          - id работы -> работа
+    category_by_id      - id категории -> категория work_breakdown_structure
+    package_by_id       - id пакета -> пакет (work_breakdown_structure или work_packages)
+    volume_by_package   - package_id -> расчет counter (volume_calculations)
+    schedule_by_package - package_id -> календарь пакета (scheduled_packages)
+Каждый индекс строится при первом обращении, поэтому потребитель не платит
+за разделы, которые ему не нужны (в том числе не читает их с диска).
+TruthStore хранит индекс и сбрасывает его при изменении данных.
+"""
+
+from functools import cached_property
+from typing import Dict, Iterable, List, Mapping, Optional
+
+DEFAULT_CATEGORY_NAME = 'Без категории'
+
+
+def group_works_by_package(works: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """Работы по пакетам; работы без package_id пропускаются"""
+    works_by_package: Dict[str, List[Dict]] = {}
+    for work in works:
+        package_id = work.get('package_id')
+        if package_id:
+            works_by_package.setdefault(package_id, []).append(work)
+    return works_by_package
+
+
+def index_packages(packages: Iterable[Dict]) -> Dict[str, Dict]:
+    """
+    Пакеты по ID: поддерживаются оба формата (id и package_id),
+    при повторе ID остается первый пакет - как при поиске перебором
+    """
+    packages_by_id: Dict[str, Dict] = {}
+    for package in packages:
+        for key in ('package_id', 'id'):
+            package_id = package.get(key)
+            if package_id:
+                packages_by_id.setdefault(package_id, package)
+    return packages_by_id
+
+
+class TruthIndex:
+    """
+    Словари для поиска по данным проекта, строятся при первом обращении
+    """
+
+    def __init__(self, truth_data: Mapping):
+        self.truth_data = truth_data
+
+    @property
+    def _results(self) -> Mapping:
+        return self.truth_data.get('results', {})
+
+    @property
+    def _work_breakdown_structure(self) -> List[Dict]:
+        return self._results.get('work_breakdown_structure', [])
+
+    @cached_property
+    def works_by_package(self) -> Dict[str, List[Dict]]:
+        return group_works_by_package(self.truth_data.get('source_work_items', []))
+
+    @cached_property
+    def work_by_id(self) -> Dict[str, Dict]:
+        return {work.get('id'): work for work in self.truth_data.get('source_work_items', [])}
+
+    @cached_property
+    def category_by_id(self) -> Dict[str, Dict]:
+        categories: Dict[str, Dict] = {}
+        for item in self._work_breakdown_structure:
+            if item.get('type') == 'category':
+                categories.setdefault(item.get('id'), item)
+        return categories
+
+    @cached_property
+    def package_by_id(self) -> Dict[str, Dict]:
+        packages = [item for item in self._work_breakdown_structure if item.get('type') == 'package']
+        # Для совместимости со старой плоской схемой
+        return index_packages(packages or self._results.get('work_packages', []))
+
+    @cached_property
+    def volume_by_package(self) -> Dict[str, Dict]:
+        return {volume.get('package_id'): volume for volume in self._results.get('volume_calculations', [])}
+
+    @cached_property
+    def schedule_by_package(self) -> Dict[str, Dict]:
+        return {package.get('package_id'): package for package in self._results.get('scheduled_packages', [])}
+
+    def package_works(self, package_id: str) -> List[Dict]:
+        """Работы пакета"""
+        return self.works_by_package.get(package_id, [])
+
+    def category_name(self, category_id: Optional[str], default: str = DEFAULT_CATEGORY_NAME) -> str:
+        """Название категории по её ID"""
+        category = self.category_by_id.get(category_id)
+        if category is None:
+            return default
+        return category.get('name', default)
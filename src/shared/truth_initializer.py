@@ -4,29 +4,35 @@
 """
 
 import json
-import uuid
 import os
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 
-def create_true_json(project_path: str) -> bool:
+from .work_ids import work_id_for_item, assign_unique_ids
+from .models import parse_quantity
+from .truth_sections import load_truth, save_truth
+from .pipeline_journal import PipelineJournal, initial_pipeline_status, journal_path_for
+
+def create_true_json(project_path: str, project_data: Optional[Dict] = None) -> bool:
     """
     Создает файл true.json из существующих данных проекта
     
     Args:
         project_path: Путь к папке проекта
+        project_data: Результат шага 3 в памяти (иначе читается 3_prepared/project_data.json)
         
     Returns:
         True если файл создан успешно
     """
     try:
-        # Читаем подготовленные данные проекта (они уже содержат директивы)
-        project_data_path = os.path.join(project_path, "3_prepared", "project_data.json")
-        if not os.path.exists(project_data_path):
-            raise FileNotFoundError(f"Не найден файл project_data: {project_data_path}")
-        
-        with open(project_data_path, 'r', encoding='utf-8') as f:
-            project_data = json.load(f)
+        if project_data is None:
+            # Читаем подготовленные данные проекта (они уже содержат директивы)
+            project_data_path = os.path.join(project_path, "3_prepared", "project_data.json")
+            if not os.path.exists(project_data_path):
+                raise FileNotFoundError(f"Не найден файл project_data: {project_data_path}")
+            
+            with open(project_data_path, 'r', encoding='utf-8') as f:
+                project_data = json.load(f)
         
         # Директивы уже включены в project_data
         directives_data = project_data.get("directives", {})
@@ -40,13 +46,8 @@ def create_true_json(project_path: str) -> bool:
                 "project_id": project_id,
                 "project_name": directives_data.get("project_name", "Безымянный проект"),
                 "source_file_name": directives_data.get("source_file_name", "estimate.xlsx"),
-                "created_at": datetime.now().isoformat(),
-                "pipeline_status": [
-                    {"agent_name": "work_packager", "status": "pending"},
-                    {"agent_name": "works_to_packages", "status": "pending"},
-                    {"agent_name": "counter", "status": "pending"},
-                    {"agent_name": "scheduler_and_staffer", "status": "pending"}
-                ]
+                "created_at": datetime.now().isoformat()
+                # Статусы агентов - в журнале pipeline_status.jsonl (см. pipeline_journal.py)
             },
             
             "project_inputs": {
@@ -78,10 +79,11 @@ def create_true_json(project_path: str) -> bool:
             }
         }
         
-        # Сохраняем true.json в корень проекта
+        # Сохраняем true.json в корень проекта (манифест + разделы в truth/)
         truth_path = os.path.join(project_path, "true.json")
-        with open(truth_path, 'w', encoding='utf-8') as f:
-            json.dump(truth_data, f, ensure_ascii=False, indent=2)
+        save_truth(truth_path, truth_data)
+        
+        PipelineJournal(journal_path_for(truth_path)).start(initial_pipeline_status())
         
         print(f"✅ Создан true.json: {truth_path}")
         return True
@@ -103,49 +105,74 @@ def convert_work_items(old_work_items: List[Dict]) -> List[Dict]:
     converted_items = []
     
     for item in old_work_items:
-        # Создаем UUID если его нет
-        item_id = item.get("id", str(uuid.uuid4()))
+        # Стабильный ID из содержимого позиции, если extractor его не дал
+        item_id = item.get("id") or work_id_for_item(item)
         
         converted_item = {
             "id": item_id,
             "source_file": item.get("source_file", "estimate.xlsx"),
+            "source_sheet": item.get("source_sheet", ""),
             "code": item.get("code", ""),
             "name": item.get("name", ""),
             "unit": item.get("unit", ""),
-            "quantity": item.get("quantity", 0.0)
+            # Количество разбирается в число здесь - дальше агенты получают его готовым;
+            # запись из сметы остается в quantity_raw
+            "quantity": parse_quantity(item.get("quantity", 0.0)),
+            "quantity_raw": "" if item.get("quantity") is None else str(item["quantity"])
         }
         
         converted_items.append(converted_item)
     
-    return converted_items
+    return assign_unique_ids(converted_items)
+
+def load_pipeline_status(truth_path: str) -> List[Dict]:
+    """
+    Статусы агентов проекта
+    
+    Читается последняя строка журнала; для проектов без журнала (созданных до него)
+    статусы берутся из metadata.pipeline_status в true.json.
+    
+    Args:
+        truth_path: Путь к файлу true.json
+        
+    Returns:
+        Список статусов агентов
+    """
+    pipeline_status = PipelineJournal(journal_path_for(truth_path)).read_status()
+    if pipeline_status is not None:
+        return pipeline_status
+    
+    metadata = load_truth(truth_path).get("metadata", {})
+    return metadata.get("pipeline_status") or initial_pipeline_status()
 
-def update_pipeline_status(truth_path: str, agent_name: str, new_status: str) -> bool:
+def update_pipeline_status(truth_path: str, agent_name: str, new_status: str, **details) -> bool:
     """
-    Обновляет статус агента в pipeline_status
+    Обновляет статус агента: дописывает строку в журнал, true.json не перезаписывается
     
     Args:
         truth_path: Путь к файлу true.json
         agent_name: Имя агента
         new_status: Новый статус (pending/in_progress/completed)
+        details: Дополнительные поля статуса (например, reused_from)
         
     Returns:
         True если обновление успешно
     """
     try:
-        # Читаем текущий true.json
-        with open(truth_path, 'r', encoding='utf-8') as f:
-            truth_data = json.load(f)
+        pipeline_status = load_pipeline_status(truth_path)
+        event = {"agent_name": agent_name, "status": new_status, **details}
         
         # Находим и обновляем статус агента
         updated = False
-        for i, agent in enumerate(truth_data["metadata"]["pipeline_status"]):
+        for agent in pipeline_status:
             if agent["agent_name"] == agent_name:
-                truth_data["metadata"]["pipeline_status"][i]["status"] = new_status
+                agent["status"] = new_status
+                agent.update(details)
                 
                 if new_status == "in_progress":
-                    truth_data["metadata"]["pipeline_status"][i]["started_at"] = datetime.now().isoformat()
+                    agent["started_at"] = datetime.now().isoformat()
                 elif new_status == "completed":
-                    truth_data["metadata"]["pipeline_status"][i]["completed_at"] = datetime.now().isoformat()
+                    agent["completed_at"] = datetime.now().isoformat()
                     
                     # Следующий агент остается pending - его активирует main_pipeline
                     # Не активируем автоматически
@@ -154,9 +181,7 @@ def update_pipeline_status(truth_path: str, agent_name: str, new_status: str) ->
                 break
         
         if updated:
-            # Сохраняем обновленный файл
-            with open(truth_path, 'w', encoding='utf-8') as f:
-                json.dump(truth_data, f, ensure_ascii=False, indent=2)
+            PipelineJournal(journal_path_for(truth_path)).append(event, pipeline_status)
             return True
         else:
             print(f"⚠️ Агент {agent_name} не найден в pipeline_status")
@@ -177,16 +202,15 @@ def get_current_agent(truth_path: str) -> str:
         Имя текущего агента или None если все завершены
     """
     try:
-        with open(truth_path, 'r', encoding='utf-8') as f:
-            truth_data = json.load(f)
+        pipeline_status = load_pipeline_status(truth_path)
         
         # Ищем агента in_progress
-        for agent in truth_data["metadata"]["pipeline_status"]:
+        for agent in pipeline_status:
             if agent["status"] == "in_progress":
                 return agent["agent_name"]
         
         # Если нет in_progress, ищем первого pending
-        for agent in truth_data["metadata"]["pipeline_status"]:
+        for agent in pipeline_status:
             if agent["status"] == "pending":
                 return agent["agent_name"]
         
@@ -0,0 +1,226 @@
+"""
+Секционное хранение true.json для HerZog v3.0
+Задача: Агенты читают только нужные им разделы данных проекта
+
+true.json - небольшой манифест: metadata, project_inputs, timeline_blocks и другие
+компактные разделы хранятся в нем, а крупные вынесены в файлы папки truth/:
+    truth/source_work_items.jsonl      - работы сметы, по одной в строке
+    truth/results/<раздел>.json        - каждый раздел results отдельно
+Манифест содержит пути к этим файлам; файл читается при первом обращении к разделу.
+
+load_truth возвращает словарь-подобный объект с ленивой загрузкой, save_truth
+перезаписывает только загруженные или измененные разделы, манифест - последним.
+Прежний формат (весь проект в одном true.json) читается как есть и при первом
+сохранении переводится в секционный.
+"""
+
+import json
+import os
+from collections.abc import Mapping, MutableMapping
+from typing import AbstractSet, Any, Dict, Iterator, Optional, Union
+
+FORMAT_KEY = 'storage_format'
+SECTIONS_KEY = 'sections'
+FORMAT_NAME = 'sectioned'
+FORMAT_VERSION = 1
+
+SECTIONS_DIR = 'truth'
+# Раздел, который хранится построчно в JSONL
+LIST_SECTIONS = ('source_work_items',)
+# Разделы-словари, каждый ключ которых хранится отдельным файлом
+DICT_SECTIONS = ('results',)
+
+# Ссылка на файл раздела (str) или вложенные ссылки раздела-словаря
+SectionRefs = Dict[str, Union[str, Dict[str, str]]]
+
+
+def _read_section_file(path: str) -> Any:
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def _write_atomic(path: str, write) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _write_section_file(path: str, value: Any) -> None:
+    if path.endswith('.jsonl'):
+        _write_atomic(path, lambda f: f.writelines(json.dumps(item, ensure_ascii=False) + '\n' for item in value))
+    else:
+        _write_atomic(path, lambda f: json.dump(value, f, ensure_ascii=False, indent=2))
+
+
+class LazySections(MutableMapping):
+    """
+    Словарь данных проекта, разделы которого читаются из файлов при первом обращении
+    """
+
+    def __init__(self, base_dir: str, data: Optional[Dict] = None, refs: Optional[SectionRefs] = None):
+        self.base_dir = base_dir
+        self._data = dict(data or {})
+        # Файлы разделов по манифесту: ключ -> путь к файлу или вложенные ссылки
+        self._files = {key: ref for key, ref in (refs or {}).items() if key not in self._data}
+        # Разделы, еще не прочитанные с диска
+        self._refs = dict(self._files)
+
+    def _load(self, key: str) -> Any:
+        ref = self._refs.pop(key)
+        if isinstance(ref, dict):
+            value = LazySections(self.base_dir, refs=ref)
+        else:
+            value = _read_section_file(os.path.join(self.base_dir, ref))
+        self._data[key] = value
+        return value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._data:
+            return self._data[key]
+        if key in self._refs:
+            return self._load(key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._refs.pop(key, None)
+        self._data[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if self._refs.pop(key, None) is None:
+            del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data or key in self._refs
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._data
+        yield from list(self._refs)
+
+    def __len__(self) -> int:
+        return len(self._data) + len(self._refs)
+
+    def is_loaded(self, key: str) -> bool:
+        """Раздел уже в памяти (прочитан или присвоен)"""
+        return key in self._data
+
+    def file_ref(self, key: str) -> Optional[Union[str, Dict[str, str]]]:
+        """Ссылка на файл раздела по манифесту (None - раздел хранился не в отдельном файле)"""
+        return self._files.get(key)
+
+    def remember_file(self, key: str, ref: Union[str, Dict[str, str]]) -> None:
+        """Запоминает файл, в который сохранен раздел"""
+        self._files[key] = ref
+
+    def to_dict(self) -> Dict:
+        """Полная копия данных обычными словарями (читает все разделы)"""
+        return {key: value.to_dict() if isinstance(value, LazySections) else value for key, value in self.items()}
+
+
+def _sections_dir(truth_path: str) -> str:
+    return os.path.dirname(os.path.abspath(truth_path))
+
+
+def load_truth(truth_path: str) -> LazySections:
+    """
+    Открывает данные проекта: секционный манифест или true.json прежнего формата
+
+    Args:
+        truth_path: Путь к true.json
+
+    Returns:
+        Словарь-подобный объект; крупные разделы читаются при обращении
+    """
+    with open(truth_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    storage_format = manifest.pop(FORMAT_KEY, None)
+    if storage_format is None:
+        # Прежний формат: все данные в true.json
+        return LazySections(_sections_dir(truth_path), manifest)
+
+    if storage_format.get('name') != FORMAT_NAME or storage_format.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемый формат true.json: {storage_format}")
+
+    refs = manifest.pop(SECTIONS_KEY, {})
+    return LazySections(_sections_dir(truth_path), manifest, refs)
+
+
+def _kept_ref(container: Mapping, key: str, section: str, sections: Optional[AbstractSet[str]]):
+    """Ссылка на файл раздела, если файл не нужно перезаписывать"""
+    if not isinstance(container, LazySections):
+        return None
+    ref = container.file_ref(key)
+    if ref is None:
+        return None
+    if not container.is_loaded(key):
+        return ref
+    if sections is not None and section not in sections:
+        return ref
+    return None
+
+
+def _save_list_section(base_dir: str, truth_data: Mapping, key: str,
+                       sections: Optional[AbstractSet[str]]) -> Optional[str]:
+    ref = _kept_ref(truth_data, key, key, sections)
+    if ref is None:
+        ref = f"{SECTIONS_DIR}/{key}.jsonl"
+        _write_section_file(os.path.join(base_dir, ref), truth_data[key])
+    return ref
+
+
+def _save_dict_section(base_dir: str, truth_data: Mapping, key: str,
+                       sections: Optional[AbstractSet[str]]) -> Optional[Dict[str, str]]:
+    # Раздел не изменен, если в sections нет ни его, ни его ключей
+    dirty = sections is None or any(section == key or section.startswith(f"{key}.") for section in sections)
+    ref = _kept_ref(truth_data, key, key, None if dirty else sections)
+    if ref is not None:
+        return ref
+
+    section = truth_data[key]
+    # Раздел целиком отмечен измененным - перезаписываются все его загруженные ключи
+    sub_sections = None if sections is None or key in sections else sections
+    refs = {}
+    for sub_key in section:
+        ref = _kept_ref(section, sub_key, f"{key}.{sub_key}", sub_sections)
+        if ref is None:
+            ref = f"{SECTIONS_DIR}/{key}/{sub_key}.json"
+            _write_section_file(os.path.join(base_dir, ref), section[sub_key])
+            if isinstance(section, LazySections):
+                section.remember_file(sub_key, ref)
+        refs[sub_key] = ref
+    return refs
+
+
+def save_truth(truth_path: str, truth_data: Mapping, sections: Optional[AbstractSet[str]] = None) -> None:
+    """
+    Сохраняет данные проекта в секционном формате
+
+    Разделы, которые не читались из файлов, не перезаписываются.
+    Файлы разделов пишутся раньше манифеста, каждый - атомарно (временный файл + rename).
+
+    Args:
+        sections: Измененные разделы ("source_work_items", "results" или "results.<ключ>");
+            файлы остальных разделов не перезаписываются. None - все загруженные разделы
+    """
+    base_dir = _sections_dir(truth_path)
+    manifest = {FORMAT_KEY: {'name': FORMAT_NAME, 'version': FORMAT_VERSION}}
+    refs = {}
+
+    for key in truth_data:
+        if key in LIST_SECTIONS:
+            refs[key] = _save_list_section(base_dir, truth_data, key, sections)
+        elif key in DICT_SECTIONS:
+            refs[key] = _save_dict_section(base_dir, truth_data, key, sections)
+        else:
+            manifest[key] = truth_data[key]
+            continue
+
+        if isinstance(truth_data, LazySections):
+            truth_data.remember_file(key, refs[key])
+
+    manifest[SECTIONS_KEY] = refs
+    _write_atomic(os.path.abspath(truth_path), lambda f: json.dump(manifest, f, ensure_ascii=False, indent=2))
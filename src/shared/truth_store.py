@@ -0,0 +1,81 @@
+"""
+Общее хранилище true.json на один запуск пайплайна для HerZog v3.0
+Задача: Разбирать true.json один раз и сохранять изменения одной записью на этап
+
+TruthStore создается пайплайном и передается агентам и генератору отчета.
+Данные проекта держатся в памяти (разделы читаются лениво, см. truth_sections.py),
+агенты отмечают измененные разделы, а flush на границе этапа записывает только их:
+файлы разделов и манифест - каждый атомарно (временный файл + rename).
+Агент, запущенный без хранилища, создает собственное на время своей работы.
+Индексы по данным (truth_index.py) строятся один раз и сбрасываются при изменениях.
+"""
+
+import logging
+from typing import Optional, Set
+
+from .truth_index import TruthIndex
+from .truth_sections import LazySections, load_truth, save_truth
+
+logger = logging.getLogger(__name__)
+
+
+class TruthStore:
+    """
+    Данные true.json в памяти с учетом измененных разделов
+    """
+
+    def __init__(self, truth_path: str):
+        self.truth_path = truth_path
+        self._data: Optional[LazySections] = None
+        self._dirty: Set[str] = set()
+        self._index: Optional[TruthIndex] = None
+
+    @property
+    def data(self) -> LazySections:
+        """Данные проекта (true.json читается при первом обращении)"""
+        if self._data is None:
+            self._data = load_truth(self.truth_path)
+        return self._data
+
+    @property
+    def index(self) -> TruthIndex:
+        """Индексы по текущим данным (строятся заново после mark_dirty)"""
+        if self._index is None:
+            self._index = TruthIndex(self.data)
+        return self._index
+
+    @property
+    def dirty(self) -> Set[str]:
+        return set(self._dirty)
+
+    def mark_dirty(self, *sections: str) -> None:
+        """
+        Отмечает измененные разделы
+
+        Args:
+            sections: Ключи верхнего уровня ("source_work_items", "metadata", "results")
+                или отдельные разделы результатов ("results.schedule")
+        """
+        self._dirty.update(sections)
+        self._index = None
+
+    def flush(self) -> bool:
+        """
+        Записывает измененные разделы (граница этапа)
+
+        Returns:
+            True если была запись
+        """
+        if not self._dirty:
+            return False
+
+        save_truth(self.truth_path, self.data, sections=self._dirty)
+        logger.info(f"💾 true.json сохранен, разделы: {', '.join(sorted(self._dirty))}")
+        self._dirty.clear()
+        return True
+
+    def reload(self) -> None:
+        """Сбрасывает данные в памяти (true.json изменен вне хранилища)"""
+        self._data = None
+        self._index = None
+        self._dirty.clear()
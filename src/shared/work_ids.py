@@ -0,0 +1,71 @@
+"""
+Стабильные идентификаторы позиций сметы для HerZog v3.0
+
+ID выводится из содержимого позиции (файл, лист, № п/п, шифр, наименование,
+ед. изм., количество), поэтому повторный запуск по той же смете дает те же ID
+и результаты LLM, пакеты и расчеты counter можно переиспользовать.
+Полностью совпадающие строки различаются суффиксом -2, -3, ... в порядке следования.
+"""
+
+import hashlib
+from typing import Any, Dict, List, Set
+
+# Длина ID в hex-символах (64 бита хэша)
+WORK_ID_LENGTH = 16
+
+# Поля позиции, из которых выводится ID (в этом порядке)
+WORK_ID_FIELDS = ('source_file', 'source_sheet', 'position_num', 'code', 'name', 'unit', 'quantity')
+
+
+def make_work_id(source_file: Any, source_sheet: Any, position_num: Any, code: Any,
+                 name: Any, unit: Any, quantity: Any) -> str:
+    """
+    Базовый ID позиции по ее содержимому (без суффикса коллизии)
+
+    Returns:
+        Hex-строка длиной WORK_ID_LENGTH
+    """
+    values = (source_file, source_sheet, position_num, code, name, unit, quantity)
+    key = '\x1f'.join('' if value is None else str(value) for value in values)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:WORK_ID_LENGTH]
+
+
+def work_id_for_item(item: Dict) -> str:
+    """Базовый ID для словаря позиции (отсутствующие поля считаются пустыми)"""
+    return make_work_id(*(item.get(field) for field in WORK_ID_FIELDS))
+
+
+def unique_work_id(base_id: str, issued: Set[str]) -> str:
+    """
+    Уникальный ID с учетом уже выданных (добавляет выданный ID в issued)
+
+    Первое вхождение сохраняет базовый ID, следующие получают -2, -3, ...
+    """
+    candidate = base_id
+    suffix = 1
+    while candidate in issued:
+        suffix += 1
+        candidate = f"{base_id}-{suffix}"
+
+    issued.add(candidate)
+    return candidate
+
+
+def assign_unique_ids(items: List[Dict]) -> List[Dict]:
+    """
+    Добавляет суффикс к повторяющимся ID (изменяет позиции на месте)
+
+    Повторный вызов на уже уникальном списке ничего не меняет.
+
+    Args:
+        items: Позиции с заполненным полем 'id'
+
+    Returns:
+        Тот же список
+    """
+    issued: Set[str] = set()
+
+    for item in items:
+        item['id'] = unique_work_id(item['id'], issued)
+
+    return items
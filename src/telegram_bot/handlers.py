@@ -3,6 +3,7 @@
 """
 
 import os
+import json
 import logging
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -28,6 +29,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 📋 **Доступные команды:**
 /new - Создать новый проект  
 /test - Создать тестовый проект с готовыми данными 🧪
+/revision - Новая версия сметы прошлого проекта 🔁
 /help - Помощь
 /cancel - Отменить текущий проект
     """
@@ -50,6 +52,76 @@ async def new_project_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         parse_mode='Markdown'
     )
 
+def _list_revision_sources(user_id: int) -> list:
+    """Завершенные проекты пользователя, которые могут быть основой ревизии (новые первыми)"""
+    user_folder = f"projects/{user_id}"
+    if not os.path.isdir(user_folder):
+        return []
+    
+    sources = []
+    for project_id in os.listdir(user_folder):
+        project_path = os.path.join(user_folder, project_id)
+        # Ревизии нужны классификация и true.json предыдущей версии
+        if (os.path.exists(os.path.join(project_path, '2_classified', 'classified_estimates.json'))
+                and os.path.exists(os.path.join(project_path, 'true.json'))):
+            sources.append((os.path.getmtime(project_path), project_id))
+    
+    return [project_id for _, project_id in sorted(sources, reverse=True)]
+
+async def revision_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /revision - новый проект как ревизия одного из прошлых проектов"""
+    user_id = update.effective_user.id
+    sources = _list_revision_sources(user_id)[:10]
+    
+    if not sources:
+        await update.message.reply_text(
+            "❌ Нет завершенных проектов для ревизии. Используйте /new для создания нового проекта."
+        )
+        return
+    
+    keyboard = []
+    for project_id in sources:
+        directives_path = f"projects/{user_id}/{project_id}/0_input/directives.json"
+        project_name = project_id
+        try:
+            with open(directives_path, 'r', encoding='utf-8') as f:
+                project_name = f"{json.load(f).get('project_name', project_id)} ({project_id})"
+        except (OSError, ValueError):
+            pass
+        keyboard.append([InlineKeyboardButton(project_name, callback_data=f"revision_{project_id}")])
+    
+    await update.message.reply_text(
+        "🔁 **Ревизия сметы**\n\n"
+        "Выберите предыдущую версию проекта.\n"
+        "Результаты для неизмененных позиций будут взяты из нее.",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode='Markdown'
+    )
+
+async def handle_revision_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка выбора предыдущего проекта для ревизии"""
+    query = update.callback_query
+    await query.answer()
+    
+    user_id = query.from_user.id
+    project_id = query.data[len('revision_'):]
+    
+    if project_id not in _list_revision_sources(user_id):
+        await query.edit_message_text("❌ Проект для ревизии не найден. Используйте /revision еще раз.")
+        return
+    
+    # Новый проект, как в /new, но с путем к предыдущей версии
+    context.user_data.clear()
+    context.user_data['user_id'] = user_id
+    context.user_data['current_step'] = 'files'
+    context.user_data['files'] = []
+    context.user_data['previous_project_path'] = f"projects/{user_id}/{project_id}"
+    
+    await query.edit_message_text(
+        f"🔁 Ревизия проекта `{project_id}`\n\n{STEP_MESSAGES['files']}",
+        parse_mode='Markdown'
+    )
+
 async def test_project_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /test - создание тестового проекта с выбором этапа пайплайна"""
     user_id = update.effective_user.id
@@ -196,13 +268,22 @@ def _copy_project_files_up_to_stage(source_project: str, target_project: str, st
                 shutil.copytree(source_folder, target_folder)
                 logger.info(f"Скопирована папка: {folder}")
         
-        # Копируем true.json если есть
-        source_truth = os.path.join(source_project, "true.json")
-        target_truth = os.path.join(target_project, "true.json")
+        # Копируем true.json если есть: манифест, разделы и журнал статусов агентов
+        from ..shared.truth_sections import SECTIONS_DIR
+        from ..shared.pipeline_journal import JOURNAL_FILE_NAME
+        
+        for name in ("true.json", JOURNAL_FILE_NAME):
+            source_file = os.path.join(source_project, name)
+            if os.path.exists(source_file):
+                shutil.copy2(source_file, os.path.join(target_project, name))
+                logger.info(f"Скопирован {name}")
         
-        if os.path.exists(source_truth):
-            shutil.copy2(source_truth, target_truth)
-            logger.info("Скопирован true.json")
+        source_sections = os.path.join(source_project, SECTIONS_DIR)
+        if os.path.exists(source_sections):
+            target_sections = os.path.join(target_project, SECTIONS_DIR)
+            if os.path.exists(target_sections):
+                shutil.rmtree(target_sections)
+            shutil.copytree(source_sections, target_sections)
         
         return True
         
@@ -224,6 +305,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 **Команды:**
 /new - Новый проект
 /test - Тестовый проект (готовые данные) 🧪
+/revision - Ревизия: новая версия сметы прошлого проекта 🔁
 /next - Следующий шаг (если применимо)
 /skip - Пропустить текущий шаг
 /cancel - Отменить проект
@@ -345,7 +427,8 @@ async def process_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Запуск главного пайплайна с колбеком
     try:
         from ..pipeline_launcher import launch_pipeline
-        result = await launch_pipeline(project_path, progress_callback)
+        result = await launch_pipeline(project_path, progress_callback,
+                                       previous_project_path=context.user_data.get('previous_project_path'))
         
         if result['success']:
             # Собираем информацию о созданных отчетах
@@ -660,13 +743,12 @@ async def _send_project_files(update: Update, output_path: str, excel_files: lis
 async def _get_project_summary(true_json_path: str) -> dict:
     """Извлекает краткую информацию о проекте из true.json"""
     try:
-        import json
+        from ..shared.truth_sections import load_truth
         
         if not os.path.exists(true_json_path):
             return None
             
-        with open(true_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_truth(true_json_path)
         
         # Извлекаем основную информацию
         results = data.get('results', {})
@@ -692,6 +774,7 @@ def setup_handlers(application):
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("new", new_project_command))  
     application.add_handler(CommandHandler("test", test_project_command))
+    application.add_handler(CommandHandler("revision", revision_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("cancel", cancel_command))
     application.add_handler(CommandHandler("next", next_command))
@@ -700,6 +783,7 @@ def setup_handlers(application):
     
     # Обработчики callback'ов
     application.add_handler(CallbackQueryHandler(handle_test_stage_selection, pattern="^test_stage_"))
+    application.add_handler(CallbackQueryHandler(handle_revision_selection, pattern="^revision_"))
     
     # Обработчики сообщений
     application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
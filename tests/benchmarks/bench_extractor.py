@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк extractor на синтетических книгах ЛСР
+Для каждого варианта extractor и каждого размера книги измеряет строки/сек
+и пиковую память. Каждый прогон идет в отдельном свежем процессе, чтобы пик RSS
+не наследовался от предыдущих прогонов.
+
+Новый вариант extractor добавляется в EXTRACTORS: имя -> функция(file_paths) -> записи.
+
+Запуск:
+    python tests/benchmarks/bench_extractor.py [--sizes 1000 10000 100000]
+        [--extractors dataframe streaming] [--output results.json] [--workdir путь]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from lsr_generator import generate_lsr_workbook
+from src.data_processing.extractor import extract_from_files, extract_from_files_parallel
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), 'herzog_bench_lsr')
+
+
+EXTRACTORS: Dict[str, Callable[[List[str]], List[Dict]]] = {
+    'dataframe': lambda paths: extract_from_files(paths),
+    'vectorized': lambda paths: extract_from_files(paths, vectorized=True),
+    'streaming': lambda paths: extract_from_files(paths, streaming=True),
+    'parallel': lambda paths: extract_from_files_parallel(paths, streaming=True)['records'],
+}
+
+
+def _max_rss_mb(who: int) -> float:
+    """Пиковый RSS в МБ по getrusage (ru_maxrss: КБ в Linux, байты в macOS)"""
+    max_rss = resource.getrusage(who).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(max_rss / divisor, 1)
+
+
+def _proc_status_mb(field: str) -> float:
+    """Поле VmRSS/VmHWM из /proc/self/status в МБ (только Linux)"""
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return round(int(line.split()[1]) / 1024, 1)
+    raise KeyError(field)
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Сбросить пик RSS текущего процесса (Linux: /proc/self/clear_refs)
+
+    ru_maxrss наследуется через fork+exec, поэтому без сброса пик свежего
+    процесса не меньше RSS родителя в момент запуска.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def ensure_workbook(rows: int, workdir: str = DEFAULT_WORKDIR, seed: int = 42) -> Dict:
+    """Книга ЛСР нужного размера (генерируется один раз и переиспользуется)"""
+    file_path = os.path.join(workdir, f'lsr_{rows}_{seed}.xlsx')
+    stats_path = f'{file_path}.json'
+
+    if os.path.exists(file_path) and os.path.exists(stats_path):
+        with open(stats_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    stats = generate_lsr_workbook(file_path, rows, seed)
+    stats['file_path'] = file_path
+    stats['file_size_mb'] = round(os.path.getsize(file_path) / (1024 * 1024), 2)
+    with open(stats_path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False)
+    return stats
+
+
+def _run_case(extractor_name: str, file_path: str) -> Dict:
+    """Один прогон в свежем процессе: время и прирост пиковой памяти"""
+    precise = _reset_peak_rss()
+    baseline_rss = _proc_status_mb('VmRSS') if precise else _max_rss_mb(resource.RUSAGE_SELF)
+
+    start = time.perf_counter()
+    records = EXTRACTORS[extractor_name]([file_path])
+    elapsed = time.perf_counter() - start
+
+    return {
+        'records': len(records),
+        'seconds': round(elapsed, 4),
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': _proc_status_mb('VmHWM') if precise else _max_rss_mb(resource.RUSAGE_SELF),
+        # Для вариантов с пулом процессов - пик самого "тяжелого" дочернего процесса
+        # (верхняя оценка: включает страницы, унаследованные при fork)
+        'peak_children_rss_mb': _max_rss_mb(resource.RUSAGE_CHILDREN)
+    }
+
+
+def run_benchmark(sizes: List[int] = None, extractors: List[str] = None,
+                  workdir: str = DEFAULT_WORKDIR, repeat: int = 1) -> Dict:
+    """
+    Прогоняет варианты extractor на книгах каждого размера
+
+    Returns:
+        Машиночитаемый отчет: environment + results (по строке на вариант и размер)
+    """
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    for rows in sizes or DEFAULT_SIZES:
+        workbook = ensure_workbook(rows, workdir)
+
+        for extractor_name in extractors or list(EXTRACTORS):
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    runs.append(pool.submit(_run_case, extractor_name, workbook['file_path']).result())
+
+            best = min(runs, key=lambda run: run['seconds'])
+            results.append({
+                'extractor': extractor_name,
+                'rows': rows,
+                'file_size_mb': workbook['file_size_mb'],
+                'records': best['records'],
+                'records_ok': best['records'] == workbook['expected_records'],
+                'seconds': best['seconds'],
+                'rows_per_sec': round(rows / best['seconds']) if best['seconds'] else None,
+                'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+                'rss_growth_mb': round(max(run['peak_rss_mb'] - run['baseline_rss_mb'] for run in runs), 1),
+                'peak_children_rss_mb': max(run['peak_children_rss_mb'] for run in runs)
+            })
+
+    return {
+        'benchmark': 'extractor',
+        'created_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк extractor на синтетических ЛСР')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--extractors', nargs='+', choices=list(EXTRACTORS), default=list(EXTRACTORS))
+    parser.add_argument('--repeat', type=int, default=1, help='Повторов на случай (берется лучшее время)')
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help='Папка для сгенерированных книг')
+    parser.add_argument('--output', help='Сохранить отчет в JSON файл')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    report = run_benchmark(args.sizes, args.extractors, args.workdir, args.repeat)
+
+    print(f"{'вариант':>11} {'строк':>8} {'записей':>8} {'время, с':>9} {'строк/с':>9} "
+          f"{'пик RSS':>8} {'прирост':>8} {'дети':>7}")
+    for result in report['results']:
+        print(f"{result['extractor']:>11} {result['rows']:>8} {result['records']:>8} {result['seconds']:>9} "
+              f"{result['rows_per_sec']:>9} {result['peak_rss_mb']:>8} {result['rss_growth_mb']:>8} "
+              f"{result['peak_children_rss_mb']:>7}" + ('' if result['records_ok'] else '  ❌ записи'))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nОтчет сохранен: {args.output}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк колоночного extractor: iterrows против масок NumPy/pandas
+Сравнивает время разбора уже прочитанного листа и проверяет, что записи совпадают байт в байт
+
+Запуск: python tests/benchmarks/bench_extractor_vectorized.py [10000 50000 100000]
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.data_processing.extractor import extract_records_from_dataframe, extract_records_vectorized
+
+DEFAULT_SIZES = [10_000, 50_000, 100_000]
+
+
+def build_estimate_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Лист ЛСР в памяти: шапка, строка нумерации колонок, работы, материалы и мусор"""
+    rng = np.random.default_rng(seed)
+    width = 15
+    
+    data = [
+        ['ЛОКАЛЬНЫЙ СМЕТНЫЙ РАСЧЕТ (СМЕТА) № 02-01-01'] + [None] * (width - 1),
+        ['№ п/п', 'Обоснование', 'Наименование работ и затрат', None, None, None, None,
+         'Единица измерения', 'Количество'] + [None] * (width - 9),
+        list(range(1, width + 1)),
+    ]
+    
+    kinds = rng.choice(['work', 'material', 'garbage', 'section'], size=rows, p=[0.45, 0.4, 0.1, 0.05])
+    quantities = np.round(rng.uniform(0.01, 1000, size=rows), 2)
+    
+    for i, kind in enumerate(kinds, start=1):
+        row = [None] * width
+        if kind == 'section':
+            row[0] = f'Раздел {i}. Стены'
+        elif kind == 'garbage':
+            row[0], row[1], row[2] = i, 1, 2
+        else:
+            row[0] = i if i % 10 else f'{i},1'
+            row[1] = f'ГЭСН46-02-{i % 999:03d}-02' if kind == 'work' else f'ФСБЦ-14.4.01.02-{i % 9999:04d}'
+            row[2] = 'Отбивка штукатурки с поверхностей' if kind == 'work' else 'Смесь сухая штукатурная'
+            row[7] = '100 м2' if kind == 'work' else 'кг'
+            row[8] = quantities[i - 1]
+        data.append(row)
+    
+    return pd.DataFrame(data)
+
+
+def _dump(records) -> str:
+    return json.dumps(records, ensure_ascii=False, indent=2)
+
+
+def run_benchmark(sizes=None) -> list:
+    """Прогоняет оба варианта на каждом размере и возвращает результаты"""
+    results = []
+    
+    for rows in sizes or DEFAULT_SIZES:
+        df = build_estimate_frame(rows)
+        
+        start = time.perf_counter()
+        baseline = extract_records_from_dataframe(df, 'bench.xlsx')
+        baseline_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        vectorized = extract_records_vectorized(df, 'bench.xlsx')
+        vectorized_time = time.perf_counter() - start
+        
+        identical = _dump(baseline) == _dump(vectorized)
+        
+        results.append({
+            'rows': rows,
+            'records': len(vectorized),
+            'iterrows_sec': round(baseline_time, 4),
+            'vectorized_sec': round(vectorized_time, 4),
+            'speedup': round(baseline_time / vectorized_time, 1) if vectorized_time else None,
+            'identical': identical
+        })
+    
+    return results
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    
+    print(f"{'строк':>8} {'записей':>8} {'iterrows, с':>12} {'маски, с':>10} {'ускорение':>10} {'совпадает':>10}")
+    for result in run_benchmark(sizes):
+        print(f"{result['rows']:>8} {result['records']:>8} {result['iterrows_sec']:>12} "
+              f"{result['vectorized_sec']:>10} {result['speedup']:>9}x {str(result['identical']):>10}")
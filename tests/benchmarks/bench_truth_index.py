@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк индексов по true.json (shared/truth_index.py)
+Сравнивает прежние линейные поиски в циклах с поиском по TruthIndex на
+синтетическом проекте (по умолчанию 500 пакетов x 20 000 работ):
+    counter_grouping  - группировка работ по пакетам (counter)
+    reporter_parse    - разбор иерархии с категориями (reporter_v3)
+    reporter_works    - работы пакетов для листа "Пакеты работ" (reporter_v3)
+
+Запуск:
+    python tests/benchmarks/bench_truth_index.py [--packages 500] [--works 20000]
+        [--categories 40] [--repeat 3] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'bench-key')
+
+from src.ai_agents.counter import WorkVolumeCalculator
+from src.data_processing.reporter_v3 import MultiPageScheduleGenerator
+from src.shared.truth_index import TruthIndex, group_works_by_package, index_packages
+
+
+def make_truth(packages: int, works: int, categories: int, seed: int = 42) -> Dict:
+    """Синтетический true.json после scheduler_and_staffer"""
+    rng = random.Random(seed)
+    work_breakdown_structure = []
+    for c in range(categories):
+        work_breakdown_structure.append({'id': f'cat_{c}', 'type': 'category', 'name': f'Категория {c}'})
+    for p in range(packages):
+        work_breakdown_structure.append({
+            'id': f'pkg_{p}', 'type': 'package', 'name': f'Пакет {p}', 'parent_id': f'cat_{p % categories}',
+            'volume_data': {'unit': 'м2', 'quantity': p}
+        })
+
+    source_work_items = [{
+        'id': f'w{i}', 'code': f'ГЭСН{i:06d}', 'name': f'Работа {i}', 'unit': 'м2',
+        'quantity': rng.randint(1, 100), 'package_id': f'pkg_{rng.randrange(packages)}'
+    } for i in range(works)]
+
+    volume_calculations = [{
+        'package_id': f'pkg_{p}',
+        'calculations': {'unit': 'м2', 'quantity': p, 'component_analysis': [
+            {'code': f'ГЭСН{p:06d}', 'work_name': f'Компонент {p}', 'unit': 'м2', 'quantity': p}
+        ]}
+    } for p in range(packages)]
+
+    scheduled_packages = [{
+        'package_id': f'pkg_{p}', 'schedule_blocks': [p % 10 + 1], 'progress_per_block': {},
+        'staffing_per_block': {}, 'scheduling_reasoning': {}
+    } for p in range(packages)]
+
+    return {
+        'source_work_items': source_work_items,
+        'results': {
+            'work_breakdown_structure': work_breakdown_structure,
+            'volume_calculations': volume_calculations,
+            'scheduled_packages': scheduled_packages
+        }
+    }
+
+
+# Прежние реализации: линейный поиск на каждый пакет/категорию
+
+def scan_group_works(work_packages: List[Dict], source_work_items: List[Dict]) -> List[List[Dict]]:
+    return [[work for work in source_work_items if work.get('package_id') == package.get('id')]
+            for package in work_packages]
+
+
+def scan_parse_hierarchy(work_breakdown_structure: List[Dict]) -> List[Dict]:
+    categories = []
+    for item in work_breakdown_structure:
+        if item.get('type') == 'category':
+            categories.append({'id': item.get('id'), 'child_packages': []})
+        elif item.get('type') == 'package':
+            category_name = 'Без категории'
+            for candidate in work_breakdown_structure:
+                if candidate.get('type') == 'category' and candidate.get('id') == item.get('parent_id'):
+                    category_name = candidate.get('name', 'Без категории')
+                    break
+            for category in categories:
+                if category['id'] == item.get('parent_id'):
+                    category['child_packages'].append({'package_id': item.get('id'), 'category_name': category_name})
+                    break
+    return categories
+
+
+def scan_package_works(work_packages: List[Dict]) -> int:
+    found = 0
+    for package in work_packages:
+        for pkg in work_packages:
+            if pkg.get('package_id') == package['package_id'] or pkg.get('id') == package['package_id']:
+                found += len(pkg.get('calculations', {}).get('component_analysis', []))
+                break
+    return found
+
+
+def _indexed_package_works(generator: MultiPageScheduleGenerator, work_packages: List[Dict]) -> int:
+    packages_by_id = index_packages(work_packages)
+    works_by_package = group_works_by_package([])
+    return sum(len(generator._get_package_works(package['package_id'], packages_by_id, works_by_package))
+               for package in work_packages)
+
+
+def _best_time(func: Callable[[], object], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmark(packages: int = 500, works: int = 20_000, categories: int = 40, repeat: int = 3) -> Dict:
+    truth_data = make_truth(packages, works, categories)
+    work_breakdown_structure = truth_data['results']['work_breakdown_structure']
+    source_work_items = truth_data['source_work_items']
+    work_packages = [item for item in work_breakdown_structure if item.get('type') == 'package']
+
+    calculator = WorkVolumeCalculator()
+    generator = MultiPageScheduleGenerator()
+    _, report_packages = generator._parse_hierarchical_structure(work_breakdown_structure, truth_data)
+
+    cases = {
+        'counter_grouping': (
+            lambda: scan_group_works(work_packages, source_work_items),
+            lambda: calculator._group_works_by_packages(work_packages, source_work_items)
+        ),
+        'reporter_parse': (
+            lambda: scan_parse_hierarchy(work_breakdown_structure),
+            lambda: generator._parse_hierarchical_structure(work_breakdown_structure, truth_data,
+                                                            TruthIndex(truth_data))
+        ),
+        'reporter_works': (
+            lambda: scan_package_works(report_packages),
+            lambda: _indexed_package_works(generator, report_packages)
+        ),
+    }
+
+    # Результаты индексов совпадают с перебором
+    grouped = calculator._group_works_by_packages(work_packages, source_work_items)
+    assert [len(package['works']) for package in grouped] == [len(works) for works in
+                                                              scan_group_works(work_packages, source_work_items)]
+    assert _indexed_package_works(generator, report_packages) == scan_package_works(report_packages)
+
+    results = []
+    for name, (scan, indexed) in cases.items():
+        scan_seconds = _best_time(scan, repeat)
+        index_seconds = _best_time(indexed, repeat)
+        results.append({
+            'case': name,
+            'scan_seconds': round(scan_seconds, 4),
+            'index_seconds': round(index_seconds, 4),
+            'speedup': round(scan_seconds / index_seconds, 1) if index_seconds else None
+        })
+
+    return {
+        'benchmark': 'truth_index',
+        'created_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'params': {'packages': packages, 'works': works, 'categories': categories, 'repeat': repeat},
+        'results': results
+    }
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк индексов по true.json')
+    parser.add_argument('--packages', type=int, default=500)
+    parser.add_argument('--works', type=int, default=20_000)
+    parser.add_argument('--categories', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3, help='Повторов на случай (берется лучшее время)')
+    parser.add_argument('--output', help='Сохранить отчет в JSON файл')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    report = run_benchmark(args.packages, args.works, args.categories, args.repeat)
+
+    print(f"{'случай':>17} {'перебор, с':>11} {'индекс, с':>10} {'ускорение':>10}")
+    for result in report['results']:
+        print(f"{result['case']:>17} {result['scan_seconds']:>11} {result['index_seconds']:>10} "
+              f"{result['speedup']:>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nОтчет сохранен: {args.output}")
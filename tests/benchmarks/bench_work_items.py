@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк компактной модели работ (shared/models.py)
+Сравнивает работы-словари и WorkItem на синтетическом проекте (по умолчанию 50 000 работ):
+память списка работ (tracemalloc) и назначение пакетов - копированием словарей,
+как раньше в works_to_packages, и записью package_id в WorkItem.
+
+Запуск:
+    python tests/benchmarks/bench_work_items.py [--works 50000] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.shared.models import work_items_from_dicts
+
+
+def make_work_items(works: int) -> List[Dict]:
+    """Работы в формате source_work_items true.json"""
+    return [{
+        'id': f'w{i:06d}', 'source_file': 'smeta.xlsx', 'source_sheet': 'Лист1',
+        'code': f'ГЭСН08-02-{i % 1000:03d}-01', 'name': f'Работа номер {i}', 'unit': 'м2',
+        'quantity': float(i % 500)
+    } for i in range(works)]
+
+
+def _measure(build):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, round(current / 1024 / 1024, 1), round(seconds, 4)
+
+
+def run_benchmark(works: int = 50_000) -> Dict:
+    text = json.dumps(make_work_items(works), ensure_ascii=False)
+
+    dicts, dicts_mb, dicts_load = _measure(lambda: json.loads(text))
+    items, items_mb, items_load = _measure(lambda: work_items_from_dicts(json.loads(text)))
+
+    assignment = {work['id']: f'pkg_{i % 500}' for i, work in enumerate(dicts)}
+
+    started = time.perf_counter()
+    copied = []
+    for work in dicts:
+        work_copy = work.copy()
+        work_copy['package_id'] = assignment[work['id']]
+        copied.append(work_copy)
+    copy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for work in items:
+        work.package_id = assignment[work.id]
+    inplace_seconds = time.perf_counter() - started
+
+    return {
+        'benchmark': 'work_items',
+        'created_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'params': {'works': works},
+        'results': {
+            'dicts_mb': dicts_mb,
+            'work_items_mb': items_mb,
+            'dicts_load_seconds': dicts_load,
+            'work_items_load_seconds': items_load,
+            'assign_copy_seconds': round(copy_seconds, 4),
+            'assign_inplace_seconds': round(inplace_seconds, 4)
+        }
+    }
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк компактной модели работ')
+    parser.add_argument('--works', type=int, default=50_000)
+    parser.add_argument('--output', help='Сохранить отчет в JSON файл')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    report = run_benchmark(args.works)
+
+    for name, value in report['results'].items():
+        print(f"{name:>26} {value:>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nОтчет сохранен: {args.output}")
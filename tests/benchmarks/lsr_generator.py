@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетических книг ЛСР для бенчмарков extractor
+Шапка сметы с объединенными ячейками, двухуровневый заголовок таблицы
+("№ п/п / Обоснование / Наименование"), разделы, работы ГЭСН, материалы ФСБЦ,
+строки ресурсов без номера, мусорные строки нумерации колонок и итоги.
+
+Запуск: python tests/benchmarks/lsr_generator.py <путь.xlsx> [строк] [seed]
+"""
+
+import os
+import sys
+from typing import Dict
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.merge import MergedCellRange
+
+WIDTH = 15
+
+WORK_NAMES = [
+    'Кладка наружных стен из кирпича', 'Отбивка штукатурки с поверхностей',
+    'Устройство стяжек цементных', 'Монтаж металлоконструкций каркаса',
+    'Окраска поверхностей водоэмульсионными составами', 'Устройство кровель из наплавляемых материалов',
+]
+MATERIAL_NAMES = [
+    'Смесь сухая штукатурная', 'Кирпич керамический одинарный', 'Раствор готовый кладочный',
+    'Краска водоэмульсионная', 'Профиль стальной гнутый', 'Материал рулонный кровельный',
+]
+RESOURCE_NAMES = ['ОТ', 'ЭМ', 'в т.ч. ОТм', 'М', 'ЗТ', 'Накладные расходы', 'Сметная прибыль']
+UNITS = ['100 м2', 'м3', 'т', '100 м', 'шт', 'кг']
+
+
+def _merge(sheet, start_row: int, start_column: int, end_row: int, end_column: int):
+    """
+    Объединить ячейки без проверки пересечений
+
+    Worksheet.merge_cells ищет пересечение со всеми уже объединенными диапазонами,
+    что на 100k строк дает квадратичное время. Генератор объединяет только пустые
+    ячейки без пересечений, поэтому диапазон добавляется напрямую.
+    """
+    coord = f"{get_column_letter(start_column)}{start_row}:{get_column_letter(end_column)}{end_row}"
+    sheet.merged_cells.ranges.add(MergedCellRange(sheet, coord))
+
+
+def _title_rows(sheet, row: int) -> int:
+    """Шапка ЛСР: утверждающая подпись, название, основание - объединенные по ширине ячейки"""
+    for text in ('СОГЛАСОВАНО', 'ЛОКАЛЬНЫЙ СМЕТНЫЙ РАСЧЕТ (СМЕТА) № 02-01-01',
+                 '(локальная смета)', 'на строительство объекта капитального строительства',
+                 'Основание: проектная документация шифр 123-АР'):
+        sheet.cell(row=row, column=1, value=text)
+        _merge(sheet, row, 1, row, WIDTH)
+        row += 1
+
+    # Сметная стоимость - числа в подписи шапки
+    sheet.cell(row=row, column=1, value='Сметная стоимость')
+    sheet.cell(row=row, column=5, value=12345.67)
+    sheet.cell(row=row, column=6, value='тыс. руб.')
+    return row + 2
+
+
+def _header_rows(sheet, row: int) -> int:
+    """Двухуровневый заголовок таблицы и строка нумерации колонок"""
+    top = ['№ п/п', 'Обоснование', 'Наименование работ и затрат', None, None, None, None,
+           'Единица измерения', 'Количество', None, None, 'Сметная стоимость, руб.', None, None, None]
+    sub = [None] * 8 + ['на единицу измерения', 'коэффициенты', 'всего с учетом коэффициентов',
+                        'на единицу измерения', 'коэффициенты', 'всего', None]
+
+    for col, value in enumerate(top, start=1):
+        sheet.cell(row=row, column=col, value=value)
+    for col, value in enumerate(sub, start=1):
+        if value is not None:
+            sheet.cell(row=row + 1, column=col, value=value)
+
+    # Объединенные ячейки заголовка: первые колонки на две строки, группы - по горизонтали
+    for col in (1, 2, 8):
+        _merge(sheet, row, col, row + 1, col)
+    _merge(sheet, row, 3, row + 1, 7)
+    _merge(sheet, row, 9, row, 11)
+    _merge(sheet, row, 12, row, 14)
+
+    # Строка нумерации колонок "1 2 3 ..." - мусор для extractor
+    for col in range(1, WIDTH + 1):
+        sheet.cell(row=row + 2, column=col, value=col)
+
+    return row + 3
+
+
+def generate_lsr_workbook(file_path: str, rows: int, seed: int = 42) -> Dict[str, int]:
+    """
+    Создает книгу ЛСР с заданным числом строк тела таблицы
+
+    Args:
+        file_path: Путь к создаваемому XLSX файлу
+        rows: Количество строк тела таблицы (без шапки)
+        seed: Зерно генератора случайных чисел
+
+    Returns:
+        Статистика книги: rows, works, materials, resources, garbage, expected_records
+    """
+    rng = np.random.default_rng(seed)
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'ЛСР 02-01-01'
+
+    row = _header_rows(sheet, _title_rows(sheet, 1))
+
+    kinds = rng.choice(['work', 'material', 'resource', 'garbage', 'section', 'total'],
+                       size=rows, p=[0.3, 0.25, 0.3, 0.05, 0.05, 0.05])
+    quantities = np.round(rng.uniform(0.01, 1000, size=rows), 3)
+    names = rng.integers(0, len(WORK_NAMES), size=rows)
+    units = rng.integers(0, len(UNITS), size=rows)
+
+    stats = {'rows': rows, 'works': 0, 'materials': 0, 'resources': 0, 'garbage': 0}
+    position = 0
+    section = 0
+
+    for i, kind in enumerate(kinds):
+        if kind == 'section':
+            section += 1
+            sheet.cell(row=row, column=1, value=f'Раздел {section}. Общестроительные работы')
+            _merge(sheet, row, 1, row, WIDTH)
+
+        elif kind == 'total':
+            sheet.cell(row=row, column=3, value=f'Итого по разделу {max(section, 1)}')
+            _merge(sheet, row, 3, row, 7)
+            sheet.cell(row=row, column=14, value=float(quantities[i] * 1000))
+
+        elif kind == 'resource':
+            # Строки ресурсов под расценкой - без номера позиции
+            sheet.cell(row=row, column=3, value=RESOURCE_NAMES[i % len(RESOURCE_NAMES)])
+            sheet.cell(row=row, column=14, value=float(quantities[i]))
+            stats['resources'] += 1
+
+        elif kind == 'garbage':
+            # Повтор строки нумерации колонок на новой странице
+            for col in range(1, WIDTH + 1):
+                sheet.cell(row=row, column=col, value=col)
+            stats['garbage'] += 1
+
+        else:
+            position += 1
+            # Часть номеров - с подпунктом через запятую, как в реальных ЛСР
+            sheet.cell(row=row, column=1, value=position if position % 10 else f'{position},1')
+            if kind == 'work':
+                sheet.cell(row=row, column=2, value=f'ГЭСН{names[i] + 6:02d}-02-{position % 999:03d}-0{names[i] % 9 + 1}')
+                sheet.cell(row=row, column=3, value=WORK_NAMES[names[i]])
+                stats['works'] += 1
+            else:
+                sheet.cell(row=row, column=2, value=f'ФСБЦ-{names[i] + 1:02d}.4.01.02-{position % 9999:04d}')
+                sheet.cell(row=row, column=3, value=MATERIAL_NAMES[names[i]])
+                stats['materials'] += 1
+            # Наименование занимает объединенные колонки 3-7
+            _merge(sheet, row, 3, row, 7)
+            sheet.cell(row=row, column=8, value=UNITS[units[i]])
+            sheet.cell(row=row, column=9, value=float(quantities[i]))
+            sheet.cell(row=row, column=12, value=float(quantities[i] * 17.5))
+
+        row += 1
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    workbook.save(file_path)
+
+    stats['expected_records'] = stats['works'] + stats['materials']
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Использование: python tests/benchmarks/lsr_generator.py <путь.xlsx> [строк] [seed]")
+        sys.exit(1)
+
+    target = sys.argv[1]
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+
+    print(generate_lsr_workbook(target, rows, seed))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Тест чекпоинтов агентов (shared/agent_checkpoints.py)
+Повторный запуск works_to_packages и counter после сбоя запрашивает у LLM
+только недостающие батчи и пакеты; чужие и испорченные чекпоинты не используются
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.ai_agents import counter, works_to_packages
+from src.shared.agent_checkpoints import checkpoint_key, load_checkpoint, save_checkpoint
+from src.shared.truth_sections import load_truth
+
+WBS = [
+    {'id': 'cat_1', 'type': 'category', 'name': 'Отделка'},
+    {'id': 'pkg_a', 'type': 'package', 'name': 'Стены', 'parent_id': 'cat_1'},
+    {'id': 'pkg_b', 'type': 'package', 'name': 'Полы', 'parent_id': 'cat_1'},
+]
+
+
+class FakeClient:
+    """Отвечает как LLM; падает на вызове fail_on (имитация сбоя процесса)"""
+
+    def __init__(self, fail_on=None):
+        self.calls = 0
+        self.fail_on = fail_on
+
+    async def generate_response(self, prompt, system_instruction=None, agent_name=None):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("Сбой соединения")
+
+        data = json.loads(prompt)
+        if agent_name == 'works_to_packages':
+            assignments = [{'work_id': work['id'], 'package_id': 'pkg_a'} for work in data['works_to_assign']]
+            return {'success': True, 'response': {'assignments': assignments}}
+        return {'success': True, 'response': {'calculation': {'unit': 'м2', 'quantity': len(data['works'])}}}
+
+
+def _make_project(works):
+    project_path = tempfile.mkdtemp(prefix='test_herzog_checkpoints_')
+    truth_data = {
+        'metadata': {'pipeline_status': [{'agent_name': 'works_to_packages', 'status': 'pending'},
+                                         {'agent_name': 'counter', 'status': 'pending'}]},
+        'project_inputs': {'agent_directives': {}},
+        'source_work_items': works,
+        'results': {'work_breakdown_structure': WBS}
+    }
+    with open(os.path.join(project_path, 'true.json'), 'w', encoding='utf-8') as f:
+        json.dump(truth_data, f, ensure_ascii=False)
+    return project_path
+
+
+def test_checkpoint_key_and_load():
+    """Ответ берется только для тех же входных данных и только успешный"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_checkpoints_')
+    path = os.path.join(work_dir, 'batch_001_response.json')
+
+    try:
+        key = checkpoint_key({'works': ['w1']}, 'prompt')
+        assert key == checkpoint_key({'works': ['w1']}, 'prompt')
+        assert key != checkpoint_key({'works': ['w2']}, 'prompt')
+
+        assert load_checkpoint(path, key) is None
+        save_checkpoint(path, key, {'success': False, 'error': 'timeout'})
+        assert load_checkpoint(path, key) is None
+        save_checkpoint(path, key, {'success': True, 'response': {'assignments': []}})
+        assert load_checkpoint(path, key)['response'] == {'assignments': []}
+        assert load_checkpoint(path, checkpoint_key('other')) is None
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"success": tr')
+        assert load_checkpoint(path, key) is None
+        print("✅ Ключ и проверка чекпоинта")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_works_to_packages_resumes_from_failed_batch(monkeypatch):
+    """Сбой на 3-м батче: повторный запуск запрашивает только его"""
+    works = [{'id': f'w{i}', 'name': f'Работа {i}', 'code': f'ГЭСН{i:02d}'} for i in range(5)]
+    project_path = _make_project(works)
+
+    try:
+        failing = FakeClient(fail_on=3)
+        monkeypatch.setattr(works_to_packages, 'gemini_client', failing)
+        result = asyncio.run(works_to_packages.WorksToPackagesAssigner(batch_size=2).process(project_path))
+        assert not result['success'] and failing.calls == 3
+
+        resumed = FakeClient()
+        monkeypatch.setattr(works_to_packages, 'gemini_client', resumed)
+        result = asyncio.run(works_to_packages.WorksToPackagesAssigner(batch_size=2).process(project_path))
+        assert result['success'] and resumed.calls == 1
+
+        truth_data = load_truth(os.path.join(project_path, 'true.json'))
+        assert [work['package_id'] for work in truth_data['source_work_items']] == ['pkg_a'] * 5
+
+        # Испорченный чекпоинт (несуществующий пакет) запрашивается заново
+        batch_path = os.path.join(project_path, '5_works_to_packages', 'batch_001_response.json')
+        with open(batch_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        checkpoint['response']['assignments'][0]['package_id'] = 'pkg_missing'
+        with open(batch_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+
+        shutil.rmtree(project_path)
+        project_path = _make_project(works)
+        os.makedirs(os.path.join(project_path, '5_works_to_packages'))
+        with open(os.path.join(project_path, '5_works_to_packages', 'batch_001_response.json'), 'w',
+                  encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+
+        rerun = FakeClient()
+        monkeypatch.setattr(works_to_packages, 'gemini_client', rerun)
+        result = asyncio.run(works_to_packages.WorksToPackagesAssigner(batch_size=2).process(project_path))
+        assert result['success'] and rerun.calls == 3
+        print("✅ works_to_packages продолжает с упавшего батча")
+    finally:
+        shutil.rmtree(project_path)
+
+
+def test_counter_reuses_calculated_packages(monkeypatch):
+    """Повторный запуск counter не запрашивает уже рассчитанные пакеты"""
+    works = [
+        {'id': 'w1', 'name': 'Штукатурка', 'unit': 'м2', 'quantity': 10, 'package_id': 'pkg_a'},
+        {'id': 'w2', 'name': 'Шпатлевка', 'unit': 'м2', 'quantity': 10, 'package_id': 'pkg_a'},
+        {'id': 'w3', 'name': 'Стяжка', 'unit': 'м2', 'quantity': 20, 'package_id': 'pkg_b'},
+        {'id': 'w4', 'name': 'Линолеум', 'unit': 'м2', 'quantity': 20, 'package_id': 'pkg_b'},
+    ]
+    project_path = _make_project(works)
+
+    try:
+        failing = FakeClient(fail_on=2)
+        monkeypatch.setattr(counter, 'gemini_client', failing)
+        assert not asyncio.run(counter.WorkVolumeCalculator().process(project_path))['success']
+
+        resumed = FakeClient()
+        monkeypatch.setattr(counter, 'gemini_client', resumed)
+        result = asyncio.run(counter.WorkVolumeCalculator().process(project_path))
+        assert result['success'] and result['packages_calculated'] == 2
+        assert resumed.calls == 1
+        print("✅ counter берет рассчитанные пакеты из чекпоинтов")
+    finally:
+        shutil.rmtree(project_path)
+
+
+if __name__ == "__main__":
+    test_checkpoint_key_and_load()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Тест кэша классификации (classification_cache.py)
+Попадание по нормализованным шифру и наименованию, инвалидация по версии промпта и TTL,
+повторный проект не отправляет в LLM уже классифицированные позиции
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.data_processing import gemini_classifier
+from src.data_processing.classification_cache import ClassificationCache, make_item_key
+from src.data_processing.classifier import classify_items
+
+RESULT = {'classification': 'Иное', 'reasoning': 'Вывоз мусора не является работой'}
+
+
+def test_hit_by_normalized_key():
+    """Регистр, пробелы и ё/е не влияют на попадание"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_cls_cache_')
+
+    try:
+        cache = ClassificationCache(os.path.join(work_dir, 'cls.sqlite3'), version='v1')
+        cache.put_many({make_item_key({'code': 'КП', 'name': 'Вывоз  мусора'}): RESULT})
+
+        found = cache.get_many([{'code': ' кп ', 'name': 'ВЫВОЗ МУСОРА'}])
+        assert found == {'КП|вывоз мусора': RESULT}
+        assert cache.get_many([{'code': 'КП', 'name': 'Вывоз грунта'}]) == {}
+        assert make_item_key({'name': 'Щётки'}) == make_item_key({'code': '', 'name': 'щетки'})
+        print("✅ Попадание по нормализованному ключу")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_version_and_ttl_invalidation():
+    """Смена версии промпта и истекший TTL дают промах, 'Неопределенное' не кэшируется"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_cls_cache_')
+    db_path = os.path.join(work_dir, 'cls.sqlite3')
+    item = {'code': 'КП', 'name': 'Вывоз мусора'}
+
+    try:
+        cache = ClassificationCache(db_path, version='v1')
+        cache.put_many({
+            make_item_key(item): RESULT,
+            make_item_key({'name': 'Непонятно'}): {'classification': 'Неопределенное', 'reasoning': ''}
+        })
+
+        assert list(ClassificationCache(db_path, version='v1').get_many([item]).values()) == [RESULT]
+        assert ClassificationCache(db_path, version='v1').get_many([{'name': 'Непонятно'}]) == {}
+        assert ClassificationCache(db_path, version='v1', ttl_seconds=-1).get_many([item]) == {}
+
+        # Другая версия промпта не видит записи v1 и не стирает их
+        other_version = ClassificationCache(db_path, version='v2')
+        assert other_version.get_many([item]) == {}
+        other_version.put_many({make_item_key(item): {'classification': 'Работа', 'reasoning': ''}})
+        assert list(ClassificationCache(db_path, version='v1').get_many([item]).values()) == [RESULT]
+        assert other_version.get_many([item])[make_item_key(item)]['classification'] == 'Работа'
+
+        # Устаревшие записи удаляются только явным обслуживанием
+        assert ClassificationCache(db_path, version='v1').evict_expired() == 0
+        assert ClassificationCache(db_path, version='v1', ttl_seconds=-1).evict_expired() == 2
+        assert ClassificationCache(db_path, version='v1').get_many([item]) == {}
+        print("✅ Инвалидация по версии и TTL")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_classify_items_skips_llm_for_cached(monkeypatch):
+    """Второй проект с теми же позициями не обращается к LLM"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_cls_cache_')
+    llm_calls = []
+
+    async def fake_classify_with_gemini(items, project_dir=None):
+        llm_calls.append([item['name'] for item in items])
+        return {item['id']: {**RESULT, 'original_item': item} for item in items}
+
+    monkeypatch.setattr(gemini_classifier, 'classify_with_gemini', fake_classify_with_gemini)
+    monkeypatch.delenv('SMETNOEDELO_API_KEY', raising=False)
+    master_list = [
+        {'id': 'w1', 'code': 'ГЭСН01', 'name': 'Кладка'},
+        {'id': 'o1', 'code': 'КП', 'name': 'Вывоз мусора'},
+        {'id': 'o2', 'code': '', 'name': 'Транспорт'},
+    ]
+
+    try:
+        cache = ClassificationCache(os.path.join(work_dir, 'cls.sqlite3'), version='v1')
+        first = asyncio.run(classify_items(master_list, cache=cache))
+        assert [item['classification'] for item in first] == ['Работа', 'Иное', 'Иное']
+        assert llm_calls == [['Вывоз мусора', 'Транспорт']]
+
+        second = asyncio.run(classify_items(master_list, cache=cache))
+        assert len(llm_calls) == 1
+        assert second == first
+        assert second[1]['gemini_reasoning'] == RESULT['reasoning']
+        print("✅ Повторные позиции берутся из кэша")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_hit_by_normalized_key()
+    test_version_and_ttl_invalidation()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Тест локальной классификации (data_processing/classifier.py)
+Пакетный проход по таблице дает тот же результат, что и classify_locally по строкам;
+повторяющиеся позиции уходят в LLM одним представителем
+"""
+
+import asyncio
+import os
+import sys
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.data_processing import gemini_classifier
+from src.data_processing.classifier import (
+    classify_items, classify_locally, classify_locally_batch, group_by_normalized_name, normalize_name_for_dedup
+)
+
+ITEMS = [
+    {'code': 'ГЭСН08-02-001-01', 'name': 'Кладка стен'},
+    {'code': ' гэснм12-01-002', 'name': 'Монтаж оборудования'},
+    {'code': 'ТЕРр63-1-1', 'name': 'Ремонт'},
+    {'code': 'ФСБЦ-04.1.02.05-0006', 'name': 'Бетон тяжелый'},
+    {'code': 'ТЦ_01.2.03', 'name': 'Битум'},
+    {'code': 'ФССЦо-01', 'name': 'Транспорт грузов'},
+    {'code': '', 'name': 'Накладные расходы от ФОТ'},
+    {'code': '', 'name': 'ИТОГО по разделу'},
+    {'code': 'Прайс', 'name': 'Доставка материала на объект'},
+    {'code': 'Прайс', 'name': 'Щебень'},
+    {'code': 'ГЭСН01', 'name': 'Всего работ'},
+    {'name': 'Без шифра'},
+    {},
+]
+
+
+def test_batch_matches_per_item():
+    """classify_locally_batch совпадает с classify_locally для каждой позиции"""
+    expected = [classify_locally(item) for item in ITEMS]
+
+    assert classify_locally_batch(ITEMS) == expected
+    assert expected == [
+        'Работа', 'Работа', 'Работа', 'Материал', 'Материал', 'Материал',
+        'Иное', 'Иное', 'Иное', None, 'Работа', None, None
+    ]
+    print("✅ Пакетная классификация совпадает с построчной")
+
+
+def test_batch_empty_list():
+    """Пустой master_list классифицируется без ошибок"""
+    assert classify_locally_batch([]) == []
+    print("✅ Пустой список")
+
+
+def test_normalize_name_for_dedup():
+    """Регистр, пробелы, числа, единицы измерения и пунктуация не различают наименования"""
+    assert normalize_name_for_dedup('Погрузка мусора 12,5 т') == 'погрузка мусора'
+    assert normalize_name_for_dedup('погрузка  МУСОРА - 3т') == 'погрузка мусора'
+    assert normalize_name_for_dedup('Накладные расходы 112% от ФОТ') == 'накладные расходы от фот'
+    assert normalize_name_for_dedup('Вывоз материала (м3)') == 'вывоз материала'
+    # Слово, начинающееся с единицы измерения, не обрезается
+    assert normalize_name_for_dedup('Тонкая стяжка') == 'тонкая стяжка'
+    print("✅ Нормализация наименований")
+
+
+def test_duplicates_sent_once_and_fanned_out(monkeypatch):
+    """В LLM уходит по одной позиции на группу, результат получают все позиции группы"""
+    prompts = []
+
+    async def fake_classify_with_gemini(items, project_dir=None):
+        prompts.append([item['id'] for item in items])
+        return {item['id']: {'classification': 'Работа', 'reasoning': item['name'], 'original_item': item}
+                for item in items}
+
+    monkeypatch.setattr(gemini_classifier, 'classify_with_gemini', fake_classify_with_gemini)
+    monkeypatch.delenv('SMETNOEDELO_API_KEY', raising=False)
+    items = [
+        {'id': 'a', 'code': 'КП', 'name': 'Погрузка мусора 12,5 т'},
+        {'id': 'b', 'code': 'КП', 'name': 'Перевозка грузов на 30 км'},
+        {'id': 'c', 'code': 'КП', 'name': 'погрузка мусора - 3 т'},
+        {'id': 'd', 'code': '', 'name': '1.2'},
+        {'id': 'e', 'code': '', 'name': '3.4'},
+    ]
+
+    assert [len(group) for group in group_by_normalized_name(items)] == [2, 1, 1, 1]
+
+    classified = asyncio.run(classify_items(items))
+
+    assert prompts == [['a', 'b', 'd', 'e']]
+    assert [item['classification'] for item in classified] == ['Работа'] * 5
+    assert classified[2]['gemini_reasoning'] == 'Погрузка мусора 12,5 т'
+    print("✅ Дубликаты отправлены один раз")
+
+
+if __name__ == "__main__":
+    test_batch_matches_per_item()
+    test_batch_empty_list()
+    test_normalize_name_for_dedup()
+    print("\n🎉 Все тесты пройдены!")
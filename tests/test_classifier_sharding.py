@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Тест порционной классификации через LLM (gemini_classifier.py)
+Деление по бюджету токенов, ограничение параллельности, повтор только позиций без ответа
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.data_processing import gemini_classifier
+from src.data_processing.classifier import classify_items
+from src.data_processing.gemini_classifier import classify_with_gemini, estimate_output_tokens, split_into_shards
+
+
+class FakeClient:
+    """LLM, который обрезает ответ после max_answers позиций и один раз падает на первом запросе"""
+
+    def __init__(self, max_answers: int, fail_first: bool = False):
+        self.max_answers = max_answers
+        self.fail_first = fail_first
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_response(self, prompt, agent_name=None, system_instruction=None):
+        shard = json.loads(prompt)
+        self.requests.append([item['id'] for item in shard])
+        is_first = len(self.requests) == 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+        if self.fail_first and is_first:
+            return {'success': False, 'error': 'HTTP 500'}
+
+        answers = [
+            {'id': item['id'], 'classification': 'Работа', 'reasoning': item['full_name']}
+            for item in shard[:self.max_answers]
+        ]
+        return {'success': True, 'response': answers, 'raw_text': json.dumps(answers, ensure_ascii=False)}
+
+
+def _items(count):
+    return [{'id': f'id-{i:03d}', 'code': 'КП', 'name': f'Вывоз мусора {i}'} for i in range(count)]
+
+
+def test_split_respects_budget():
+    """Каждая порция укладывается в бюджет, порядок позиций сохраняется"""
+    items = [{'id': item['id'], 'full_name': item['name']} for item in _items(50)]
+    budget = estimate_output_tokens(items[0]) * 7
+
+    shards = split_into_shards(items, budget)
+
+    assert [item for shard in shards for item in shard] == items
+    assert all(sum(estimate_output_tokens(item) for item in shard) <= budget for shard in shards)
+    assert [len(shard) for shard in shards] == [7] * 7 + [1]
+    print("✅ Порции укладываются в бюджет токенов")
+
+
+def test_retries_only_missing_items(monkeypatch):
+    """Упавшая и обрезанные порции повторяются только для позиций без ответа"""
+    client = FakeClient(max_answers=8, fail_first=True)
+    monkeypatch.setattr(gemini_classifier, 'gemini_client', client)
+    monkeypatch.setattr(gemini_classifier, 'SHARD_OUTPUT_TOKENS', estimate_output_tokens({'id': 'id-000'}) * 10)
+    monkeypatch.setattr(gemini_classifier, 'MAX_CONCURRENT_SHARDS', 2)
+
+    result = asyncio.run(classify_with_gemini(_items(40)))
+
+    assert sorted(result) == [item['id'] for item in _items(40)]
+    assert result['id-005']['reasoning'] == 'КП Вывоз мусора 5'
+    assert client.max_in_flight <= 2
+    # Первый раунд: 4 порции по 10; затем только позиции без ответа
+    assert [len(ids) for ids in client.requests[:4]] == [10, 10, 10, 10]
+    retried = [item_id for ids in client.requests[4:] for item_id in ids]
+    assert len(retried) == len(set(retried)) == 10 + 3 * 2
+    print("✅ Повторяются только позиции без ответа")
+
+
+def test_classify_items_applies_results_by_id(monkeypatch):
+    """Результаты LLM попадают в позиции по id"""
+    client = FakeClient(max_answers=100)
+    monkeypatch.setattr(gemini_classifier, 'gemini_client', client)
+    monkeypatch.delenv('SMETNOEDELO_API_KEY', raising=False)
+
+    names = ['Вывоз мусора', 'Погрузка грунта', 'Перевозка грузов', 'Разгрузка щебня', 'Уборка территории']
+    items = [{'id': f'id-{i}', 'code': 'КП', 'name': name} for i, name in enumerate(names)]
+
+    classified = asyncio.run(classify_items(items + [{'code': '', 'name': 'Без id'}]))
+
+    assert [item['classification'] for item in classified] == ['Работа'] * 6
+    assert classified[2]['gemini_reasoning'] == 'КП Перевозка грузов'
+    assert classified[5]['gemini_reasoning'] == ' Без id'
+    print("✅ Результаты применены по id")
+
+
+if __name__ == "__main__":
+    test_split_respects_budget()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Тест общей HTTP-сессии ClaudeClient (shared/claude_client.py)
+Запросы идут через одно keep-alive соединение, сессия закрывается хуком
+и пересоздается в новом event loop
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+from aiohttp import web
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.shared.claude_client import ClaudeClient
+
+
+async def _start_fake_openrouter(peers):
+    """Локальный сервер с ответом в формате OpenRouter; peers - порты клиентских соединений"""
+    async def handle(request):
+        peers.append(request.transport.get_extra_info('peername')[1])
+        return web.json_response({
+            'choices': [{'message': {'content': json.dumps({'ok': True})}}],
+            'usage': {'prompt_tokens': 10, 'completion_tokens': 5}
+        })
+
+    app = web.Application()
+    app.router.add_post('/chat/completions', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/chat/completions"
+
+
+def test_requests_reuse_connection():
+    """Несколько запросов - одно TCP-соединение, close закрывает сессию"""
+    async def scenario():
+        peers = []
+        runner, url = await _start_fake_openrouter(peers)
+        client = ClaudeClient()
+        client.base_url = url
+        try:
+            await client.start()
+            session = client._session
+            for _ in range(3):
+                result = await client.generate_response('промт', agent_name='counter')
+                assert result['success'] and result['response'] == {'ok': True}
+            assert client._session is session
+            assert len(peers) == 3 and len(set(peers)) == 1
+            assert client.get_usage_stats()['total_requests'] == 3
+        finally:
+            await client.close()
+            await runner.cleanup()
+        assert session.closed and client._session is None
+
+    asyncio.run(scenario())
+    print("✅ Запросы переиспользуют одно соединение")
+
+
+def test_session_recreated_in_new_loop():
+    """После asyncio.run в новом цикле создается новая сессия"""
+    client = ClaudeClient()
+    sessions = []
+
+    async def open_and_close():
+        await client.start()
+        sessions.append(client._session)
+        await client.close()
+
+    asyncio.run(open_and_close())
+    asyncio.run(open_and_close())
+    assert sessions[0] is not sessions[1]
+    assert all(session.closed for session in sessions)
+    print("✅ Сессия пересоздается в новом event loop")
+
+
+if __name__ == "__main__":
+    test_requests_reuse_connection()
+    test_session_recreated_in_new_loop()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Тест фоновой записи отладочных артефактов (shared/debug_artifacts.py)
+Уровни off/summary/full/dedup, сжатие, на уровне dedup повторяющиеся
+между батчами значения сохраняются один раз
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.shared.debug_artifacts import BLOBS_DIR, ArtifactWriter, read_artifact
+
+WBS = [{'id': f'pkg_{i}', 'type': 'package', 'name': f'Пакет работ номер {i}'} for i in range(100)]
+
+
+def _batch(number):
+    return {
+        'works_to_assign': [{'id': f'w{number}', 'name': 'Кладка'}],
+        'work_breakdown_structure': WBS,
+        'meta': {'batch_number': number, 'works_count': 1}
+    }
+
+
+def test_full_level_writes_plain_json():
+    """На уровне full артефакт - обычный JSON без ссылок на _blobs"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_artifacts_')
+    writer = ArtifactWriter(level='full', compression='none')
+
+    try:
+        for number in (1, 2):
+            writer.write(os.path.join(work_dir, f'batch_{number:03d}_input.json'), _batch(number))
+        writer.close()
+
+        assert sorted(os.listdir(work_dir)) == ['batch_001_input.json', 'batch_002_input.json']
+        with open(os.path.join(work_dir, 'batch_002_input.json'), encoding='utf-8') as f:
+            assert json.load(f) == _batch(2)
+        print("✅ Уровень full пишет обычный JSON")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_dedup_level_stores_repeated_values_once():
+    """Структура пакетов из всех батчей хранится одним файлом, артефакт читается целиком"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_artifacts_')
+    writer = ArtifactWriter(level='dedup', compression='gzip')
+
+    try:
+        for number in (1, 2, 3):
+            writer.write(os.path.join(work_dir, f'batch_{number:03d}_input.json'), _batch(number))
+        writer.close()
+
+        assert sorted(os.listdir(work_dir)) == [BLOBS_DIR] + [f'batch_{n:03d}_input.json.gz' for n in (1, 2, 3)]
+        assert len(os.listdir(os.path.join(work_dir, BLOBS_DIR))) == 1
+
+        assert read_artifact(os.path.join(work_dir, 'batch_002_input.json')) == _batch(2)
+        raw = read_artifact(os.path.join(work_dir, 'batch_002_input.json'), resolve_blobs=False)
+        assert '$blob' in raw['work_breakdown_structure']
+        print("✅ Повторяющиеся данные сохранены один раз")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_summary_and_off_levels():
+    """summary пишет только сводку, off ничего не пишет"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_artifacts_')
+    response = {'success': True, 'response': {'assignments': []}, 'raw_text': 'x' * 5000,
+                'usage_metadata': {'total_token_count': 10}}
+
+    try:
+        summary_writer = ArtifactWriter(level='summary', compression='none')
+        summary_writer.write(os.path.join(work_dir, 'batch_001_input.json'), _batch(1))
+        summary_writer.write(os.path.join(work_dir, 'llm_response.json'), response)
+        summary_writer.close()
+
+        with open(os.path.join(work_dir, 'batch_001_input.json'), encoding='utf-8') as f:
+            assert json.load(f) == {'meta': {'batch_number': 1, 'works_count': 1}}
+        with open(os.path.join(work_dir, 'llm_response.json'), encoding='utf-8') as f:
+            assert json.load(f) == {'success': True, 'usage_metadata': {'total_token_count': 10}}
+
+        off_writer = ArtifactWriter(level='off')
+        off_writer.write(os.path.join(work_dir, 'other.json'), _batch(2))
+        off_writer.close()
+        assert not os.path.exists(os.path.join(work_dir, 'other.json'))
+        print("✅ Уровни summary и off")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_snapshot_taken_at_write_time():
+    """Изменения данных после write не попадают в артефакт"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_artifacts_')
+    writer = ArtifactWriter(level='full', compression='zstd')  # без zstandard - gzip
+
+    try:
+        data = _batch(1)
+        writer.write(os.path.join(work_dir, 'batch_001_input.json'), data)
+        data['works_to_assign'][0]['package_id'] = 'pkg_1'
+        writer.close()
+
+        assert read_artifact(os.path.join(work_dir, 'batch_001_input.json')) == _batch(1)
+        print("✅ Артефакт - снимок данных на момент записи")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_write_async_builds_data_off_loop():
+    """write_async строит и сериализует данные вне event loop; уровень по умолчанию - full"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_artifacts_')
+    writer = ArtifactWriter(compression='none')
+    threads = []
+
+    def build():
+        threads.append(threading.current_thread())
+        return _batch(1)
+
+    try:
+        assert writer.level == 'full'
+        asyncio.run(writer.write_async(os.path.join(work_dir, 'batch_001_input.json'), build))
+        writer.close()
+
+        assert threads and threads[0] is not threading.main_thread()
+        assert read_artifact(os.path.join(work_dir, 'batch_001_input.json')) == _batch(1)
+        print("✅ Данные артефакта строятся вне event loop")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_full_level_writes_plain_json()
+    test_dedup_level_stores_repeated_values_once()
+    test_summary_and_off_levels()
+    test_snapshot_taken_at_write_time()
+    test_write_async_builds_data_off_loop()
+    print("\n🎉 Все тесты пройдены!")
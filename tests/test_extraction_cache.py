@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Тест кэша извлечения (extraction_cache.py)
+Попадание по содержимому файла, промах при смене версии extractor, LRU-вытеснение
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_processing import extractor
+from src.data_processing.extraction_cache import ExtractionCache
+from src.data_processing.extractor import extract_from_files, extract_from_files_parallel
+
+HEADER = ['№ п/п', 'Обоснование', 'Наименование', None, None, None, None, 'Ед.изм.', 'Кол-во']
+
+
+def _write_estimate(file_path: str, rows: int):
+    data = [HEADER] + [
+        [i, f'ГЭСН-{i:03d}', f'Работа {i}', None, None, None, None, 'м2', i * 2.5]
+        for i in range(1, rows + 1)
+    ]
+    pd.DataFrame(data).to_excel(file_path, index=False, header=False)
+
+
+def _strip(records):
+    return [{k: v for k, v in r.items() if k != 'id'} for r in records]
+
+
+def test_hit_after_reupload_under_new_name():
+    """Тот же файл под другим именем берется из кэша, source_file - новое имя"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_cache_')
+    
+    try:
+        cache = ExtractionCache(os.path.join(work_dir, 'cache'))
+        original = os.path.join(work_dir, 'smeta.xlsx')
+        _write_estimate(original, 5)
+        
+        first = extract_from_files_parallel([original], max_workers=1, cache=cache)
+        assert first['cache_hits'] == 0
+        
+        renamed = os.path.join(work_dir, 'smeta_v2.xlsx')
+        shutil.copy(original, renamed)
+        second = extract_from_files_parallel([renamed], max_workers=1, cache=cache)
+        
+        assert second['cache_hits'] == 1
+        assert second['sheets_processed'] == 0
+        assert all(record['source_file'] == 'smeta_v2.xlsx' for record in second['records'])
+        expected = [{**r, 'source_file': 'smeta_v2.xlsx'} for r in _strip(first['records'])]
+        assert _strip(second['records']) == expected
+        assert list(second['records'][0]) == list(first['records'][0])
+        
+        # Последовательный режим - отдельный вариант ключа, но тоже кэшируется
+        sequential = extract_from_files([renamed], cache=cache)
+        assert _strip(extract_from_files([renamed], cache=cache)) == _strip(sequential)
+        print("✅ Повторная загрузка под новым именем - попадание в кэш")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_version_change_is_miss():
+    """Смена EXTRACTOR_VERSION инвалидирует кэш"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_cache_')
+    original_version = extractor.EXTRACTOR_VERSION
+    
+    try:
+        cache = ExtractionCache(os.path.join(work_dir, 'cache'))
+        file_path = os.path.join(work_dir, 'smeta.xlsx')
+        _write_estimate(file_path, 3)
+        
+        extract_from_files_parallel([file_path], max_workers=1, cache=cache)
+        extractor.EXTRACTOR_VERSION = original_version + '-next'
+        result = extract_from_files_parallel([file_path], max_workers=1, cache=cache)
+        
+        assert result['cache_hits'] == 0
+        print("✅ Новая версия extractor - промах кэша")
+    finally:
+        extractor.EXTRACTOR_VERSION = original_version
+        shutil.rmtree(work_dir)
+
+
+def test_lru_eviction():
+    """При превышении лимита удаляется давно не использованная запись"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_cache_')
+    
+    try:
+        rows = [{'position_num': str(i), 'code': 'ГЭСН', 'name': 'x' * 100, 'unit': 'м', 'quantity': i}
+                for i in range(10)]
+        cache = ExtractionCache(work_dir, max_bytes=10 ** 9)
+        cache.put('a', rows)
+        cache.put('b', rows)
+        entry_size = os.path.getsize(os.path.join(work_dir, 'a.json'))
+        
+        # 'a' использована позже 'b'
+        past = time.time() - 100
+        os.utime(os.path.join(work_dir, 'b.json'), (past, past))
+        os.utime(os.path.join(work_dir, 'a.json'), (past, past))
+        assert cache.get('a') == rows
+        
+        cache.max_bytes = entry_size * 2
+        cache.put('c', rows)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == rows
+        assert cache.get('c') == rows
+        print("✅ LRU-вытеснение удалило давно не использованную запись")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_hit_after_reupload_under_new_name()
+    test_version_change_is_miss()
+    test_lru_eviction()
+    print("\n🎉 Все тесты пройдены!")
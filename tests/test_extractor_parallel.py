@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Тест параллельного извлечения extractor.py
+Все файлы и все листы, детерминированный порядок, ошибки файла не прерывают остальные
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_processing.extractor import extract_from_files, extract_from_files_parallel, find_excel_files
+
+HEADER = ['№ п/п', 'Обоснование', 'Наименование', None, None, None, None, 'Ед.изм.', 'Кол-во']
+
+
+def _sheet(prefix: str, rows: int) -> pd.DataFrame:
+    data = [HEADER] + [
+        [i, f'ГЭСН{prefix}-{i:03d}', f'Работа {prefix} {i}', None, None, None, None, 'м2', i * 1.5]
+        for i in range(1, rows + 1)
+    ]
+    return pd.DataFrame(data)
+
+
+def _create_project_input() -> str:
+    """0_input с двумя книгами (одна из них многолистовая) и битым файлом"""
+    input_path = tempfile.mkdtemp(prefix='test_herzog_input_')
+    
+    with pd.ExcelWriter(os.path.join(input_path, '01_walls.xlsx')) as writer:
+        pd.DataFrame([['Титульный лист']]).to_excel(writer, sheet_name='Титул', index=False, header=False)
+        _sheet('A', 3).to_excel(writer, sheet_name='ЛСР 1', index=False, header=False)
+        _sheet('B', 2).to_excel(writer, sheet_name='ЛСР 2', index=False, header=False)
+    
+    _sheet('C', 4).to_excel(os.path.join(input_path, '02_roof.xlsx'), index=False, header=False)
+    
+    with open(os.path.join(input_path, '03_broken.xlsx'), 'w') as f:
+        f.write('это не xlsx')
+    
+    return input_path
+
+
+def test_parallel_extraction_order_and_errors():
+    """Записи всех листов в порядке (файл, лист, строка), битый файл - в errors"""
+    input_path = _create_project_input()
+    
+    try:
+        files = find_excel_files(input_path)
+        result = extract_from_files_parallel(files, max_workers=2)
+        
+        codes = [record['code'] for record in result['records']]
+        expected = ([f'ГЭСНA-{i:03d}' for i in range(1, 4)] +
+                    [f'ГЭСНB-{i:03d}' for i in range(1, 3)] +
+                    [f'ГЭСНC-{i:03d}' for i in range(1, 5)])
+        
+        assert codes == expected, codes
+        assert list(result['errors']) == ['03_broken.xlsx']
+        assert result['files_processed'] == 2
+        assert result['sheets_processed'] == 3
+        print(f"✅ Параллельно извлечено {len(codes)} записей, ошибки: {result['errors']}")
+    finally:
+        shutil.rmtree(input_path)
+
+
+def test_parallel_matches_sequential_for_single_sheet():
+    """Для однолистовой книги результат совпадает с последовательным режимом"""
+    input_path = _create_project_input()
+    
+    try:
+        roof = os.path.join(input_path, '02_roof.xlsx')
+        strip = lambda records: [{k: v for k, v in r.items() if k != 'id'} for r in records]
+        
+        sequential = extract_from_files([roof])
+        parallel = extract_from_files_parallel([roof])['records']
+        
+        assert strip(parallel) == strip(sequential)
+        print("✅ Параллельный режим совпадает с последовательным")
+    finally:
+        shutil.rmtree(input_path)
+
+
+if __name__ == "__main__":
+    test_parallel_extraction_order_and_errors()
+    test_parallel_matches_sequential_for_single_sheet()
+    print("\n🎉 Все тесты пройдены!")
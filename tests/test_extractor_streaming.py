@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Тест потокового режима extractor.py
+Потоковое извлечение (openpyxl read_only) должно давать те же записи, что и pd.read_excel
+"""
+
+import os
+import sys
+import tempfile
+import types
+
+import pandas as pd
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_processing import extractor
+from src.data_processing.extractor import extract_from_file, iter_records_from_file
+
+
+def _create_test_excel() -> str:
+    """Создает тестовую смету с шапкой, мусорными строками и пустыми ячейками"""
+    rows = [
+        ['ЛОКАЛЬНЫЙ СМЕТНЫЙ РАСЧЕТ', None, None, None, None, None, None, None, None],
+        [None] * 9,
+        ['№ п/п', 'Обоснование', 'Наименование работ', None, None, None, None, 'Ед.изм.', 'Кол-во'],
+        [1, 2, 3, 4, 5, 6, 7, 8, 9],
+        [1, 'ГЭСН46-02-009-02', 'Отбивка штукатурки', None, None, None, None, '100 м2', 7.77],
+        ['Раздел 1. Стены', None, None, None, None, None, None, None, None],
+        [2, 'ФСБЦ-14.4.01.02-0012', 'Смесь сухая', None, None, None, None, 'кг', 1000],
+        ['2,1', 'ГЭСН15-04-005-03', 'Окраска стен', None, None, None, None, 'м2', None],
+        [3, 15, 'Накладные расходы', None, None, None, None, '%', 'NA'],
+    ]
+    
+    with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as tmp:
+        pd.DataFrame(rows).to_excel(tmp.name, index=False, header=False)
+        return tmp.name
+
+
+def _without_ids(records):
+    return [{key: value for key, value in record.items() if key != 'id'} for record in records]
+
+
+def test_streaming_matches_dataframe():
+    """Потоковый режим дает те же записи (кроме случайных id), что и обычный"""
+    excel_file = _create_test_excel()
+    
+    try:
+        dataframe_records = extract_from_file(excel_file)
+        streaming_records = extract_from_file(excel_file, streaming=True)
+        
+        assert len(dataframe_records) == 4, f"Ожидали 4 записи, получили {len(dataframe_records)}"
+        assert _without_ids(streaming_records) == _without_ids(dataframe_records)
+        print(f"✅ Потоковый режим совпадает с pd.read_excel: {len(streaming_records)} записей")
+    finally:
+        os.unlink(excel_file)
+
+
+def test_streaming_is_generator():
+    """iter_records_from_file отдает записи лениво"""
+    excel_file = _create_test_excel()
+    
+    try:
+        records = iter_records_from_file(excel_file)
+        assert isinstance(records, types.GeneratorType)
+        
+        first = next(records)
+        assert first['code'] == 'ГЭСН46-02-009-02'
+        assert first['quantity'] == '7.77'
+        records.close()
+        print("✅ Записи отдаются генератором")
+    finally:
+        os.unlink(excel_file)
+
+
+def test_streaming_opens_workbook_once(monkeypatch):
+    """Имя листа и строки берутся из одной открытой книги"""
+    excel_file = _create_test_excel()
+    opened = []
+    original_load = extractor.load_workbook
+
+    def counting_load(*args, **kwargs):
+        opened.append(args[0])
+        return original_load(*args, **kwargs)
+
+    monkeypatch.setattr(extractor, 'load_workbook', counting_load)
+
+    try:
+        records = list(iter_records_from_file(excel_file))
+        assert len(records) == 4 and records[0]['source_sheet'] == 'Sheet1'
+        assert opened == [excel_file]
+        print("✅ Книга открывается один раз")
+    finally:
+        os.unlink(excel_file)
+
+
+if __name__ == "__main__":
+    test_streaming_matches_dataframe()
+    test_streaming_is_generator()
+    print("\n🎉 Все тесты пройдены!")
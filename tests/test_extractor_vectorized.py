@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Тест колоночного режима extractor.py
+Маски NumPy/pandas должны давать те же записи, что и построчный iterrows
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_processing.extractor import (
+    extract_records_from_dataframe, extract_records_vectorized,
+    find_table_header, find_table_header_vectorized
+)
+
+
+def _dump_without_ids(records) -> str:
+    return json.dumps([{k: v for k, v in r.items() if k != 'id'} for r in records], ensure_ascii=False, indent=2)
+
+
+def _create_test_frame() -> pd.DataFrame:
+    """Лист с краевыми случаями: запятая в номере, мусорные строки, float() без to_numeric"""
+    return pd.DataFrame([
+        ['Смета', None, None, None, None, None, None, None, None],
+        ['№ п/п', 'Обоснование', 'Наименование', None, None, None, None, 'Ед.', 'Кол-во'],
+        [1, 2, 3, 4, 5, 6, 7, 8, 9],
+        [1, 'ГЭСН46-02-009-02', 'Отбивка штукатурки', None, None, None, None, '100 м2', 7.77],
+        ['2,1', 'ФСБЦ-14.4.01.02', 'Смесь сухая', None, None, None, None, 'кг', 1000],
+        ['Раздел 2', None, None, None, None, None, None, None, None],
+        ['1_0', 'nan', 'Накладные', None, None, None, None, '%', None],
+        [3, '4', 'inf', None, None, None, None, None, None],
+        [4, '5', None, None, None, None, None, 'шт', np.nan],
+    ])
+
+
+def test_header_detection_matches():
+    """Векторный поиск заголовка находит ту же строку"""
+    df = _create_test_frame()
+    assert find_table_header_vectorized(df) == find_table_header(df) == 1
+    assert find_table_header_vectorized(df.iloc[2:]) is None
+    print("✅ Заголовок найден в той же строке")
+
+
+def test_records_are_identical():
+    """Колоночное извлечение совпадает с построчным байт в байт (без учета случайных id)"""
+    df = _create_test_frame()
+    
+    baseline = extract_records_from_dataframe(df, 'test.xlsx')
+    vectorized = extract_records_vectorized(df, 'test.xlsx')
+    
+    assert [r['position_num'] for r in vectorized] == ['1', '2,1', '1_0', '4']
+    assert _dump_without_ids(vectorized) == _dump_without_ids(baseline)
+    print(f"✅ Записи совпадают: {len(vectorized)}")
+
+
+if __name__ == "__main__":
+    test_header_detection_matches()
+    test_records_are_identical()
+    print("\n🎉 Все тесты пройдены!")
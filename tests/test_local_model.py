@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Тест локальной модели классификации (local_model.py)
+Обучение по ответам LLM из проектов (старый и порционный формат llm_response.json),
+уверенные предсказания не уходят в LLM
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.data_processing import classifier, gemini_classifier
+from src.shared.debug_artifacts import ArtifactWriter
+from src.data_processing.local_model import LocalClassifier, collect_training_data, retrain
+
+WORKS = ['Погрузка мусора', 'Перевозка грузов', 'Вывоз грунта', 'Разгрузка щебня', 'Монтаж опалубки']
+MATERIALS = ['Накладные расходы', 'Сметная прибыль', 'Вспомогательные ресурсы', 'Кирпич керамический', 'Бетон тяжелый']
+VARIANTS = ['', 'по смете', 'на объекте', 'в пределах площадки', 'по разделу', 'дополнительно']
+
+
+def _history(names, label, prefix):
+    items = [{'id': f'{prefix}-{i}-{j}', 'code': 'КП', 'name': f'{name} {variant} {j * 5} т'}
+             for i, name in enumerate(names) for j, variant in enumerate(VARIANTS)]
+    answers = [{'id': item['id'], 'classification': label, 'reasoning': ''} for item in items]
+    return items, answers
+
+
+def _write_project(projects_dir, project, items, llm_response):
+    classified_dir = os.path.join(projects_dir, '1', project, '2_classified')
+    os.makedirs(classified_dir)
+    with open(os.path.join(classified_dir, 'llm_input.json'), 'w', encoding='utf-8') as f:
+        json.dump({'items': items}, f, ensure_ascii=False)
+    with open(os.path.join(classified_dir, 'llm_response.json'), 'w', encoding='utf-8') as f:
+        json.dump(llm_response, f, ensure_ascii=False)
+
+
+def _create_projects():
+    projects_dir = tempfile.mkdtemp(prefix='test_herzog_model_')
+    work_items, work_answers = _history(WORKS, 'Работа', 'w')
+    material_items, material_answers = _history(MATERIALS, 'Материал', 'm')
+
+    # Старый формат: один ответ, классификации только в raw_text
+    _write_project(projects_dir, 'old', work_items,
+                   {'success': True, 'response': None, 'raw_text': json.dumps(work_answers, ensure_ascii=False)})
+    # Порционный формат: список ответов, неудачный ответ пропускается
+    _write_project(projects_dir, 'new', material_items, [
+        {'success': True, 'response': material_answers[:10]},
+        {'success': False, 'error': 'HTTP 500'},
+        {'success': True, 'response': material_answers[10:]},
+    ])
+    return projects_dir
+
+
+def test_collect_and_predict():
+    """Данные собираются из обоих форматов, модель различает работы и материалы"""
+    projects_dir = _create_projects()
+
+    try:
+        items, labels = collect_training_data(projects_dir)
+        assert len(items) == 60
+        assert labels.count('Работа') == labels.count('Материал') == 30
+
+        model = LocalClassifier.fit(items, labels)
+        predicted, confidences = model.predict([
+            {'code': 'КП', 'name': 'Погрузка мусора 12 т'},
+            {'code': '', 'name': 'Сметная прибыль'},
+            {'code': '', 'name': 'Устройство кровли из профнастила'},
+        ])
+
+        assert predicted[:2] == ['Работа', 'Материал']
+        assert confidences[0] > 0.95 and confidences[1] > 0.95
+        assert confidences[2] < confidences[0]
+        print("✅ Обучение и предсказание")
+    finally:
+        shutil.rmtree(projects_dir)
+
+
+def test_collect_baseline_format():
+    """Проекты до этой версии: items пуст, id и наименования только в user_prompt"""
+    projects_dir = tempfile.mkdtemp(prefix='test_herzog_model_')
+    model_path = os.path.join(projects_dir, 'local_classifier.npz')
+    items, answers = [], []
+    for names, label, prefix in ((WORKS, 'Работа', 'w'), (MATERIALS, 'Материал', 'm')):
+        history_items, history_answers = _history(names, label, prefix)
+        items += history_items
+        answers += history_answers
+    prompt_items = [{'id': item['id'], 'full_name': f"{item['code']} {item['name']}"} for item in items]
+
+    try:
+        classified_dir = os.path.join(projects_dir, '1', 'baseline', '2_classified')
+        os.makedirs(classified_dir)
+        with open(os.path.join(classified_dir, 'llm_input.json'), 'w', encoding='utf-8') as f:
+            json.dump({'system_instruction': '...', 'items': [],
+                       'user_prompt': json.dumps(prompt_items, ensure_ascii=False, indent=2)}, f, ensure_ascii=False)
+        with open(os.path.join(classified_dir, 'llm_response.json'), 'w', encoding='utf-8') as f:
+            json.dump({'success': True, 'response': answers, 'raw_text': ''}, f, ensure_ascii=False)
+
+        collected, labels = collect_training_data(projects_dir)
+        assert len(collected) == 60 and labels.count('Работа') == 30
+
+        model = retrain(projects_dir, model_path)
+        assert model is not None and os.path.exists(model_path)
+        predicted, _ = model.predict([{'code': 'КП', 'name': 'Погрузка мусора 12 т'}])
+        assert predicted == ['Работа']
+        print("✅ Обучение по проектам в прежнем формате")
+    finally:
+        shutil.rmtree(projects_dir)
+
+
+def test_retrain_and_classify_items(monkeypatch):
+    """Переобученная модель сохраняется, уверенные позиции не уходят в LLM"""
+    projects_dir = _create_projects()
+    model_path = os.path.join(projects_dir, 'model', 'local_classifier.npz')
+    llm_calls = []
+
+    async def fake_classify_with_gemini(items, project_dir=None):
+        llm_calls.append([item['name'] for item in items])
+        return {}
+
+    try:
+        assert retrain(projects_dir, model_path) is not None
+        monkeypatch.setattr(classifier, 'load_default_model', lambda: LocalClassifier.load(model_path))
+        monkeypatch.setattr(gemini_classifier, 'classify_with_gemini', fake_classify_with_gemini)
+        monkeypatch.delenv('SMETNOEDELO_API_KEY', raising=False)
+
+        classified = asyncio.run(classifier.classify_items([
+            {'id': 'a', 'code': 'КП', 'name': 'Погрузка мусора 7 т'},
+            {'id': 'b', 'code': '', 'name': 'Накладные расходы'},
+            {'id': 'c', 'code': '', 'name': 'Устройство кровли из профнастила'},
+        ]))
+
+        assert [item['classification'] for item in classified[:2]] == ['Работа', 'Материал']
+        assert classified[0]['local_model_confidence'] >= classifier.LOCAL_MODEL_THRESHOLD
+        assert llm_calls == [['Устройство кровли из профнастила']]
+        print("✅ Уверенные позиции классифицированы без LLM")
+    finally:
+        shutil.rmtree(projects_dir)
+
+
+def test_retrain_needs_enough_data():
+    """Без истории ответов модель не создается"""
+    projects_dir = tempfile.mkdtemp(prefix='test_herzog_model_')
+    model_path = os.path.join(projects_dir, 'local_classifier.npz')
+
+    try:
+        assert retrain(projects_dir, model_path) is None
+        assert not os.path.exists(model_path)
+        print("✅ Недостаточно данных")
+    finally:
+        shutil.rmtree(projects_dir)
+
+
+def test_collect_compressed_artifacts():
+    """Артефакты классификатора, записанные ArtifactWriter со сжатием, тоже идут в обучение"""
+    projects_dir = tempfile.mkdtemp(prefix='test_herzog_model_')
+    writer = ArtifactWriter(level='full', compression='gzip')
+    items, answers = _history(WORKS, 'Работа', 'w')
+
+    try:
+        classified_dir = os.path.join(projects_dir, '1', 'gz', '2_classified')
+        writer.write(os.path.join(classified_dir, 'llm_input.json'), {'items': items})
+        writer.write(os.path.join(classified_dir, 'llm_response.json'), [{'success': True, 'response': answers}])
+        writer.close()
+        assert sorted(os.listdir(classified_dir)) == ['llm_input.json.gz', 'llm_response.json.gz']
+
+        collected, labels = collect_training_data(projects_dir)
+        assert len(collected) == 30 and set(labels) == {'Работа'}
+        print("✅ Обучение по сжатым артефактам")
+    finally:
+        shutil.rmtree(projects_dir)
+
+
+if __name__ == "__main__":
+    test_collect_and_predict()
+    test_collect_baseline_format()
+    test_collect_compressed_artifacts()
+    test_retrain_needs_enough_data()
+    print("\n🎉 Все тесты пройдены!")
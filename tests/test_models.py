@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Тест компактной модели работ (shared/models.py)
+Количество разбирается в число, преобразование в словарь и обратно без потерь
+"""
+
+import os
+import sys
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.shared.models import WorkItem, parse_quantity, work_items_from_dicts, work_items_to_dicts
+
+
+def test_parse_quantity():
+    """Числа из сметы: запятая, пробелы-разделители, пустые и нечисловые значения"""
+    assert parse_quantity('12,5') == 12.5
+    assert parse_quantity('1 250,75') == 1250.75
+    assert parse_quantity(3) == 3.0
+    assert parse_quantity('') == 0.0
+    assert parse_quantity(None) == 0.0
+    assert parse_quantity('по проекту') == 'по проекту'
+    print("✅ Разбор количества")
+
+
+def test_round_trip():
+    """Словарь true.json -> WorkItem -> словарь: поля, package_id и прочие ключи сохраняются"""
+    items = [
+        {'id': 'w1', 'source_file': 'a.xlsx', 'source_sheet': 'Лист1', 'code': 'ГЭСН', 'name': 'Кладка',
+         'unit': 'м3', 'quantity': 10.0},
+        {'id': 'w2', 'source_file': 'a.xlsx', 'source_sheet': 'Лист1', 'code': 'ГЭСН', 'name': 'Окраска',
+         'unit': 'м2', 'quantity': 5.5, 'quantity_raw': '5,50', 'package_id': 'pkg_1', 'group_name': 'Отделка'},
+    ]
+
+    works = work_items_from_dicts(items)
+    assert works[0].package_id is None and works[1].extra == {'group_name': 'Отделка'}
+    assert works[0].quantity_raw == '' and works[1].quantity_raw == '5,50'
+    assert not hasattr(works[0], '__dict__')
+    assert work_items_to_dicts(works) == items
+
+    works[0].package_id = 'pkg_2'
+    assert works[0].to_dict()['package_id'] == 'pkg_2'
+    assert WorkItem.from_dict({'id': 'w3', 'quantity': '7,5'}).quantity == 7.5
+    print("✅ Преобразование в словарь и обратно")
+
+
+if __name__ == "__main__":
+    test_parse_quantity()
+    test_round_trip()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Тест офлайн-справочника нормативов (normative_index.py)
+Сборка индекса из CSV, поиск через mmap, обогащение работ в classify_items без API
+"""
+
+import asyncio
+import csv
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_processing import classifier
+from src.data_processing.normative_index import NormativeIndex, build_index, make_index_key
+
+ROWS = [
+    {'code': 'ГЭСН08-02-001-01', 'name': 'Кладка стен кирпичных наружных', 'section': 'Сборник 08', 'unit': '1 м3'},
+    {'code': 'ГЭСНм08-01-001', 'name': 'Монтаж щитов', 'section': 'Сборник м08', 'unit': 'шт'},
+    {'code': 'ФЕР11-01-011-01', 'name': 'Устройство стяжек', 'section': 'Сборник 11', 'unit': '100 м2'},
+    {'code': 'ГЭСН08-02-001-01', 'name': 'Повтор шифра', 'section': '', 'unit': ''},
+]
+
+
+def _write_dump(work_dir: str, rows) -> str:
+    dump_path = os.path.join(work_dir, 'dump.csv')
+    with open(dump_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['code', 'name', 'section', 'unit'])
+        writer.writeheader()
+        writer.writerows(rows)
+    return dump_path
+
+
+def test_build_and_lookup():
+    """Поиск по шифру с нормализацией, первый из повторов, промах для неизвестного шифра"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_norm_')
+
+    try:
+        index_path = os.path.join(work_dir, 'index.bin')
+        assert build_index(_write_dump(work_dir, ROWS), index_path) == 3
+
+        with NormativeIndex(index_path) as index:
+            assert len(index) == 3
+            assert index.lookup(' гэсн08-02-001-01') == {
+                'official_name': 'Кладка стен кирпичных наружных', 'section': 'Сборник 08', 'unit': '1 м3'
+            }
+            assert index.lookup('ГЭСНм08-01-001')['official_name'] == 'Монтаж щитов'
+            assert index.lookup('ФЕР 11-01-011-01')['unit'] == '100 м2'
+            assert index.lookup('ГЭСН99-99-999') is None
+            assert index.lookup('ГЭСНм08-02-001-01') is None
+
+        assert make_index_key('ГЭСНм08-01-001') == 'gesnm|ГЭСНМ08-01-001'
+        print("✅ Поиск по индексу")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_many_records_with_collisions():
+    """Все записи находятся при заполненной хэш-таблице"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_norm_')
+    rows = [{'code': f'ГЭСН{i:02d}-01-{i:03d}', 'name': f'Работа {i}', 'section': '', 'unit': 'м2'}
+            for i in range(1000)]
+
+    try:
+        index_path = os.path.join(work_dir, 'index.bin')
+        build_index(_write_dump(work_dir, rows), index_path)
+
+        with NormativeIndex(index_path) as index:
+            assert all(index.lookup(row['code'])['official_name'] == row['name'] for row in rows)
+            assert index.lookup('ГЭСН00-01-999') is None
+        print("✅ 1000 записей")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_classify_items_uses_index_without_api(monkeypatch):
+    """Наименования работ берутся из справочника, API не вызывается"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_norm_')
+
+    def no_api(*args, **kwargs):
+        raise AssertionError("API не должен вызываться")
+
+    try:
+        index_path = os.path.join(work_dir, 'index.bin')
+        build_index(_write_dump(work_dir, ROWS), index_path)
+        monkeypatch.setattr(classifier, 'open_default_index', lambda: NormativeIndex(index_path))
+        monkeypatch.setattr(classifier, 'SmetnoedeloClient', no_api)
+        monkeypatch.setattr(classifier, 'SMETNOEDELO_ENABLED', True)
+        monkeypatch.setenv('SMETNOEDELO_API_KEY', 'token')
+
+        classified = asyncio.run(classifier.classify_items([
+            {'id': 'w1', 'code': 'ГЭСН08-02-001-01', 'name': 'Кладка'},
+            {'id': 'w2', 'code': 'ФЕР11-01-011-01', 'name': 'Стяжка'},
+        ]))
+
+        assert [item['name'] for item in classified] == ['Кладка стен кирпичных наружных', 'Устройство стяжек']
+        print("✅ Обогащение из справочника")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_build_and_lookup()
+    test_many_records_with_collisions()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Тест передачи данных между шагами 1-3 пайплайна (main_pipeline.py)
+Классификация и подготовка получают записи в памяти, артефакты пишутся в фоне;
+все файлы шагов пишутся компактно, читаемые отступы - только с --persist-intermediates
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.data_processing import classification_cache
+from src.main_pipeline import HerzogPipeline
+from src.shared.truth_initializer import create_true_json
+from src.shared.truth_sections import load_truth
+
+RAW_DATA = [
+    {'id': 'w1', 'source_file': 'a.xlsx', 'source_sheet': 'Лист1', 'position_num': '1',
+     'code': 'ГЭСН08-02-001-01', 'name': 'Кладка стен', 'unit': 'м3', 'quantity': '10'},
+    {'id': 'm1', 'source_file': 'a.xlsx', 'source_sheet': 'Лист1', 'position_num': '2',
+     'code': 'ФСБЦ-04.1.02.05-0006', 'name': 'Бетон', 'unit': 'м3', 'quantity': '5'},
+]
+
+DIRECTIVES = {'project_name': 'Тест', 'project_timeline': {'start_date': '01.09.2025', 'end_date': '30.09.2025'}}
+
+
+def _make_project(work_dir):
+    project_path = os.path.join(work_dir, 'project')
+    os.makedirs(os.path.join(project_path, '0_input'))
+    with open(os.path.join(project_path, '0_input', 'directives.json'), 'w', encoding='utf-8') as f:
+        json.dump(DIRECTIVES, f, ensure_ascii=False)
+    return project_path
+
+
+async def _run_steps_2_3(pipeline):
+    classified = await pipeline.run_classification(RAW_DATA)
+    prepared = await pipeline.run_preparation(classified['records'])
+    await pipeline._flush_pending_writes()
+    return classified, prepared
+
+
+def _patch_cache(monkeypatch, work_dir):
+    db_path = os.path.join(work_dir, 'cls.sqlite3')
+    original = classification_cache.ClassificationCache
+    monkeypatch.setattr(classification_cache, 'ClassificationCache', lambda: original(db_path, version='v1'))
+
+
+def test_steps_hand_off_in_memory(monkeypatch):
+    """Шаги 2-3 не читают файлы предыдущих шагов, true.json собирается из памяти"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_handoff_')
+    _patch_cache(monkeypatch, work_dir)
+
+    try:
+        project_path = _make_project(work_dir)
+        pipeline = HerzogPipeline(project_path)
+
+        classified, prepared = asyncio.run(_run_steps_2_3(pipeline))
+
+        assert classified['success'] and prepared['success']
+        assert [item['classification'] for item in classified['records']] == ['Работа', 'Материал']
+        assert [item['id'] for item in prepared['project_data']['work_items']] == ['w1']
+
+        # classified_estimates.json нужен ревизиям - пишется всегда, компактно
+        with open(os.path.join(project_path, '2_classified', 'classified_estimates.json'), encoding='utf-8') as f:
+            text = f.read()
+        assert json.loads(text) == classified['records']
+        assert '\n' not in text
+        # project_data.json - мастер-файл этапа 3 (его копирует /test), тоже пишется всегда
+        with open(os.path.join(project_path, '3_prepared', 'project_data.json'), encoding='utf-8') as f:
+            text = f.read()
+        assert json.loads(text)['work_items'] == prepared['project_data']['work_items']
+        assert '\n' not in text
+
+        assert create_true_json(project_path, prepared['project_data'])
+        truth_data = load_truth(os.path.join(project_path, 'true.json'))
+        assert [item['id'] for item in truth_data['source_work_items']] == ['w1']
+        print("✅ Данные переданы между шагами в памяти")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_persist_intermediates(monkeypatch):
+    """--persist-intermediates сохраняет файлы шагов 1-3 в читаемом виде"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_handoff_')
+    _patch_cache(monkeypatch, work_dir)
+
+    try:
+        project_path = _make_project(work_dir)
+        pipeline = HerzogPipeline(project_path, persist_intermediates=True)
+
+        _, prepared = asyncio.run(_run_steps_2_3(pipeline))
+
+        with open(os.path.join(project_path, '3_prepared', 'project_data.json'), encoding='utf-8') as f:
+            text = f.read()
+        assert json.loads(text)['work_items'] == prepared['project_data']['work_items']
+        assert '\n  ' in text
+        print("✅ Промежуточные файлы сохранены для отладки")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, '-q']))
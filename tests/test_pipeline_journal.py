@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Тест журнала статусов пайплайна (shared/pipeline_journal.py)
+Смена статуса дописывает строку журнала и не трогает true.json,
+текущий агент читается по последней строке, оборванная запись пропускается
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.shared.pipeline_journal import PipelineJournal, initial_pipeline_status, journal_path_for
+from src.shared.truth_initializer import get_current_agent, load_pipeline_status, update_pipeline_status
+
+
+def _write_truth(work_dir, truth_data):
+    truth_path = os.path.join(work_dir, 'true.json')
+    with open(truth_path, 'w', encoding='utf-8') as f:
+        json.dump(truth_data, f, ensure_ascii=False)
+    return truth_path
+
+
+def test_status_updates_do_not_rewrite_truth():
+    """Статусы пишутся в журнал, true.json не меняется"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_journal_')
+
+    try:
+        truth_path = _write_truth(work_dir, {'metadata': {}, 'results': {'work_packages': []}})
+        PipelineJournal(journal_path_for(truth_path)).start(initial_pipeline_status())
+        truth_mtime = os.stat(truth_path).st_mtime_ns
+
+        assert get_current_agent(truth_path) == 'work_packager'
+        assert update_pipeline_status(truth_path, 'work_packager', 'in_progress')
+        assert get_current_agent(truth_path) == 'work_packager'
+        assert update_pipeline_status(truth_path, 'work_packager', 'completed')
+        assert get_current_agent(truth_path) == 'works_to_packages'
+        assert not update_pipeline_status(truth_path, 'unknown_agent', 'completed')
+
+        for agent_name in ['works_to_packages', 'counter', 'scheduler_and_staffer']:
+            update_pipeline_status(truth_path, agent_name, 'completed')
+        assert get_current_agent(truth_path) is None
+
+        assert os.stat(truth_path).st_mtime_ns == truth_mtime
+        with open(journal_path_for(truth_path), encoding='utf-8') as f:
+            assert len(f.readlines()) == 1 + 2 + 3
+        print("✅ Статусы в журнале, true.json не перезаписан")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_legacy_truth_and_torn_line():
+    """Проект без журнала читает статусы из true.json; оборванная строка пропускается"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_journal_')
+    legacy_status = [{'agent_name': 'work_packager', 'status': 'completed'},
+                     {'agent_name': 'works_to_packages', 'status': 'pending'}]
+
+    try:
+        truth_path = _write_truth(work_dir, {'metadata': {'pipeline_status': legacy_status}})
+        assert get_current_agent(truth_path) == 'works_to_packages'
+
+        update_pipeline_status(truth_path, 'works_to_packages', 'in_progress')
+        with open(journal_path_for(truth_path), 'a', encoding='utf-8') as f:
+            f.write('{"at": "2025-01-01", "event": {"agent_name": "works_to')
+
+        assert [agent['status'] for agent in load_pipeline_status(truth_path)] == ['completed', 'in_progress']
+        print("✅ Старые проекты и оборванная запись")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_tail_read_on_long_journal():
+    """Последний снимок находится и в журнале длиннее блока чтения"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_journal_')
+
+    try:
+        journal = PipelineJournal(os.path.join(work_dir, 'pipeline_status.jsonl'))
+        journal.start(initial_pipeline_status())
+        status = initial_pipeline_status()
+        for i in range(200):
+            status[0]['note'] = 'x' * i
+            journal.append({'agent_name': 'work_packager', 'status': 'pending'}, status)
+
+        assert journal.read_status()[0]['note'] == 'x' * 199
+        assert PipelineJournal(os.path.join(work_dir, 'missing.jsonl')).read_status() is None
+        print("✅ Чтение с конца длинного журнала")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_status_updates_do_not_rewrite_truth()
+    test_legacy_truth_and_torn_line()
+    test_tail_read_on_long_journal()
+    print("\n🎉 Все тесты пройдены!")
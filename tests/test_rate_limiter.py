@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Тест ограничителя запросов к LLM (shared/rate_limiter.py)
+Очередь по RPM/TPM, уточнение резерва, пауза модели после 429,
+общее состояние процессов через файл и метрики ожидания
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from email.utils import formatdate
+
+from aiohttp import web
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.shared.claude_client import ClaudeClient
+from src.shared.rate_limiter import (EXPECTED_OUTPUT_TOKENS, RateLimiter, backoff_delay,
+                                     estimate_request_tokens, estimate_tokens, parse_limits,
+                                     parse_retry_after)
+
+MODEL = 'anthropic/claude-3.5-sonnet-20241022'
+
+
+def test_rpm_and_tpm_queue():
+    """Запросы сверх бюджета встают в очередь, резерв уточняется фактическим расходом"""
+    limiter = RateLimiter(default_rpm=60, default_tpm=0, limits={}, state_path='')
+    waits = [limiter._reserve(MODEL, 0) for _ in range(62)]
+    assert max(waits[:60]) == 0
+    assert 0.9 < waits[60] <= 1.0 and 1.9 < waits[61] <= 2.0
+
+    limiter = RateLimiter(default_rpm=0, default_tpm=6000, limits={'other': (0, 600)}, state_path='')
+    assert limiter._reserve(MODEL, 6000) == 0
+    assert 4.9 < limiter._reserve(MODEL, 500) <= 5.0
+    limiter.record_usage(MODEL, 500, 100)  # ответ оказался меньше оценки
+    assert 0.9 < limiter._reserve(MODEL, 0) <= 1.0
+    # Запрос больше минутного бюджета резервирует весь бакет и не ждет дольше минуты
+    assert limiter._reserve('other', 10_000) == 0
+    assert 59 < limiter._reserve('other', 10_000) <= 60
+    print("✅ Очередь по RPM и TPM")
+
+
+def test_rate_limited_pauses_model():
+    """После 429 модель приостанавливается на retry-after, другие модели не ждут"""
+    limiter = RateLimiter(default_rpm=100, default_tpm=0, limits={}, state_path='')
+    delay = limiter.on_rate_limited(MODEL, retry_after=3, attempt=0)
+    assert 3 <= delay < 4
+    assert delay - 0.1 < limiter._reserve(MODEL, 0) <= delay
+    assert limiter._reserve('anthropic/claude-sonnet-4', 0) == 0
+    assert limiter.get_metrics()[MODEL]['rate_limited'] == 1
+    print("✅ Пауза модели после 429")
+
+
+def test_shared_state_file():
+    """Два ограничителя с общим файлом состояния видят резервы друг друга"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_rate_')
+    state_path = os.path.join(work_dir, 'llm_rate.json')
+
+    try:
+        first = RateLimiter(default_rpm=60, default_tpm=0, limits={}, state_path=state_path)
+        second = RateLimiter(default_rpm=60, default_tpm=0, limits={}, state_path=state_path)
+        for _ in range(60):
+            assert first._reserve(MODEL, 0) == 0
+        assert 0.9 < second._reserve(MODEL, 0) <= 1.0
+        with open(state_path, encoding='utf-8') as f:
+            assert MODEL in json.load(f)
+        print("✅ Общее состояние процессов через файл")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_release_returns_reservation():
+    """Резерв попытки без ответа возвращается; через файл состояния - тоже вне event loop"""
+    limiter = RateLimiter(default_rpm=2, default_tpm=1000, limits={}, state_path='')
+    assert limiter._reserve(MODEL, 1000) == 0
+    limiter.release(MODEL, 1000)
+    assert limiter._reserve(MODEL, 1000) == 0
+    assert limiter._reserve(MODEL, 100) > 0  # бакет TPM исчерпан вторым резервом
+
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_rate_')
+    try:
+        limiter = RateLimiter(default_rpm=1, default_tpm=0, limits={},
+                              state_path=os.path.join(work_dir, 'llm_rate.json'))
+
+        async def scenario():
+            assert await limiter.acquire(MODEL) == 0
+            await limiter.offload(limiter.release, MODEL, 0)
+            return await limiter.acquire(MODEL)
+
+        assert asyncio.run(scenario()) == 0
+        print("✅ Возврат резерва")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_acquire_records_queue_wait():
+    """acquire ждет своей очереди и записывает метрики ожидания"""
+    limiter = RateLimiter(default_rpm=600, default_tpm=0, limits={}, state_path='')
+    for _ in range(600):
+        limiter._reserve(MODEL, 0)
+
+    started = time.perf_counter()
+    wait = asyncio.run(limiter.acquire(MODEL))
+    assert time.perf_counter() - started >= wait > 0.05
+
+    metrics = limiter.get_metrics()[MODEL]
+    assert metrics['requests'] == 1 and metrics['waited_requests'] == 1
+    assert metrics['max_wait_seconds'] == metrics['total_wait_seconds'] > 0
+    print("✅ Метрики ожидания в очереди")
+
+
+def test_helpers():
+    """Разбор настроек и заголовков, экспоненциальная задержка с jitter"""
+    assert parse_limits('anthropic/claude-sonnet-4=50:40000, bad, m=1:2') == {
+        'anthropic/claude-sonnet-4': (50.0, 40000.0), 'm': (1.0, 2.0)}
+    assert parse_retry_after(None) is None and parse_retry_after('abc') is None
+    assert parse_retry_after('7') == 7.0
+    assert 25 < parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert all(4 <= backoff_delay(3) <= 8 for _ in range(20))
+    assert all(backoff_delay(20) <= 60 for _ in range(20))
+    assert estimate_tokens(None) == 0 and estimate_tokens('а' * 250) == 101
+    assert estimate_request_tokens('а' * 250, None, 8000) == 101 + EXPECTED_OUTPUT_TOKENS
+    assert estimate_request_tokens('а' * 250, 'б' * 25, 100) == 101 + 11 + 100
+    print("✅ Вспомогательные функции")
+
+
+def test_client_retries_after_429():
+    """ClaudeClient повторяет запрос после 429 через ограничитель"""
+    async def scenario():
+        calls = []
+
+        async def handle(request):
+            calls.append(time.perf_counter())
+            if len(calls) == 1:
+                return web.json_response({'error': {'message': 'rate limited'}}, status=429,
+                                         headers={'retry-after': '0'})
+            return web.json_response({
+                'choices': [{'message': {'content': '{"ok": true}'}}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 5}
+            })
+
+        app = web.Application()
+        app.router.add_post('/chat/completions', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+
+        client = ClaudeClient()
+        client.base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/chat/completions"
+        client.rate_limiter = RateLimiter(default_rpm=100, default_tpm=100_000, limits={}, state_path='')
+        try:
+            result = await client.generate_response('промт', agent_name='counter')
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+        assert result['success'] and result['attempt'] == 2
+        metrics = client.get_rate_limit_metrics()[MODEL]
+        assert metrics['rate_limited'] == 1 and metrics['requests'] == 2
+        assert calls[1] - calls[0] >= metrics['max_wait_seconds'] - 0.01
+
+    asyncio.run(scenario())
+    print("✅ Повтор после 429")
+
+
+def test_client_waits_before_switching_model():
+    """После 429 на Sonnet 4 повтор на Claude 3.5 идет только после паузы"""
+    async def scenario():
+        calls = []
+
+        async def handle(request):
+            calls.append((time.perf_counter(), (await request.json())['model']))
+            if len(calls) == 1:
+                return web.json_response({'error': {'message': 'rate limited'}}, status=429,
+                                         headers={'retry-after': '0.3'})
+            return web.json_response({
+                'choices': [{'message': {'content': '{"ok": true}'}}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 5}
+            })
+
+        app = web.Application()
+        app.router.add_post('/chat/completions', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+
+        client = ClaudeClient()
+        client.base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/chat/completions"
+        client.rate_limiter = RateLimiter(default_rpm=100, default_tpm=100_000, limits={}, state_path='')
+        try:
+            result = await client.generate_response('промт', agent_name='work_packager')
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+        assert result['success'] and result['attempt'] == 2
+        assert [model for _, model in calls] == ['anthropic/claude-sonnet-4', MODEL]
+        assert calls[1][0] - calls[0][0] >= 0.3
+
+    asyncio.run(scenario())
+    print("✅ Пауза перед переключением модели после 429")
+
+
+def test_client_refunds_failed_attempts():
+    """Попытки с ошибкой сервера не расходуют лимит: после них бакет как после одного запроса"""
+    async def scenario():
+        calls = []
+
+        async def handle(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return web.json_response({'error': {'message': 'overloaded'}}, status=502)
+            return web.json_response({
+                'choices': [{'message': {'content': '{"ok": true}'}}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 5}
+            })
+
+        app = web.Application()
+        app.router.add_post('/chat/completions', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+
+        client = ClaudeClient()
+        client.base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/chat/completions"
+        limiter = client.rate_limiter = RateLimiter(default_rpm=2, default_tpm=100_000, limits={}, state_path='')
+        try:
+            result = await client.generate_response('промт', agent_name='counter')
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+        assert result['success'] and result['attempt'] == 2
+        # Неудачная попытка возвращена, успешная уточнена фактическими 15 токенами
+        assert limiter._reserve(MODEL, 0) == 0
+        with limiter._state.transaction() as states:
+            assert 100_000 - states[MODEL]['tokens'] < 20
+
+    asyncio.run(scenario())
+    print("✅ Возврат резерва неудачных попыток")
+
+
+if __name__ == "__main__":
+    test_rpm_and_tpm_queue()
+    test_rate_limited_pauses_model()
+    test_shared_state_file()
+    test_release_returns_reservation()
+    test_acquire_records_queue_wait()
+    test_helpers()
+    test_client_retries_after_429()
+    test_client_waits_before_switching_model()
+    test_client_refunds_failed_attempts()
+    print("\n🎉 Все тесты пройдены!")
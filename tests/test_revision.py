@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Тест режима ревизии сметы (shared/revision.py)
+Сопоставление позиций, перенос классификации, назначений, расчетов и календарного плана
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.shared.truth_initializer import load_pipeline_status
+from src.shared.truth_sections import load_truth
+from src.shared.revision import (
+    apply_revision, carry_over_classifications, load_revision_mapping,
+    match_revision_items, reusable_calculation, reusable_schedule
+)
+
+
+def _item(item_id, code, name, quantity, source_file='rev_a.xlsx'):
+    return {'id': item_id, 'source_file': source_file, 'source_sheet': 'Лист1', 'position_num': '1',
+            'code': code, 'name': name, 'unit': 'м2', 'quantity': quantity}
+
+
+PREVIOUS_RAW = [
+    _item('a1', 'ГЭСН01', 'Кладка', '10'),
+    _item('a2', 'ГЭСН02', 'Штукатурка', '20'),
+    _item('a3', 'ГЭСН03', 'Окраска', '30'),
+    _item('a4', 'ФССЦ01', 'Краска', '5'),
+]
+
+NEW_RAW = [
+    _item('b1', 'ГЭСН01', 'Кладка', '10', 'rev_b.xlsx'),
+    _item('b2', 'ГЭСН02', 'Штукатурка', '25', 'rev_b.xlsx'),   # изменено количество
+    _item('b3', 'ГЭСН03', 'Окраска', '30', 'rev_b.xlsx'),
+    _item('b4', 'ФССЦ01', 'Краска', '5', 'rev_b.xlsx'),
+    _item('b5', 'ГЭСН04', 'Грунтовка', '30', 'rev_b.xlsx'),   # новая позиция
+]
+
+
+def _status(*completed):
+    agents = ['work_packager', 'works_to_packages', 'counter', 'scheduler_and_staffer']
+    return [{'agent_name': name, 'status': 'completed' if name in completed else 'pending'} for name in agents]
+
+
+def _create_projects(timeline_changed: bool = False):
+    root = tempfile.mkdtemp(prefix='test_herzog_revision_')
+    previous_path = os.path.join(root, 'previous')
+    new_path = os.path.join(root, 'new')
+    
+    for path, raw in ((previous_path, PREVIOUS_RAW), (new_path, NEW_RAW)):
+        os.makedirs(os.path.join(path, '1_extracted'))
+        with open(os.path.join(path, '1_extracted', 'raw_estimates.json'), 'w', encoding='utf-8') as f:
+            json.dump(raw, f, ensure_ascii=False)
+    
+    wbs = [
+        {'id': 'cat_1', 'type': 'category', 'name': 'Стены'},
+        {'id': 'pkg_walls', 'type': 'package', 'name': 'Кладка стен', 'parent_id': 'cat_1'},
+        {'id': 'pkg_finish', 'type': 'package', 'name': 'Отделка', 'parent_id': 'cat_1'},
+        {'id': 'pkg_paint', 'type': 'package', 'name': 'Окраска', 'parent_id': 'cat_1'},
+    ]
+    timeline = [{'week_id': 1, 'start_date': '2025-09-01'}]
+    previous_truth = {
+        'metadata': {'pipeline_status': _status('work_packager', 'works_to_packages', 'counter',
+                                                'scheduler_and_staffer')},
+        'project_inputs': {'workforce_range': {'min': 5, 'max': 10}},
+        'timeline_blocks': timeline,
+        'source_work_items': [
+            {**_item('a1', 'ГЭСН01', 'Кладка', '10'), 'package_id': 'pkg_walls'},
+            {**_item('a2', 'ГЭСН02', 'Штукатурка', '20'), 'package_id': 'pkg_finish'},
+            {**_item('a3', 'ГЭСН03', 'Окраска', '30'), 'package_id': 'pkg_paint'},
+        ],
+        'results': {
+            'work_breakdown_structure': wbs,
+            'volume_calculations': [
+                {'id': 'pkg_walls', 'calculations': {'unit': 'м3', 'quantity': 10}},
+                {'id': 'pkg_finish', 'calculations': {'unit': 'м2', 'quantity': 20}},
+                {'id': 'pkg_paint', 'calculations': {'unit': 'м2', 'quantity': 30}},
+            ],
+            'scheduled_packages': [{'package_id': 'pkg_walls', 'schedule_blocks': [1]}]
+        }
+    }
+    new_truth = {
+        'metadata': {'pipeline_status': _status()},
+        'project_inputs': {'workforce_range': {'min': 5, 'max': 10}},
+        'timeline_blocks': [{'week_id': 1, 'start_date': '2025-10-01'}] if timeline_changed else timeline,
+        'source_work_items': [
+            _item('b1', 'ГЭСН01', 'Кладка', '10', 'rev_b.xlsx'),
+            _item('b2', 'ГЭСН02', 'Штукатурка', '25', 'rev_b.xlsx'),
+            _item('b3', 'ГЭСН03', 'Окраска', '30', 'rev_b.xlsx'),
+            _item('b5', 'ГЭСН04', 'Грунтовка', '30', 'rev_b.xlsx'),
+        ],
+        'results': {}
+    }
+    
+    with open(os.path.join(previous_path, 'true.json'), 'w', encoding='utf-8') as f:
+        json.dump(previous_truth, f, ensure_ascii=False)
+    with open(os.path.join(new_path, 'true.json'), 'w', encoding='utf-8') as f:
+        json.dump(new_truth, f, ensure_ascii=False)
+    
+    return root, previous_path, new_path
+
+
+def test_match_and_carry_classifications():
+    """Неизмененные позиции сопоставляются по содержимому и берут классификацию"""
+    mapping = match_revision_items(PREVIOUS_RAW, NEW_RAW)
+    assert mapping == {'b1': 'a1', 'b3': 'a3', 'b4': 'a4'}
+    
+    previous_classified = [{**item, 'classification': 'Работа'} for item in PREVIOUS_RAW]
+    previous_classified[3]['classification'] = 'Материал'
+    
+    classified, pending = carry_over_classifications(NEW_RAW, previous_classified, mapping)
+    
+    assert [item['id'] for item in pending] == ['b2', 'b5']
+    assert classified[1] is None and classified[4] is None
+    assert classified[3]['classification'] == 'Материал'
+    assert classified[0]['id'] == 'b1' and classified[0]['source_file'] == 'rev_b.xlsx'
+    print("✅ Классификация перенесена для 3 из 5 позиций")
+
+
+def test_duplicates_are_matched_one_to_one():
+    """Одинаковые строки не склеиваются: лишний дубликат считается новым"""
+    previous = [_item('a1', 'К', 'Работа', '1')]
+    new = [_item('b1', 'К', 'Работа', '1'), _item('b2', 'К', 'Работа', '1')]
+    
+    assert match_revision_items(previous, new) == {'b1': 'a1'}
+    print("✅ Дубликаты сопоставляются один к одному")
+
+
+def test_previous_project_without_source_sheet():
+    """Предыдущий проект до появления source_sheet сопоставляется по содержимому"""
+    previous_raw = [{key: value for key, value in item.items() if key != 'source_sheet'} for item in PREVIOUS_RAW]
+    previous_classified = [dict(item, classification='Работа') for item in previous_raw]
+
+    mapping = match_revision_items(previous_raw, NEW_RAW)
+    assert mapping == {'b1': 'a1', 'b3': 'a3', 'b4': 'a4'}
+
+    classified, pending = carry_over_classifications(NEW_RAW, previous_classified, mapping)
+    assert classified[0]['source_sheet'] == 'Лист1' and classified[0]['id'] == 'b1'
+    assert [item['id'] for item in pending] == ['b2', 'b5']
+    print("✅ Проекты без source_sheet сопоставляются по содержимому")
+
+
+def test_apply_revision_reuses_clean_packages():
+    """Назначения и расчеты переносятся только для неизмененных пакетов"""
+    root, previous_path, new_path = _create_projects()
+    
+    try:
+        mapping = load_revision_mapping(new_path, previous_path)
+        truth_path = os.path.join(new_path, 'true.json')
+        stats = apply_revision(truth_path, previous_path, mapping)
+        
+        truth_data = load_truth(truth_path)
+        
+        assert stats['applied']
+        assert stats['unchanged_works'] == 2 and stats['new_or_changed_works'] == 2
+        assert stats['removed_works'] == 1
+        
+        package_by_work = {work['id']: work.get('package_id') for work in truth_data['source_work_items']}
+        assert package_by_work == {'b1': 'pkg_walls', 'b2': None, 'b3': 'pkg_paint', 'b5': None}
+        pipeline_status = load_pipeline_status(truth_path)
+        assert pipeline_status[0]['status'] == 'completed'
+        assert pipeline_status[0]['reused_from'] == previous_path
+        assert pipeline_status[1]['status'] == 'pending'
+        assert len(truth_data['results']['work_breakdown_structure']) == 4
+        
+        # Пакет стен не изменился, в отделке заменена работа
+        assert reusable_calculation(truth_data, 'pkg_walls', ['b1'])['calculations']['quantity'] == 10
+        assert reusable_calculation(truth_data, 'pkg_finish', ['b2']) is None
+        # В окраску works_to_packages добавил новую работу - расчет нужно повторить
+        assert reusable_calculation(truth_data, 'pkg_paint', ['b3', 'b5']) is None
+        assert reusable_calculation(truth_data, 'pkg_paint', ['b3']) is not None
+        
+        # Пакет отделки изменился - календарный план пересоздается
+        assert reusable_schedule(truth_data) is None
+        print(f"✅ Ревизия применена: {stats}")
+    finally:
+        shutil.rmtree(root)
+
+
+def test_schedule_reused_only_without_changes():
+    """План переносится, только если counter ничего не пересчитывал и сроки те же"""
+    for timeline_changed, expected in ((False, True), (True, False)):
+        root, previous_path, new_path = _create_projects(timeline_changed)
+        
+        try:
+            truth_path = os.path.join(new_path, 'true.json')
+            # Ревизия без изменений работ
+            mapping = {'b1': 'a1', 'b2': 'a2', 'b3': 'a3'}
+            apply_revision(truth_path, previous_path, mapping)
+            
+            truth_data = load_truth(truth_path)
+            
+            assert reusable_schedule(truth_data) is None  # counter еще не отработал
+            truth_data['revision']['recalculated_packages'] = []
+            assert (reusable_schedule(truth_data) is not None) == expected
+        finally:
+            shutil.rmtree(root)
+    
+    print("✅ Календарный план переносится только без изменений")
+
+
+if __name__ == "__main__":
+    test_match_and_carry_classifications()
+    test_duplicates_are_matched_one_to_one()
+    test_previous_project_without_source_sheet()
+    test_apply_revision_reuses_clean_packages()
+    test_schedule_reused_only_without_changes()
+    print("\n🎉 Все тесты пройдены!")
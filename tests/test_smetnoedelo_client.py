@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Тест клиента API Сметного Дела (smetnoedelo_client.py) на локальном HTTP-сервере
+Параллельные запросы с ограничением, постоянный кэш по (база, шифр), обогащение в classify_items
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+from aiohttp import web
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_processing import classifier
+from src.data_processing.smetnoedelo_client import SmetnoedeloCache, SmetnoedeloClient, detect_base
+
+OFFICIAL_NAMES = {
+    ('gesn', 'ГЭСН08-02-001-01'): 'Кладка стен кирпичных наружных',
+    ('gesnm', 'ГЭСНм08-01-001'): 'Монтаж щитов',
+}
+
+
+class StandInServer:
+    """Локальная замена API: считает запросы и одновременные соединения"""
+
+    def __init__(self):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request):
+        base, code = request.query['base'], request.query['code']
+        self.requests.append((base, code))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.02)
+        self.in_flight -= 1
+
+        if request.query['token'] == 'list':
+            return web.json_response(['unexpected'])
+        if request.query['token'] != 'token':
+            return web.json_response({'error': 'bad token'})
+        if (base, code) not in OFFICIAL_NAMES:
+            return web.json_response({}, status=404)
+        return web.json_response({'BASE_NAME': OFFICIAL_NAMES[(base, code)]})
+
+    async def run(self, scenario):
+        app = web.Application()
+        app.router.add_get('/api/', self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(f"http://127.0.0.1:{port}/api/")
+        finally:
+            await runner.cleanup()
+
+
+def test_detect_base_prefers_longest_prefix():
+    """ГЭСНм и ФЕРмр не определяются как ГЭСН и ФЕР"""
+    assert detect_base('ГЭСН08-02-001') == 'gesn'
+    assert detect_base('гэснм08-01-001') == 'gesnm'
+    assert detect_base('ФЕРмр01') == 'fermr'
+    assert detect_base('ТЕР01') == 'gesn'
+    assert detect_base('КП') is None
+    print("✅ База по самому длинному префиксу")
+
+
+def test_detect_base_overlapping_prefixes():
+    """
+    Перекрывающиеся префиксы: каждый шифр попадает в свою базу, а не в базу
+    первого совпавшего короткого префикса, как в прежнем переборе
+    """
+    expected = {
+        'ГЭСН01-01-001': 'gesn', 'ГЭСНм01-01-001': 'gesnm', 'ГЭСНмр01-01-001': 'gesnmr',
+        'ГЭСНп01-01-001': 'gesnp', 'ГЭСНр01-01-001': 'gesnr',
+        'ФЕР01-01-001': 'fer', 'ФЕРм01-01-001': 'ferm', 'ФЕРмр01-01-001': 'fermr',
+        'ФЕРп01-01-001': 'ferp', 'ФЕРр01-01-001': 'ferr',
+        'ФССЦм-01': 'fsscm', 'ФССЦо-01': 'fssco', 'ФСБЦ-01': 'fsbcm', 'ФСЭМ-01': 'fsem',
+    }
+    assert {code: detect_base(code) for code in expected} == expected
+    # Регистр шифра не важен
+    assert detect_base('гэснмр01-01-001') == 'gesnmr' and detect_base('ФЕРМ01') == 'ferm'
+    print("✅ Перекрывающиеся префиксы")
+
+
+def test_cache_is_read_and_written_in_batches():
+    """Кэш читается одним запросом до обращений к API и пишется одной транзакцией после"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_sd_')
+    server = StandInServer()
+    cache = SmetnoedeloCache(os.path.join(work_dir, 'sd.sqlite3'))
+    calls = []
+    original_get_many, original_put_many = cache.get_many, cache.put_many
+    cache.get_many = lambda keys: calls.append('get') or original_get_many(keys)
+    cache.put_many = lambda rows: calls.append(('put', len(rows))) or original_put_many(rows)
+    cache.get = cache.put = None  # поштучные вызовы не используются
+    codes = ['ГЭСН08-02-001-01', 'ГЭСН99-99-999'] + [f'ГЭСН01-01-{i:03d}' for i in range(10)]
+
+    async def scenario(api_url):
+        async with SmetnoedeloClient('token', api_url, cache=cache) as client:
+            await client.enrich(codes)
+            return await client.enrich(codes)
+
+    try:
+        second = asyncio.run(server.run(scenario))
+        assert calls == ['get', ('put', 12), 'get']
+        assert second['ГЭСН08-02-001-01'] == 'Кладка стен кирпичных наружных'
+        assert len(server.requests) == 12
+        print("✅ Пакетное чтение и запись кэша")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_enrich_concurrently_with_persistent_cache():
+    """Уникальные шифры запрашиваются параллельно один раз, повторный запуск идет из кэша"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_sd_')
+    server = StandInServer()
+    codes = ['ГЭСН08-02-001-01', 'ГЭСНм08-01-001', 'ГЭСН99-99-999', 'ГЭСН08-02-001-01', 'КП'] + \
+            [f'ГЭСН01-01-{i:03d}' for i in range(10)]
+
+    async def scenario(api_url):
+        cache = SmetnoedeloCache(os.path.join(work_dir, 'sd.sqlite3'))
+        async with SmetnoedeloClient('token', api_url, cache=cache, max_concurrency=3) as client:
+            first = await client.enrich(codes)
+        async with SmetnoedeloClient('token', api_url, cache=cache) as client:
+            second = await client.enrich(codes)
+        return first, second
+
+    try:
+        first, second = asyncio.run(server.run(scenario))
+
+        assert first == second
+        assert first['ГЭСН08-02-001-01'] == 'Кладка стен кирпичных наружных'
+        assert first['ГЭСНм08-01-001'] == 'Монтаж щитов'
+        assert first['ГЭСН99-99-999'] is None and first['КП'] is None
+        # 13 уникальных шифров с базой; "не найдено" тоже закэшировано
+        assert len(server.requests) == len(set(server.requests)) == 13
+        assert 1 < server.max_in_flight <= 3
+        print("✅ Параллельное обогащение с постоянным кэшем")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_api_errors_are_not_cached():
+    """Ошибка API (например, исчерпан токен) и ответ не объектом не попадают в кэш"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_sd_')
+    server = StandInServer()
+
+    async def scenario(api_url):
+        cache = SmetnoedeloCache(os.path.join(work_dir, 'sd.sqlite3'))
+        async with SmetnoedeloClient('expired', api_url, cache=cache) as client:
+            failed = await client.get_official_name('ГЭСН08-02-001-01')
+        async with SmetnoedeloClient('list', api_url, cache=cache) as client:
+            assert await client.get_official_name('ГЭСН08-02-001-01') is None
+        async with SmetnoedeloClient('token', api_url, cache=cache) as client:
+            recovered = await client.get_official_name('ГЭСН08-02-001-01')
+        return failed, recovered
+
+    try:
+        failed, recovered = asyncio.run(server.run(scenario))
+        assert failed is None
+        assert recovered == 'Кладка стен кирпичных наружных'
+        assert len(server.requests) == 3
+        print("✅ Ошибки API не кэшируются")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_classify_items_enriches_work_names(monkeypatch):
+    """classify_items подставляет официальные наименования работ"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_sd_')
+    server = StandInServer()
+    monkeypatch.setenv('SMETNOEDELO_API_KEY', 'token')
+    monkeypatch.setattr(classifier, 'SMETNOEDELO_ENABLED', True)
+    monkeypatch.setattr(classifier, 'SmetnoedeloCache',
+                        lambda: SmetnoedeloCache(os.path.join(work_dir, 'sd.sqlite3')))
+    master_list = [
+        {'id': 'w1', 'code': 'ГЭСН08-02-001-01', 'name': 'Кладка'},
+        {'id': 'w2', 'code': 'ГЭСН99-99-999', 'name': 'Неизвестная работа'},
+        {'id': 'm1', 'code': 'ФСБЦ-01', 'name': 'Кирпич'},
+    ]
+
+    async def scenario(api_url):
+        monkeypatch.setattr(classifier, 'SmetnoedeloClient',
+                            lambda token, cache: SmetnoedeloClient(token, api_url, cache=cache))
+        return await classifier.classify_items(master_list)
+
+    try:
+        classified = asyncio.run(server.run(scenario))
+        assert [item['name'] for item in classified] == [
+            'Кладка стен кирпичных наружных', 'Неизвестная работа', 'Кирпич'
+        ]
+        assert sorted(server.requests) == [('gesn', 'ГЭСН08-02-001-01'), ('gesn', 'ГЭСН99-99-999')]
+        print("✅ Наименования работ обогащены")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_detect_base_prefers_longest_prefix()
+    test_detect_base_overlapping_prefixes()
+    test_cache_is_read_and_written_in_batches()
+    test_enrich_concurrently_with_persistent_cache()
+    test_api_errors_are_not_cached()
+    print("\n🎉 Все тесты пройдены!")
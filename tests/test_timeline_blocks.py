@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Тест календаря временных блоков (shared/timeline_blocks.py)
+Векторный расчет совпадает с подневным перебором, маски шестидневки и многолетние проекты
+"""
+
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.shared.timeline_blocks import generate_weekly_blocks, get_russian_holidays
+
+
+def _reference_blocks(start, end, weekmask):
+    """Подневный перебор: понедельник - последний рабочий день маски, без праздников"""
+    last_day = weekmask.rindex('1')
+    blocks = []
+    monday = start - timedelta(days=start.weekday())
+
+    while monday <= end:
+        block_start = max(monday, start)
+        block_end = min(monday + timedelta(days=last_day), end)
+        working_days, excluded = 0, []
+        day = block_start
+        while day <= block_end:
+            if weekmask[day.weekday()] == '1':
+                if day in get_russian_holidays(day.year):
+                    excluded.append(day.isoformat())
+                else:
+                    working_days += 1
+            day += timedelta(days=1)
+
+        if working_days:
+            blocks.append({
+                "block_id": len(blocks) + 1,
+                "start_date": block_start.isoformat(),
+                "end_date": block_end.isoformat(),
+                "working_days": working_days,
+                "excluded_holidays": excluded,
+                "calendar_days": (block_end - block_start).days + 1,
+                "is_partial_start": block_start > monday,
+                "is_partial_end": block_end < monday + timedelta(days=last_day)
+            })
+        monday += timedelta(days=7)
+
+    return blocks
+
+
+def test_matches_day_by_day_reference():
+    """Случайные периоды для пяти- и шестидневки совпадают с перебором по дням"""
+    rng = random.Random(42)
+
+    for weekmask in ('1111100', '1111110'):
+        for _ in range(30):
+            start = date(2024, 1, 1) + timedelta(days=rng.randrange(700))
+            end = start + timedelta(days=rng.randrange(120))
+            result = generate_weekly_blocks(start.isoformat(), end.isoformat(), weekmask=weekmask)
+
+            assert result['blocks'] == _reference_blocks(start, end, weekmask)
+            assert result['project_metadata']['total_blocks'] == len(result['blocks'])
+    print("✅ Совпадение с подневным расчетом")
+
+
+def test_new_year_holidays_and_six_day_week():
+    """Неделя целиком из праздников пропускается, шестидневка заканчивает блок субботой"""
+    # 30.12.2024-03.01.2025 - нерабочие дни (перенос и новогодние каникулы)
+    five_day = generate_weekly_blocks("2024-12-30", "2025-01-12")['blocks']
+    assert [(block['block_id'], block['start_date'], block['working_days']) for block in five_day] == [(1, '2025-01-06', 2)]
+    assert five_day[0]['excluded_holidays'] == ['2025-01-06', '2025-01-07', '2025-01-08']
+
+    six_day = generate_weekly_blocks("2025-09-01", "2025-09-14", weekmask="Mon Tue Wed Thu Fri Sat")['blocks']
+    assert [(block['end_date'], block['working_days']) for block in six_day] == [('2025-09-06', 6), ('2025-09-13', 6)]
+    print("✅ Праздники и шестидневка")
+
+
+def test_multi_year_project():
+    """Многолетний проект: блоки идут подряд, праздники всех лет учтены"""
+    blocks = generate_weekly_blocks("2025-01-01", "2028-12-31")['blocks']
+
+    assert [block['block_id'] for block in blocks] == list(range(1, len(blocks) + 1))
+    excluded = {day for block in blocks for day in block['excluded_holidays']}
+    assert {'2025-06-12', '2026-11-04', '2027-02-23', '2028-03-08'} <= excluded
+    print(f"✅ {len(blocks)} блоков за 4 года")
+
+
+if __name__ == "__main__":
+    test_matches_day_by_day_reference()
+    test_new_year_holidays_and_six_day_week()
+    test_multi_year_project()
+    print("\n🎉 Все тесты пройдены!")
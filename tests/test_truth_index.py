@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Тест индексов по true.json (shared/truth_index.py)
+Индексы дают тот же результат, что прежний перебор, и сбрасываются
+в TruthStore при изменении данных
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.ai_agents.counter import WorkVolumeCalculator
+from src.data_processing.reporter_v3 import MultiPageScheduleGenerator
+from src.shared.truth_index import TruthIndex, index_packages
+from src.shared.truth_sections import save_truth
+from src.shared.truth_store import TruthStore
+
+TRUTH = {
+    'source_work_items': [
+        {'id': 'w1', 'name': 'Штукатурка', 'package_id': 'pkg_a'},
+        {'id': 'w2', 'name': 'Стяжка', 'package_id': 'pkg_b'},
+        {'id': 'w3', 'name': 'Шпатлевка', 'package_id': 'pkg_a'},
+        {'id': 'w4', 'name': 'Уборка'},
+    ],
+    'results': {
+        'work_breakdown_structure': [
+            {'id': 'cat_1', 'type': 'category', 'name': 'Отделка'},
+            {'id': 'pkg_a', 'type': 'package', 'name': 'Стены', 'parent_id': 'cat_1'},
+            {'id': 'pkg_b', 'type': 'package', 'name': 'Полы', 'parent_id': 'cat_missing'},
+        ],
+        'volume_calculations': [{'package_id': 'pkg_a', 'calculations': {'unit': 'м2', 'quantity': 10}}],
+        'scheduled_packages': [{'package_id': 'pkg_a', 'schedule_blocks': [1, 2]}]
+    }
+}
+
+
+def test_index_lookups():
+    """Поиск по индексам: работы пакета в исходном порядке, категории, расчеты и календарь"""
+    index = TruthIndex(TRUTH)
+
+    assert [work['id'] for work in index.package_works('pkg_a')] == ['w1', 'w3']
+    assert index.package_works('pkg_missing') == []
+    assert index.work_by_id['w4']['name'] == 'Уборка'
+    assert index.category_name('cat_1') == 'Отделка'
+    assert index.category_name('cat_missing') == 'Без категории'
+    assert set(index.package_by_id) == {'pkg_a', 'pkg_b'}
+    assert index.volume_by_package['pkg_a']['calculations']['quantity'] == 10
+    assert index.schedule_by_package['pkg_a']['schedule_blocks'] == [1, 2]
+
+    # Оба формата ID, при повторе - первый пакет
+    packages = index_packages([{'package_id': 'p1', 'name': 'первый'}, {'id': 'p1', 'name': 'второй'}])
+    assert packages['p1']['name'] == 'первый'
+    print("✅ Поиск по индексам")
+
+
+def test_consumers_use_index():
+    """counter и reporter дают прежний результат"""
+    work_packages = [item for item in TRUTH['results']['work_breakdown_structure'] if item['type'] == 'package']
+    grouped = WorkVolumeCalculator()._group_works_by_packages(work_packages, TRUTH['source_work_items'])
+    assert [[work['id'] for work in package['works']] for package in grouped] == [['w1', 'w3'], ['w2']]
+
+    categories, packages = MultiPageScheduleGenerator()._parse_hierarchical_structure(
+        TRUTH['results']['work_breakdown_structure'], TRUTH
+    )
+    assert [package['package_id'] for package in categories[0]['child_packages']] == ['pkg_a']
+    assert [package['category_name'] for package in packages] == ['Отделка', 'Без категории']
+    assert packages[0]['schedule_blocks'] == [1, 2]
+    assert packages[0]['calculations'] == {'unit': 'м2', 'quantity': 10}
+    print("✅ counter и reporter используют индексы")
+
+
+def test_store_index_reset_on_change():
+    """Индекс хранилища строится один раз и перестраивается после mark_dirty"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_index_')
+    truth_path = os.path.join(work_dir, 'true.json')
+
+    try:
+        save_truth(truth_path, TRUTH)
+        store = TruthStore(truth_path)
+        index = store.index
+        assert store.index is index
+        assert [work['id'] for work in index.package_works('pkg_b')] == ['w2']
+
+        store.data['source_work_items'][3]['package_id'] = 'pkg_b'
+        store.mark_dirty('source_work_items')
+        assert store.index is not index
+        assert [work['id'] for work in store.index.package_works('pkg_b')] == ['w2', 'w4']
+        print("✅ Индекс хранилища сбрасывается при изменениях")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_index_lookups()
+    test_consumers_use_index()
+    test_store_index_reset_on_change()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Тест секционного true.json (shared/truth_sections.py)
+Разделы читаются при первом обращении, непрочитанные разделы не перезаписываются,
+true.json прежнего формата читается и переводится в секционный при сохранении
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.shared import truth_sections
+from src.shared.truth_sections import load_truth, save_truth
+
+TRUTH = {
+    'metadata': {'project_id': 'p1', 'project_name': 'Тест'},
+    'timeline_blocks': [{'week_id': 1}],
+    'source_work_items': [{'id': 'w1', 'name': 'Кладка'}, {'id': 'w2', 'name': 'Окраска'}],
+    'results': {'work_breakdown_structure': [{'id': 'pkg_1', 'type': 'package'}], 'schedule': {}}
+}
+
+
+def test_legacy_file_is_read_and_converted():
+    """Однофайловый true.json читается целиком и сохраняется манифестом с разделами"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_truth_')
+    truth_path = os.path.join(work_dir, 'true.json')
+
+    try:
+        with open(truth_path, 'w', encoding='utf-8') as f:
+            json.dump(TRUTH, f, ensure_ascii=False)
+
+        truth_data = load_truth(truth_path)
+        assert truth_data.to_dict() == TRUTH
+
+        save_truth(truth_path, truth_data)
+        with open(truth_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        assert 'source_work_items' not in manifest and 'results' not in manifest
+        assert manifest['metadata'] == TRUTH['metadata']
+        with open(os.path.join(work_dir, 'truth', 'source_work_items.jsonl'), encoding='utf-8') as f:
+            assert len(f.readlines()) == 2
+
+        assert load_truth(truth_path).to_dict() == TRUTH
+        print("✅ Прежний формат читается и переводится в секционный")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_sections_load_on_first_access(monkeypatch):
+    """Раздел читается только при обращении, непрочитанные разделы не перезаписываются"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_truth_')
+    truth_path = os.path.join(work_dir, 'true.json')
+    read_files = []
+    original_read = truth_sections._read_section_file
+
+    def tracking_read(path):
+        read_files.append(os.path.relpath(path, work_dir))
+        return original_read(path)
+
+    monkeypatch.setattr(truth_sections, '_read_section_file', tracking_read)
+
+    try:
+        save_truth(truth_path, TRUTH)
+        works_path = os.path.join(work_dir, 'truth', 'source_work_items.jsonl')
+        works_mtime = os.stat(works_path).st_mtime_ns
+
+        truth_data = load_truth(truth_path)
+        assert truth_data['metadata']['project_id'] == 'p1'
+        assert 'source_work_items' in truth_data and read_files == []
+
+        truth_data['results']['schedule'] = {'weeks': 1}
+        assert read_files == []
+        assert truth_data['results']['work_breakdown_structure'][0]['id'] == 'pkg_1'
+        assert read_files == [os.path.join('truth', 'results', 'work_breakdown_structure.json')]
+
+        save_truth(truth_path, truth_data)
+        assert os.stat(works_path).st_mtime_ns == works_mtime
+
+        reloaded = load_truth(truth_path)
+        assert reloaded['results']['schedule'] == {'weeks': 1}
+        assert reloaded['source_work_items'] == TRUTH['source_work_items']
+        assert sorted(reloaded) == sorted(TRUTH)
+        print("✅ Ленивое чтение разделов")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_legacy_file_is_read_and_converted()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Тест общего хранилища true.json (shared/truth_store.py)
+true.json разбирается один раз на прогон, flush перезаписывает только
+отмеченные разделы, без изменений запись не выполняется
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from src.ai_agents import counter, works_to_packages
+from src.shared import truth_store
+from src.shared.truth_sections import load_truth, save_truth
+from src.shared.truth_store import TruthStore
+
+TRUTH = {
+    'metadata': {'project_id': 'p1', 'pipeline_status': [{'agent_name': 'works_to_packages', 'status': 'pending'},
+                                                         {'agent_name': 'counter', 'status': 'pending'}]},
+    'project_inputs': {'agent_directives': {}},
+    'source_work_items': [{'id': 'w1', 'name': 'Штукатурка', 'unit': 'м2', 'quantity': 10},
+                          {'id': 'w2', 'name': 'Стяжка', 'unit': 'м2', 'quantity': 20}],
+    'results': {'work_breakdown_structure': [{'id': 'cat_1', 'type': 'category', 'name': 'Отделка'},
+                                             {'id': 'pkg_a', 'type': 'package', 'name': 'Стены',
+                                              'parent_id': 'cat_1'}],
+                'schedule': {}}
+}
+
+
+class FakeClient:
+    """Отвечает как LLM"""
+
+    async def generate_response(self, prompt, system_instruction=None, agent_name=None):
+        data = json.loads(prompt)
+        if agent_name == 'works_to_packages':
+            assignments = [{'work_id': work['id'], 'package_id': 'pkg_a'} for work in data['works_to_assign']]
+            return {'success': True, 'response': {'assignments': assignments}}
+        return {'success': True, 'response': {'calculation': {'unit': 'м2', 'quantity': len(data['works'])}}}
+
+
+def _make_project():
+    project_path = tempfile.mkdtemp(prefix='test_herzog_store_')
+    save_truth(os.path.join(project_path, 'true.json'), TRUTH)
+    return project_path
+
+
+def _inode(project_path, *parts):
+    return os.stat(os.path.join(project_path, *parts)).st_ino
+
+
+def test_flush_rewrites_dirty_sections_only():
+    """Перезаписываются отмеченные разделы и манифест; без изменений flush ничего не пишет"""
+    project_path = _make_project()
+    truth_path = os.path.join(project_path, 'true.json')
+
+    try:
+        store = TruthStore(truth_path)
+        assert not store.flush()
+
+        manifest_inode = _inode(project_path, 'true.json')
+        works_inode = _inode(project_path, 'truth', 'source_work_items.jsonl')
+        wbs_inode = _inode(project_path, 'truth', 'results', 'work_breakdown_structure.json')
+        schedule_inode = _inode(project_path, 'truth', 'results', 'schedule.json')
+
+        # Прочитанный, но не отмеченный раздел не перезаписывается
+        assert len(store.data['source_work_items']) == 2
+        assert store.data['results']['work_breakdown_structure'][1]['id'] == 'pkg_a'
+        store.data['results']['schedule'] = {'weeks': 4}
+        store.mark_dirty('results.schedule')
+        assert store.flush()
+        assert store.dirty == set()
+
+        assert _inode(project_path, 'truth', 'source_work_items.jsonl') == works_inode
+        assert _inode(project_path, 'truth', 'results', 'work_breakdown_structure.json') == wbs_inode
+        assert _inode(project_path, 'truth', 'results', 'schedule.json') != schedule_inode
+        assert _inode(project_path, 'true.json') != manifest_inode
+
+        manifest_inode = _inode(project_path, 'true.json')
+        assert not store.flush()
+        assert _inode(project_path, 'true.json') == manifest_inode
+
+        reloaded = load_truth(truth_path)
+        assert reloaded['results']['schedule'] == {'weeks': 4}
+        assert reloaded.to_dict()['source_work_items'] == TRUTH['source_work_items']
+        print("✅ Записываются только измененные разделы")
+    finally:
+        shutil.rmtree(project_path)
+
+
+def test_agents_share_one_parse(monkeypatch):
+    """works_to_packages и counter работают с одним разбором true.json"""
+    project_path = _make_project()
+    truth_path = os.path.join(project_path, 'true.json')
+    loads = []
+    original_load = truth_store.load_truth
+
+    def counting_load(path):
+        loads.append(path)
+        return original_load(path)
+
+    monkeypatch.setattr(truth_store, 'load_truth', counting_load)
+    monkeypatch.setattr(works_to_packages, 'gemini_client', FakeClient())
+    monkeypatch.setattr(counter, 'gemini_client', FakeClient())
+
+    try:
+        store = TruthStore(truth_path)
+        assert asyncio.run(works_to_packages.run_works_to_packages(project_path, truth_store=store))['success']
+        assert asyncio.run(counter.run_counter(project_path, truth_store=store))['success']
+        assert loads == [truth_path]
+
+        truth_data = load_truth(truth_path)
+        assert [work['package_id'] for work in truth_data['source_work_items']] == ['pkg_a', 'pkg_a']
+        assert truth_data['results']['volume_summary']['total_packages'] == 1
+        assert truth_data['results']['package_assignments']['total_works'] == 2
+        print("✅ Агенты используют одно хранилище")
+    finally:
+        shutil.rmtree(project_path)
+
+
+def test_rerun_without_revision_reassigns_all(monkeypatch):
+    """Без ревизии уже назначенные работы распределяются заново; в ревизии - только новые"""
+    monkeypatch.setattr(works_to_packages, 'gemini_client', FakeClient())
+
+    for revision, expected in ((None, ['pkg_a', 'pkg_a']), (True, ['pkg_old', 'pkg_a'])):
+        truth = json.loads(json.dumps(TRUTH))
+        truth['source_work_items'][0]['package_id'] = 'pkg_old'
+        truth['source_work_items'][1]['package_id'] = None if revision else 'pkg_old'
+        if revision:
+            truth['revision'] = {'stats': {'applied': True}}
+        project_path = tempfile.mkdtemp(prefix='test_herzog_store_')
+        truth_path = os.path.join(project_path, 'true.json')
+        save_truth(truth_path, truth)
+
+        try:
+            result = asyncio.run(works_to_packages.run_works_to_packages(project_path))
+            assert result['success'] and result['batches_processed'] == 1
+            truth_data = load_truth(truth_path)
+            assert [work['package_id'] for work in truth_data['source_work_items']] == expected
+        finally:
+            shutil.rmtree(project_path)
+
+    print("✅ Перезапуск без ревизии распределяет все работы")
+
+
+if __name__ == "__main__":
+    test_flush_rewrites_dirty_sections_only()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Тест стабильных ID позиций сметы (shared/work_ids.py)
+Одинаковые ID между запусками и режимами extractor, суффикс для совпадающих строк
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+# Добавляем путь к модулям
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_processing.extractor import extract_from_files, extract_from_files_parallel
+from src.shared.truth_initializer import convert_work_items
+from src.shared.work_ids import assign_unique_ids, make_work_id
+
+HEADER = ['№ п/п', 'Обоснование', 'Наименование', None, None, None, None, 'Ед.изм.', 'Кол-во']
+
+
+def _create_estimate() -> str:
+    """Смета, где строки 2 и 3 полностью совпадают"""
+    work_dir = tempfile.mkdtemp(prefix='test_herzog_ids_')
+    rows = [
+        [1, 'ГЭСН08-02-001', 'Кладка стен', None, None, None, None, 'м3', 12.5],
+        [2, 'ГЭСН11-01-011', 'Стяжка', None, None, None, None, 'м2', 40],
+        [2, 'ГЭСН11-01-011', 'Стяжка', None, None, None, None, 'м2', 40],
+    ]
+    pd.DataFrame([HEADER] + rows).to_excel(os.path.join(work_dir, 'smeta.xlsx'), index=False, header=False)
+    return work_dir
+
+
+def test_ids_are_stable_across_runs_and_modes():
+    """Повторный запуск и любой режим извлечения дают те же ID"""
+    work_dir = _create_estimate()
+    
+    try:
+        file_path = os.path.join(work_dir, 'smeta.xlsx')
+        first = [r['id'] for r in extract_from_files([file_path])]
+        
+        assert first == [r['id'] for r in extract_from_files([file_path])]
+        assert first == [r['id'] for r in extract_from_files([file_path], streaming=True)]
+        assert first == [r['id'] for r in extract_from_files([file_path], vectorized=True)]
+        assert first == [r['id'] for r in extract_from_files_parallel([file_path], max_workers=1)['records']]
+        
+        assert len(set(first)) == 3
+        assert first[2] == f"{first[1]}-2"
+        print(f"✅ Стабильные ID: {first}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_id_depends_on_content():
+    """ID меняется при изменении любого поля позиции"""
+    base = make_work_id('smeta.xlsx', 'Лист1', '1', 'ГЭСН', 'Кладка', 'м3', '12.5')
+    
+    assert base == make_work_id('smeta.xlsx', 'Лист1', '1', 'ГЭСН', 'Кладка', 'м3', '12.5')
+    assert base != make_work_id('smeta.xlsx', 'Лист1', '1', 'ГЭСН', 'Кладка', 'м3', '12.6')
+    assert base != make_work_id('smeta.xlsx', 'Лист2', '1', 'ГЭСН', 'Кладка', 'м3', '12.5')
+    print("✅ ID зависит от содержимого позиции")
+
+
+def test_convert_work_items_keeps_and_fills_ids():
+    """true.json: ID extractor сохраняются, недостающие выводятся из содержимого"""
+    items = [
+        {'id': 'abc', 'source_file': 'a.xlsx', 'code': 'К1', 'name': 'Работа', 'unit': 'м', 'quantity': '1'},
+        {'source_file': 'a.xlsx', 'code': 'К2', 'name': 'Работа', 'unit': 'м', 'quantity': '2'},
+        {'source_file': 'a.xlsx', 'code': 'К2', 'name': 'Работа', 'unit': 'м', 'quantity': '2'},
+    ]
+    
+    converted = convert_work_items(items)
+    
+    assert converted[0]['id'] == 'abc'
+    assert converted[0]['quantity'] == 1.0 and converted[0]['quantity_raw'] == '1'
+    assert converted[1]['id'] == convert_work_items(items)[1]['id']
+    assert converted[2]['id'] == f"{converted[1]['id']}-2"
+    assert assign_unique_ids(converted) == converted
+    print("✅ convert_work_items дает стабильные уникальные ID")
+
+
+if __name__ == "__main__":
+    test_ids_are_stable_across_runs_and_modes()
+    test_id_depends_on_content()
+    test_convert_work_items_keeps_and_fills_ids()
+    print("\n🎉 Все тесты пройдены!")